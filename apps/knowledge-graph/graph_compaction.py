@@ -0,0 +1,53 @@
+import modal
+
+from src.config import settings
+from src.utils.logger import setup_logger
+from modal_app import app, image, secrets
+
+logger = setup_logger(__name__)
+
+
+@app.function(
+    image=image,
+    secrets=secrets,
+    schedule=modal.Period(hours=settings.GRAPH_COMPACTION_INTERVAL_HOURS),
+    timeout=3600,
+    max_containers=1,
+)
+def compact_graphs():
+    # Compacts every project whose graph changed since its last compaction.
+    # One project failing doesn't stop the others; it is retried next cycle.
+    from src.pipeline.graph_compaction import compact_project, projects_due_for_compaction
+    from src.pipeline.layer5_graph import close_neo4j_driver
+
+    reports = []
+    try:
+        for project_id in projects_due_for_compaction():
+            try:
+                reports.append(compact_project(project_id))
+            except Exception as e:
+                logger.error(f"Graph compaction of project {project_id} failed: {e}", exc_info=True)
+    finally:
+        close_neo4j_driver()
+
+    logger.info(f"Compacted {len(reports)} project graph(s) in this cycle")
+    return reports
+
+
+@app.function(image=image, secrets=secrets, timeout=3600)
+def compact_graph(project_id: str, dry_run: bool = False) -> dict:
+    from src.pipeline.graph_compaction import compact_project
+    from src.pipeline.layer5_graph import close_neo4j_driver
+
+    try:
+        return compact_project(project_id, dry_run=dry_run)
+    finally:
+        close_neo4j_driver()
+
+
+@app.local_entrypoint()
+def main(project_id: str, dry_run: bool = False):
+    # modal run graph_compaction.py --project-id <id> [--dry-run]
+    import json
+
+    print(json.dumps(compact_graph.remote(project_id, dry_run), indent=2))
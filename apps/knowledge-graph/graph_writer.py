@@ -0,0 +1,165 @@
+import modal
+import json
+import time
+from collections import OrderedDict
+
+from src.config import settings
+from src.utils.logger import setup_logger
+from src.utils.rabbitmq import build_rabbitmq_params
+from modal_app import app, image, secrets
+
+import pika
+
+logger = setup_logger(__name__)
+
+
+def build_graph_write(job_id, scene_id, project_id, user_id, scene_text, result) -> dict:
+    # Message published by the GPU worker once the pipeline is done; carries
+    # everything save_graph_layer5 needs so the consumer never re-runs a model.
+    return {
+        "job_id": job_id,
+        "scene_id": scene_id,
+        "project_id": project_id,
+        "user_id": user_id,
+        "scene_text": scene_text,
+        "resolved_text": result.resolved_text,
+        "entities": [entity.dict() for entity in result.entities],
+        "relationships": [rel.dict() for rel in result.relationships],
+        "enqueued_at": time.time(),
+    }
+
+
+def _to_layer5_kwargs(message: dict) -> dict:
+    from src.models.schemas import Entity, Relationship
+
+    return {
+        "scene_id": message["scene_id"],
+        "project_id": message.get("project_id") or "",
+        "user_id": message.get("user_id", ""),
+        "scene_text": message["scene_text"],
+        "resolved_text": message.get("resolved_text"),
+        "entities": [Entity(**entity) for entity in message.get("entities", [])],
+        "relationships": [Relationship(**rel) for rel in message.get("relationships", [])],
+    }
+
+
+def _read_batch(channel):
+    # Returns (delivery_tag, redelivered, layer5 kwargs) in queue order.
+    # Unreadable messages are acked and dropped; they can never succeed.
+    batch = []
+    while len(batch) < settings.GRAPH_WRITE_BATCH_SIZE:
+        method_frame, _, body = channel.basic_get(queue=settings.GRAPH_WRITE_QUEUE, auto_ack=False)
+        if method_frame is None:
+            break
+
+        try:
+            kwargs = _to_layer5_kwargs(json.loads(body.decode("utf-8")))
+        except Exception as e:
+            logger.error(f"Dropping invalid graph write message: {e}")
+            channel.basic_ack(delivery_tag=method_frame.delivery_tag)
+            continue
+
+        batch.append((method_frame.delivery_tag, method_frame.redelivered, kwargs))
+    return batch
+
+
+def _latest_per_scene(batch):
+    # Every message is the full state of its scene, so only the newest one per
+    # scene has to be written; older ones are acked along with it. A single
+    # consumer reading in queue order keeps writes for a scene in order.
+    latest = OrderedDict()
+    for delivery_tag, redelivered, kwargs in batch:
+        scene_id = kwargs["scene_id"]
+        tags = latest.pop(scene_id)[0] if scene_id in latest else []
+        latest[scene_id] = (tags + [delivery_tag], redelivered, kwargs)
+    return latest
+
+
+def _write_scene_with_retry(kwargs) -> bool:
+    from src.pipeline.layer5_graph import save_graph_layer5
+
+    for attempt in range(1, settings.GRAPH_WRITE_MAX_ATTEMPTS + 1):
+        try:
+            save_graph_layer5(**kwargs)
+            return True
+        except Exception as e:
+            logger.error(
+                f"Graph write for scene {kwargs['scene_id']} attempt "
+                f"{attempt}/{settings.GRAPH_WRITE_MAX_ATTEMPTS} failed: {e}",
+                exc_info=True,
+            )
+            time.sleep(min(2 * attempt, 5))
+    return False
+
+
+def _write_batch(channel, batch):
+    # Returns (scenes written, whether anything was requeued).
+    from src.pipeline.layer5_graph import save_graph_batch_layer5
+
+    latest = _latest_per_scene(batch)
+    try:
+        save_graph_batch_layer5([kwargs for _, _, kwargs in latest.values()])
+        for tags, _, _ in latest.values():
+            for tag in tags:
+                channel.basic_ack(delivery_tag=tag)
+        return len(latest), False
+    except Exception as e:
+        logger.warning(f"Batched graph write of {len(latest)} scenes failed, retrying per scene: {e}")
+
+    written = 0
+    requeued = False
+    for scene_id, (tags, redelivered, kwargs) in latest.items():
+        if _write_scene_with_retry(kwargs):
+            written += 1
+            for tag in tags:
+                channel.basic_ack(delivery_tag=tag)
+            continue
+
+        # Requeued messages keep their queue position, so a later write for the
+        # same scene still lands after this one. Give up on the second delivery.
+        logger.error(f"Graph write for scene {scene_id} failed; {'dropping' if redelivered else 'requeueing'}")
+        requeued = requeued or not redelivered
+        for tag in tags:
+            channel.basic_nack(delivery_tag=tag, requeue=not redelivered)
+    return written, requeued
+
+
+@app.function(
+    image=image,
+    secrets=secrets,
+    schedule=modal.Period(seconds=settings.GRAPH_WRITE_POLL_INTERVAL_SECONDS),
+    timeout=1800,
+    max_containers=1,
+)
+def drain_graph_writes():
+    if not settings.CLOUDAMQP_URL:
+        raise ValueError("Missing CLOUDAMQP_URL (or RABBITMQ_URL) in environment")
+
+    from src.pipeline.layer5_graph import close_graph_sink
+
+    written = 0
+    connection = None
+    try:
+        connection = pika.BlockingConnection(build_rabbitmq_params())
+        channel = connection.channel()
+        channel.queue_declare(queue=settings.GRAPH_WRITE_QUEUE, durable=True)
+
+        while True:
+            batch = _read_batch(channel)
+            if not batch:
+                break
+            batch_written, requeued = _write_batch(channel, batch)
+            written += batch_written
+            if requeued:
+                # Leave requeued writes for the next cycle instead of
+                # spinning on them now.
+                break
+    except Exception as e:
+        logger.error(f"Graph write consumer failed: {e}", exc_info=True)
+    finally:
+        if connection and connection.is_open:
+            connection.close()
+        close_graph_sink()
+
+    if written:
+        logger.info(f"Wrote {written} scene graph(s) to Neo4j in this cycle")
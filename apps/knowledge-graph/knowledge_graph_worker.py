@@ -27,8 +27,10 @@ class KnowledgeGraphWorker:
 
         import spacy
         from src.models.llm_loader import get_llm_loader
-        from src.pipeline.layer5_graph import save_graph_layer5
+        from src.pipeline.layer5_graph import get_graph_sink, save_graph_layer5
         from src.pipeline.orchestrator import NarrativeAnalysisPipeline
+        from src.utils.rabbitmq import publish_json
+        from graph_writer import build_graph_write
 
         self.logger = setup_logger(__name__)
         self.logger.info("Container started - loading models...")
@@ -42,13 +44,26 @@ class KnowledgeGraphWorker:
         self.llm_loader = get_llm_loader()
         self.logger.info("LLM loaded and ready")
 
+        if not settings.GRAPH_WRITE_BEHIND:
+            sink = get_graph_sink()
+            schema_version = sink.ensure_schema()
+            self.logger.info(f"Graph sink {sink.name} ready (schema v{schema_version})")
+
         self._save_graph_layer5 = save_graph_layer5
+        self._publish_json = publish_json
+        self._build_graph_write = build_graph_write
         self.pipeline = NarrativeAnalysisPipeline(nlp=self.nlp)
         self.logger.info("Pipeline ready")
 
+    @modal.exit()
+    def close_connections(self):
+        from src.pipeline.layer5_graph import close_graph_sink
+
+        close_graph_sink()
+
     @modal.method()
-    def process_job(self, job_id: str, scene_text: str, user_id: str, fs_node_id: str) -> dict:
-        self.logger.info(f"Processing job {job_id} for fs_node {fs_node_id}")
+    def process_job(self, job_id: str, scene_text: str, user_id: str, fs_node_id: str, project_id: str = "") -> dict:
+        self.logger.info(f"Processing job {job_id} for fs_node {fs_node_id} in project {project_id or '-'}")
         self.logger.info(f"Scene length: {len(scene_text)} characters")
         start_time = time.time()
 
@@ -56,15 +71,26 @@ class KnowledgeGraphWorker:
             result = self.pipeline.process_scene(scene_text=scene_text)
             self.logger.info(f"Pipeline complete — {len(result.entities)} entities, {len(result.relationships)} relationships")
 
-            self.logger.info("Starting Layer 5: saving graph to Neo4j...")
-            graph_result = self._save_graph_layer5(
-                scene_id=fs_node_id,
-                user_id=user_id,
-                scene_text=scene_text,
-                entities=result.entities,
-                relationships=result.relationships,
-            )
-            self.logger.info(f"Layer 5 complete: {graph_result}")
+            if settings.GRAPH_WRITE_BEHIND:
+                # Hand the graph write to the CPU consumer so this GPU
+                # container is free for the next scene right away.
+                self._publish_json(
+                    settings.GRAPH_WRITE_QUEUE,
+                    self._build_graph_write(job_id, fs_node_id, project_id, user_id, scene_text, result),
+                )
+                self.logger.info(f"Layer 5 queued on {settings.GRAPH_WRITE_QUEUE}")
+            else:
+                self.logger.info("Starting Layer 5: saving graph to Neo4j...")
+                graph_result = self._save_graph_layer5(
+                    scene_id=fs_node_id,
+                    project_id=project_id,
+                    user_id=user_id,
+                    scene_text=scene_text,
+                    entities=result.entities,
+                    relationships=result.relationships,
+                    resolved_text=result.resolved_text,
+                )
+                self.logger.info(f"Layer 5 complete: {graph_result}")
 
             elapsed = time.time() - start_time
             self.logger.info(f"Job {job_id} completed in {elapsed:.2f}s")
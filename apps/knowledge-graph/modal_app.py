@@ -16,7 +16,7 @@ image = (
     modal.Image.debian_slim(python_version="3.10")
     .pip_install([
         "torch==2.1.0",
-        "transformers==4.36.0",
+        "transformers==4.37.2",  # prompt lookup decoding needs >= 4.37
         "accelerate==0.25.0",
         "bitsandbytes>=0.43.0",
         "scipy",
@@ -26,7 +26,7 @@ image = (
         "spacy==3.5.4",
         "pydantic==1.10.13",
         "supabase==1.2.0", 
-        "neo4j==5.14.0",  
+        "neo4j==5.20.0",  
         "python-dotenv"
     ])
     .pip_install([SPACY_MODEL_WHEEL])
@@ -34,6 +34,8 @@ image = (
     .run_commands("python -m coreferee install en")
     .add_local_dir("src", remote_path="/root/src") # mount local src/ at /root/src/ in the container
     .add_local_file("knowledge_graph_worker.py", remote_path="/root/knowledge_graph_worker.py")
+    .add_local_file("graph_writer.py", remote_path="/root/graph_writer.py")
+    .add_local_file("graph_compaction.py", remote_path="/root/graph_compaction.py")
     .add_local_file("modal_app.py", remote_path="/root/modal_app.py")
 )
 
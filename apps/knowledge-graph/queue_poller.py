@@ -1,58 +1,23 @@
 import modal
 import json
-import time
 
 
 from src.config import settings
 from src.utils.logger import setup_logger
+from src.utils.rabbitmq import build_rabbitmq_params, publish_json
 from modal_app import app, image, secrets
 
 import pika
 from knowledge_graph_worker import KnowledgeGraphWorker
+import graph_writer  # noqa: F401  registers the Layer 5 write-behind consumer on the app
+import graph_compaction  # noqa: F401  registers the scheduled graph compaction on the app
 
 logger = setup_logger(__name__)
 
 
-def _build_rabbitmq_params():
-    params = pika.URLParameters(settings.CLOUDAMQP_URL)
-    # Keep heartbeat high enough for cloud/network jitter.
-    params.heartbeat = max(settings.RABBITMQ_HEARTBEAT, 800)
-    params.blocked_connection_timeout = settings.RABBITMQ_BLOCKED_CONNECTION_TIMEOUT
-    return params
-
-
 def _publish_result_with_retry(output, max_attempts=3):
-    last_error = None
-
-    for attempt in range(1, max_attempts + 1):
-        connection = None
-        try:
-            connection = pika.BlockingConnection(_build_rabbitmq_params())
-            channel = connection.channel()
-            channel.queue_declare(queue=settings.SCENE_ANALYSIS_RESULTS_QUEUE, durable=True)
-
-            channel.basic_publish(
-                exchange="",
-                routing_key=settings.SCENE_ANALYSIS_RESULTS_QUEUE,
-                body=json.dumps(output),
-                properties=pika.BasicProperties(
-                    delivery_mode=2,
-                    content_type="application/json"
-                )
-            )
-            return
-        except Exception as e:
-            last_error = e
-            logger.error(
-                f"Publish attempt {attempt}/{max_attempts} failed: {e}",
-                exc_info=True,
-            )
-            time.sleep(min(2 * attempt, 5))
-        finally:
-            if connection and connection.is_open:
-                connection.close()
+    publish_json(settings.SCENE_ANALYSIS_RESULTS_QUEUE, output, max_attempts=max_attempts)
 
-    raise RuntimeError(f"Failed to publish result after {max_attempts} attempts: {last_error}")
 
 # this decorator makes the model trigger this function periodically based on the schedule defined
 @app.function(
@@ -81,7 +46,7 @@ def poll_queue():
         body = None
 
         try:
-            connection = pika.BlockingConnection(_build_rabbitmq_params())
+            connection = pika.BlockingConnection(build_rabbitmq_params())
             channel = connection.channel()
             channel.queue_declare(queue=settings.SCENE_ANALYSIS_QUEUE, durable=True)
             channel.queue_declare(queue=settings.SCENE_ANALYSIS_RESULTS_QUEUE, durable=True)
@@ -127,6 +92,7 @@ def poll_queue():
                 scene_text = message["scene_text"]
                 user_id = message.get("user_id", "")
                 fs_node_id = message.get("fs_node_id", job_id)
+                project_id = message.get("project_id") or ""
             except (json.JSONDecodeError, KeyError) as e:
                 logger.error(f"Invalid message format: {e}")
                 continue
@@ -145,6 +111,7 @@ def poll_queue():
                 scene_text=scene_text,
                 user_id=user_id,
                 fs_node_id=fs_node_id,
+                project_id=project_id,
             )
 
             _publish_result_with_retry(output)
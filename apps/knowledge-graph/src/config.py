@@ -22,9 +22,46 @@ class Settings:
     )
     MAX_JOBS_PER_POLL: int = max(1, int(os.environ.get("MAX_JOBS_PER_POLL", "5")))
 
+    # Layer 5 write-behind: the GPU worker publishes finished results to
+    # GRAPH_WRITE_QUEUE and a CPU consumer writes them to Neo4j in batches.
+    GRAPH_WRITE_BEHIND: bool = os.environ.get("GRAPH_WRITE_BEHIND", "true").lower() in {"1", "true", "yes"}
+    GRAPH_WRITE_QUEUE: str = os.environ.get("GRAPH_WRITE_QUEUE") or "graph_write_queue"
+    GRAPH_WRITE_POLL_INTERVAL_SECONDS: int = max(1, int(os.environ.get("GRAPH_WRITE_POLL_INTERVAL_SECONDS") or "30"))
+    GRAPH_WRITE_BATCH_SIZE: int = max(1, int(os.environ.get("GRAPH_WRITE_BATCH_SIZE") or "25"))
+    GRAPH_WRITE_MAX_ATTEMPTS: int = max(1, int(os.environ.get("GRAPH_WRITE_MAX_ATTEMPTS") or "3"))
+
+    # Periodic Layer 5 compaction: merges duplicate entities and prunes facts
+    # below GRAPH_COMPACTION_MIN_CONFIDENCE or without a scene, in
+    # transactions of at most GRAPH_COMPACTION_BATCH_SIZE rows. Layer 3
+    # already drops facts under 0.5, so the bar must sit above that to prune.
+    GRAPH_COMPACTION_INTERVAL_HOURS: int = max(1, int(os.environ.get("GRAPH_COMPACTION_INTERVAL_HOURS") or "24"))
+    GRAPH_COMPACTION_MIN_CONFIDENCE: float = float(os.environ.get("GRAPH_COMPACTION_MIN_CONFIDENCE") or "0.6")
+    GRAPH_COMPACTION_BATCH_SIZE: int = max(1, int(os.environ.get("GRAPH_COMPACTION_BATCH_SIZE") or "500"))
+
     MODEL_NAME: str = os.environ.get("MODEL_NAME", "teknium/OpenHermes-2.5-Mistral-7B")
     MODEL_DEVICE: str = os.environ.get("MODEL_DEVICE", "cuda")
     MODEL_MAX_LENGTH: int = int(os.environ.get("MODEL_MAX_LENGTH", "512"))
+    MODEL_PREFIX_CACHE: bool = os.environ.get("MODEL_PREFIX_CACHE", "true").lower() in {"1", "true", "yes"}
+    # Assisted decoding for the transformers engine: a small draft model that
+    # shares MODEL_NAME's tokenizer, or n-gram prompt lookup when no draft model is set.
+    ASSISTANT_MODEL_NAME: Optional[str] = os.environ.get("ASSISTANT_MODEL_NAME", None) or None
+    PROMPT_LOOKUP_NUM_TOKENS: int = int(os.environ.get("PROMPT_LOOKUP_NUM_TOKENS", "0"))
+
+    # Generation backend for Layer 3: "transformers" (GPU, bitsandbytes nf4),
+    # "llama_cpp" (CPU, quantized GGUF) or "fake" (deterministic, for tests).
+    LLM_ENGINE: str = os.environ.get("LLM_ENGINE", "transformers")
+    GGUF_MODEL_PATH: Optional[str] = os.environ.get("GGUF_MODEL_PATH", None) or None
+    GGUF_MODEL_REPO: str = os.environ.get("GGUF_MODEL_REPO") or "TheBloke/OpenHermes-2.5-Mistral-7B-GGUF"
+    GGUF_MODEL_FILE: str = os.environ.get("GGUF_MODEL_FILE") or "openhermes-2.5-mistral-7b.Q4_K_M.gguf"
+    LLM_CONTEXT_LENGTH: int = int(os.environ.get("LLM_CONTEXT_LENGTH", "4096"))
+    LLM_CPU_THREADS: int = int(os.environ.get("LLM_CPU_THREADS", "0"))
+    FAKE_LLM_RESPONSE: Optional[str] = os.environ.get("FAKE_LLM_RESPONSE", None) or None
+
+    # Layer 3 streaming: validate facts as they are generated and stop early
+    # after enough accepted facts or a run of rejections (0 = no limit).
+    LAYER3_STREAMING: bool = os.environ.get("LAYER3_STREAMING", "false").lower() in {"1", "true", "yes"}
+    LAYER3_MAX_ACCEPTED_FACTS: int = int(os.environ.get("LAYER3_MAX_ACCEPTED_FACTS", "0"))
+    LAYER3_MAX_CONSECUTIVE_REJECTIONS: int = int(os.environ.get("LAYER3_MAX_CONSECUTIVE_REJECTIONS", "0"))
     # MODEL_TEMPERATURE: float = float(os.environ.get("MODEL_TEMPERATURE", "0.1"))
 
     SPACY_MODEL: str = os.environ.get("SPACY_MODEL", "en_core_web_lg")
@@ -35,9 +72,30 @@ class Settings:
 
     LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")
 
+    # Layer 5 storage: "neo4j", or "sqlite" for an embedded local graph
+    # (GRAPH_SQLITE_PATH=":memory:" keeps it in memory, e.g. for benchmarks).
+    GRAPH_SINK: str = os.environ.get("GRAPH_SINK") or "neo4j"
+    GRAPH_SQLITE_PATH: str = os.environ.get("GRAPH_SQLITE_PATH") or "story_graph.sqlite3"
+
+    # Relationship types are clustered into a bounded per-project vocabulary:
+    # a new label joins the closest existing type with the same head verb and
+    # negation at or above this similarity, and once a project has
+    # RELATION_VOCAB_MAX_TYPES types the labels that match nothing are written
+    # as the generic related_to type.
+    RELATION_VOCAB_SIMILARITY: float = float(os.environ.get("RELATION_VOCAB_SIMILARITY") or "0.8")
+    RELATION_VOCAB_MAX_TYPES: int = int(os.environ.get("RELATION_VOCAB_MAX_TYPES") or "64")
+    RELATION_EMBEDDING_CACHE_SIZE: int = int(os.environ.get("RELATION_EMBEDDING_CACHE_SIZE") or "4096")
+
     NEO4J_URI: Optional[str] = os.environ.get("NEO4J_URI", None)
     NEO4J_USERNAME: Optional[str] = os.environ.get("NEO4J_USER", None)
     NEO4J_PASSWORD: Optional[str] = os.environ.get("NEO4J_PASSWORD", None)
+    NEO4J_MAX_POOL_SIZE: int = int(os.environ.get("NEO4J_MAX_POOL_SIZE") or "10")
+    NEO4J_MAX_CONNECTION_LIFETIME_SECONDS: int = int(os.environ.get("NEO4J_MAX_CONNECTION_LIFETIME_SECONDS") or "3600")
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT_SECONDS: int = int(
+        os.environ.get("NEO4J_CONNECTION_ACQUISITION_TIMEOUT_SECONDS") or "60"
+    )
+    # Connections idle for longer than this are pinged before reuse.
+    NEO4J_LIVENESS_CHECK_SECONDS: int = int(os.environ.get("NEO4J_LIVENESS_CHECK_SECONDS") or "30")
 
 
 settings = Settings()
\ No newline at end of file
@@ -7,6 +7,8 @@ from src.models.schemas import (
     SceneAnalysisRequest,
     SceneAnalysisResponse,
     RawEntity,
+    SceneSentence,
+    SceneContext,
 )
 
 __all__ = [
@@ -17,4 +19,6 @@ __all__ = [
     "SceneAnalysisRequest",
     "SceneAnalysisResponse",
     "RawEntity",
+    "SceneSentence",
+    "SceneContext",
 ]
\ No newline at end of file
@@ -0,0 +1,39 @@
+import json
+from typing import Iterator, List, Optional
+
+from src.config import settings
+from src.models.llm_engine import LLMEngine
+
+EMPTY_GRAPH_RESPONSE = json.dumps({"entities": [], "relationships": []})
+STREAM_CHUNK_CHARS = 16
+
+
+class FakeLLMEngine(LLMEngine):
+    """Deterministic engine for tests and offline benchmarks; never loads a model."""
+
+    name = "fake"
+
+    def __init__(self, response: Optional[str] = None):
+        self.response = response if response is not None else (settings.FAKE_LLM_RESPONSE or EMPTY_GRAPH_RESPONSE)
+        self.prompts: List[str] = []
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> str:
+        self.prompts.append(prompt)
+        return self.response
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        response = self.generate(prompt, max_tokens=max_tokens, stop_on_json=stop_on_json, prefix=prefix)
+        for start in range(0, len(response), STREAM_CHUNK_CHARS):
+            yield response[start:start + STREAM_CHUNK_CHARS]
@@ -0,0 +1,98 @@
+from typing import Iterator, Optional
+
+from src.config import settings
+from src.models.llm_engine import LEAKAGE_MARKERS, LLMEngine, format_chat_prompt
+from src.models.stopping import JsonObjectScanner
+from src.utils.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+class LlamaCppEngine(LLMEngine):
+    """CPU engine running an int4/int8 GGUF build of the model through llama.cpp."""
+
+    name = "llama_cpp"
+
+    _instance: Optional['LlamaCppEngine'] = None
+    _llm = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self._llm is None:
+            self._load_model()
+
+    def _load_model(self):
+        from llama_cpp import Llama
+
+        logger.info("=" * 60)
+        logger.info("Loading GGUF model with llama.cpp")
+        logger.info("=" * 60)
+
+        common = {
+            "n_ctx": settings.LLM_CONTEXT_LENGTH,
+            "n_threads": settings.LLM_CPU_THREADS or None,
+            "verbose": False,
+        }
+
+        try:
+            if settings.GGUF_MODEL_PATH:
+                logger.info(f"Model file: {settings.GGUF_MODEL_PATH}")
+                self._llm = Llama(model_path=settings.GGUF_MODEL_PATH, **common)
+            else:
+                logger.info(f"Model: {settings.GGUF_MODEL_REPO}/{settings.GGUF_MODEL_FILE}")
+                self._llm = Llama.from_pretrained(
+                    repo_id=settings.GGUF_MODEL_REPO,
+                    filename=settings.GGUF_MODEL_FILE,
+                    **common,
+                )
+            logger.info("Model loaded successfully")
+            logger.info("=" * 60)
+
+        except Exception as e:
+            logger.error(f"Failed to load GGUF model: {e}")
+            raise
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> str:
+        chunks = self.generate_stream(prompt, max_tokens=max_tokens, stop_on_json=stop_on_json, prefix=prefix)
+        return "".join(chunks).strip()
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        # llama.cpp keeps the KV state of the previous call and only evaluates
+        # tokens after the longest common prefix, so the static prefix is
+        # reused without extra work here.
+        formatted_prompt = format_chat_prompt(prompt, prefix)
+        scanner = JsonObjectScanner(LEAKAGE_MARKERS) if stop_on_json else None
+
+        stream = self._llm.create_completion(
+            formatted_prompt,
+            max_tokens=max_tokens,
+            temperature=0.0,
+            repeat_penalty=1.1,
+            stop=["<|im_end|>", *LEAKAGE_MARKERS],
+            stream=True,
+        )
+        for chunk in stream:
+            text = chunk["choices"][0]["text"]
+            yield text
+            if scanner is not None and scanner.feed(text):
+                logger.info(
+                    f"Generation stopped early ({'json complete' if scanner.complete else 'leakage marker'})"
+                )
+                break
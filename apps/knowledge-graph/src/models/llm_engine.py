@@ -0,0 +1,49 @@
+from typing import Iterator, Optional
+
+# Continuations that mean the model has stopped answering and started
+# writing the next chat turn.
+LEAKAGE_MARKERS = ("\nHuman:", "\nUser:", "\nUSER:", "\n### Instruction")
+
+SYSTEM_HEADER = (
+    "<|im_start|>system\n"
+    "You are an expert literary analyst. "
+    "Extract structured information in valid JSON format only. "
+    "No markdown, no explanation.<|im_end|>\n"
+    "<|im_start|>user\n"
+)
+ASSISTANT_HEADER = "<|im_end|>\n<|im_start|>assistant\n"
+
+
+def format_chat_prompt(prompt: str, prefix: Optional[str] = None) -> str:
+    return SYSTEM_HEADER + (prefix or "") + prompt + ASSISTANT_HEADER
+
+
+class LLMEngine:
+    """
+    Interface shared by the Layer 3 generation backends.
+
+    `prefix` is static instruction text placed before `prompt` in the user turn;
+    engines that can reuse its prefill between calls should do so. With
+    `stop_on_json` generation ends once the first JSON object is closed.
+    """
+
+    name = "base"
+
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> str:
+        raise NotImplementedError
+
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        # Engines without native streaming yield the whole response at once.
+        yield self.generate(prompt, max_tokens=max_tokens, stop_on_json=stop_on_json, prefix=prefix)
@@ -1,18 +1,26 @@
-from typing import Optional
+from threading import Thread
+from typing import Dict, Iterator, List, Optional, Set
 
 from src.config import settings
+from src.models.llm_engine import ASSISTANT_HEADER, LEAKAGE_MARKERS, SYSTEM_HEADER, LLMEngine
+from src.models.stopping import CancelGeneration, JsonObjectStoppingCriteria
 from src.utils.logger import setup_logger
 
 
 logger = setup_logger(__name__)
 
 
-class LLMModelLoader:
+class LLMModelLoader(LLMEngine):
+
+    name = "transformers"
 
     _instance: Optional['LLMModelLoader'] = None
     _model = None
     _tokenizer = None
     _device = None
+    _assistant_model = None
+    _prefix_cache: Dict[str, tuple] = {}
+    _prefix_mismatches: Set[str] = set()
 
     def __new__(cls):
         if cls._instance is None:
@@ -63,11 +71,24 @@ class LLMModelLoader:
                     trust_remote_code=True,
                 )
 
+                if settings.ASSISTANT_MODEL_NAME:
+                    logger.info(f"Loading draft model for assisted decoding: {settings.ASSISTANT_MODEL_NAME}")
+                    self._assistant_model = AutoModelForCausalLM.from_pretrained(
+                        settings.ASSISTANT_MODEL_NAME,
+                        torch_dtype=torch.float16,
+                        device_map="auto",
+                        low_cpu_mem_usage=True,
+                        trust_remote_code=True,
+                    )
+
                 vram_used = torch.cuda.memory_allocated() / 1e9
                 logger.info(f"Model loaded — VRAM used: {vram_used:.1f}GB / {vram_total:.1f}GB ({100*vram_used/vram_total:.0f}%)")
 
             else:
-                logger.warning("No CUDA available — loading in fp32 on CPU (will be slow)")
+                logger.warning(
+                    "No CUDA available — loading in fp32 on CPU (will be slow). "
+                    "Set LLM_ENGINE=llama_cpp to run a quantized GGUF model on CPU instead."
+                )
                 self._model = AutoModelForCausalLM.from_pretrained(
                     settings.MODEL_NAME,
                     torch_dtype=torch.float32,
@@ -101,35 +122,194 @@ class LLMModelLoader:
             self._load_model()
         return self._device
 
-    def generate(self, prompt: str, max_tokens: int = 512) -> str:
+    def _get_prefix_cache(self, prefix_text: str):
+        # Prefill the static part of the prompt once per container. The legacy
+        # tuple form is kept because generate() copies it into a fresh cache on
+        # every call, so the stored tensors are never mutated.
+        import torch
+
+        cached = self._prefix_cache.get(prefix_text)
+        if cached is not None:
+            return cached
+
+        prefix_ids = self._tokenizer(prefix_text, return_tensors="pt")["input_ids"].to(self._device)
+        with torch.no_grad():
+            outputs = self._model(input_ids=prefix_ids, use_cache=True)
+
+        past_key_values = outputs.past_key_values
+        if hasattr(past_key_values, "to_legacy_cache"):
+            past_key_values = past_key_values.to_legacy_cache()
+
+        self._prefix_cache[prefix_text] = (prefix_ids, past_key_values)
+        logger.info(f"Cached KV prefix: {prefix_ids.shape[1]} tokens")
+        return self._prefix_cache[prefix_text]
+
+    def _assisted_generation_kwargs(self) -> dict:
+        # Greedy assisted decoding returns the same tokens as plain greedy
+        # decoding; it only changes how many forward passes are needed.
+        if self._assistant_model is not None:
+            return {"assistant_model": self._assistant_model}
+
+        if settings.PROMPT_LOOKUP_NUM_TOKENS > 0:
+            from transformers import GenerationConfig
+
+            if hasattr(GenerationConfig(), "prompt_lookup_num_tokens"):
+                # Layer 3 output copies entity names and evidence from the
+                # scene, so n-gram lookups in the prompt make good drafts.
+                return {"prompt_lookup_num_tokens": settings.PROMPT_LOOKUP_NUM_TOKENS}
+            logger.warning("Installed transformers has no prompt lookup decoding — ignoring PROMPT_LOOKUP_NUM_TOKENS")
+
+        return {}
+
+    def _encode(self, prompt: str, prefix: Optional[str], use_prefix_cache: bool = True) -> dict:
         import torch
 
-        formatted_prompt = (
-            "<|im_start|>system\n"
-            "You are an expert literary analyst. "
-            "Extract structured information in valid JSON format only. "
-            "No markdown, no explanation.<|im_end|>\n"
-            "<|im_start|>user\n"
-            f"{prompt}<|im_end|>\n"
-            "<|im_start|>assistant\n"
+        prefix_text = SYSTEM_HEADER + (prefix or "")
+        # Always tokenize the whole prompt, so the cached and uncached paths
+        # feed the model the same ids. Encoding the suffix on its own differs
+        # with SentencePiece tokenizers, which add a "▁" to its first word.
+        full = self._tokenizer(prefix_text + prompt + ASSISTANT_HEADER, return_tensors="pt").to(self._device)
+        uncached = {"inputs": full, "past_key_values": None}
+
+        if prefix is None or not settings.MODEL_PREFIX_CACHE or not use_prefix_cache:
+            return uncached
+
+        try:
+            prefix_ids, past_key_values = self._get_prefix_cache(prefix_text)
+        except Exception as e:
+            logger.warning(f"KV prefix caching failed ({e}) — encoding full prompt")
+            return uncached
+
+        # The cache only applies if the prefix tokenizes the same on its own
+        # as inside the full prompt (no token merged across the boundary).
+        input_ids = full["input_ids"]
+        prefix_length = prefix_ids.shape[1]
+        if input_ids.shape[1] <= prefix_length or not torch.equal(input_ids[:, :prefix_length], prefix_ids):
+            if prefix_text not in self._prefix_mismatches:
+                self._prefix_mismatches.add(prefix_text)
+                logger.warning("Prompt prefix tokenizes differently inside the full prompt — not using its KV cache")
+            return uncached
+
+        return {"inputs": full, "past_key_values": past_key_values}
+
+    def _prepare_generation(
+        self,
+        prompt: str,
+        max_tokens: int,
+        stop_on_json: bool,
+        prefix: Optional[str],
+        extra_criteria: tuple = (),
+    ) -> tuple:
+        # The KV cache of SYSTEM_HEADER + prefix is computed once and reused across calls.
+        from transformers import StoppingCriteriaList
+
+        generate_kwargs = self._assisted_generation_kwargs()
+
+        # A draft model is handed the main model's kwargs, so it can't start
+        # from the main model's prefix KV cache.
+        encoded = self._encode(prompt, prefix, use_prefix_cache="assistant_model" not in generate_kwargs)
+        inputs = encoded["inputs"]
+        prompt_length = inputs['input_ids'].shape[1]
+
+        if encoded["past_key_values"] is not None:
+            generate_kwargs["past_key_values"] = encoded["past_key_values"]
+
+        criteria = list(extra_criteria)
+        json_stop = None
+        if stop_on_json:
+            json_stop = JsonObjectStoppingCriteria(self._tokenizer, prompt_length, LEAKAGE_MARKERS)
+            criteria.append(json_stop)
+
+        generate_kwargs.update(
+            inputs,
+            max_new_tokens=max_tokens,
+            do_sample=False,          # greedy decoding — deterministic, faster, better for JSON
+            repetition_penalty=1.1,
+            pad_token_id=self._tokenizer.eos_token_id,
+            eos_token_id=self._tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList(criteria) if criteria else None,
         )
+        return generate_kwargs, prompt_length, json_stop
 
-        inputs = self._tokenizer(formatted_prompt, return_tensors="pt").to(self._device)
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> str:
+        import torch
+
+        generate_kwargs, prompt_length, json_stop = self._prepare_generation(
+            prompt, max_tokens, stop_on_json, prefix
+        )
 
         with torch.no_grad():
-            outputs = self._model.generate(
-                **inputs,
-                max_new_tokens=max_tokens,
-                do_sample=False,          # greedy decoding — deterministic, faster, better for JSON
-                repetition_penalty=1.1,
-                pad_token_id=self._tokenizer.eos_token_id,
-                eos_token_id=self._tokenizer.eos_token_id,
-            )
+            outputs = self._model.generate(**generate_kwargs)
 
-        generated_tokens = outputs[0][inputs['input_ids'].shape[1]:]
+        generated_tokens = outputs[0][prompt_length:]
+        if json_stop is not None and json_stop.scanner.done:
+            logger.info(
+                f"Generation stopped early after {len(generated_tokens)} tokens "
+                f"({'json complete' if json_stop.scanner.complete else 'leakage marker'})"
+            )
         response = self._tokenizer.decode(generated_tokens, skip_special_tokens=True)
         return response.strip()
 
+    def generate_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 512,
+        stop_on_json: bool = True,
+        prefix: Optional[str] = None,
+    ) -> Iterator[str]:
+        from transformers import TextIteratorStreamer
+
+        cancel = CancelGeneration()
+        streamer = TextIteratorStreamer(self._tokenizer, skip_prompt=True, skip_special_tokens=True)
+        generate_kwargs, _, _ = self._prepare_generation(
+            prompt, max_tokens, stop_on_json, prefix, extra_criteria=(cancel,)
+        )
+        generate_kwargs["streamer"] = streamer
+
+        errors: List[BaseException] = []
+
+        def run() -> None:
+            # A failed generate never ends the streamer, so end it here and
+            # re-raise in the consumer instead of blocking it forever.
+            try:
+                self._model.generate(**generate_kwargs)
+            except BaseException as exc:
+                errors.append(exc)
+                streamer.end()
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                yield text
+        finally:
+            # Closing the generator early (e.g. a Layer 3 cut-off) stops the
+            # model at its next decoding step.
+            cancel.cancelled = True
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+
+def get_llm_loader() -> LLMEngine:
+    engine = settings.LLM_ENGINE.lower()
+
+    if engine == "transformers":
+        return LLMModelLoader()
+    if engine == "llama_cpp":
+        from src.models.llama_cpp_engine import LlamaCppEngine
+
+        return LlamaCppEngine()
+    if engine == "fake":
+        from src.models.fake_engine import FakeLLMEngine
+
+        return FakeLLMEngine()
 
-def get_llm_loader() -> LLMModelLoader:
-    return LLMModelLoader()
\ No newline at end of file
+    raise ValueError(f"Unknown LLM_ENGINE '{settings.LLM_ENGINE}'. Use transformers, llama_cpp or fake.")
\ No newline at end of file
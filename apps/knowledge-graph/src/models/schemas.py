@@ -17,9 +17,25 @@ class Relationship(BaseModel):
     when: Optional[str] = None  # time expression e.g. "10 minutes to 5", "after noon"
     category: Optional[str] = None
     evidence: Optional[str] = None
+    evidence_start: Optional[int] = None  # character offsets of the evidence sentence in the resolved text
+    evidence_end: Optional[int] = None
     confidence: Optional[float] = None
 
 
+class SceneSentence(BaseModel):
+    start: int
+    end: int
+    text: str
+    normalized: str
+
+
+class SceneContext(BaseModel):
+    # Sentence segmentation of the (coreference-resolved) scene, shared by the
+    # pipeline layers so the text is only split once.
+    text: str
+    sentences: List[SceneSentence] = Field(default_factory=list)
+
+
 class PipelineMetadata(BaseModel):
     num_entities: int
     num_relationships: int
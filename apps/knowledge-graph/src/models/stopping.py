@@ -0,0 +1,107 @@
+# Also shipped on its own into the query engine's answer image
+# (query-engine/modal_answer.py), so it must only import the standard library.
+from typing import Iterable, List
+
+
+class JsonObjectScanner:
+    """Tracks brace/string state over streamed text until the first top-level JSON object closes."""
+
+    def __init__(self, stop_markers: Iterable[str] = ()):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.complete = False
+        self.leaked = False
+        self._markers = tuple(marker for marker in stop_markers if marker)
+        self._tail_len = max((len(marker) for marker in self._markers), default=1) - 1
+        self._tail = ""
+
+    @property
+    def done(self) -> bool:
+        return self.complete or self.leaked
+
+    def feed(self, text: str) -> bool:
+        if self.done or not text:
+            return self.done
+
+        if self._markers:
+            window = self._tail + text
+            if any(marker in window for marker in self._markers):
+                self.leaked = True
+                return True
+            self._tail = window[-self._tail_len:] if self._tail_len else ""
+
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"' and self.started:
+                self.in_string = True
+            elif char == "{":
+                self.started = True
+                self.depth += 1
+            elif char == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+
+        return False
+
+
+class JsonObjectStoppingCriteria:
+    """
+    transformers stopping criterion that halts single-sequence generation once the
+    top-level JSON object is closed or one of the leakage markers is produced.
+    """
+
+    def __init__(self, tokenizer, prompt_length: int, stop_markers: Iterable[str] = ()):
+        self.scanner = JsonObjectScanner(stop_markers)
+        self._tokenizer = tokenizer
+        self._seen = prompt_length
+        # Tokens are decoded in small windows (reset at each newline) so that
+        # multi-token characters and word-initial spaces come out right without
+        # re-decoding the whole continuation on every step.
+        self._token_cache: List[int] = []
+        self._emitted = 0
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        if self.scanner.done:
+            return True
+
+        # Assisted decoding can append several tokens per step.
+        new_ids = input_ids[0, self._seen:].tolist()
+        self._seen = input_ids.shape[1]
+        if not new_ids:
+            return False
+
+        self._token_cache.extend(new_ids)
+        text = self._tokenizer.decode(self._token_cache, skip_special_tokens=True)
+        if text.endswith("\ufffd"):
+            return False
+
+        new_text = text[self._emitted:]
+        if text.endswith("\n"):
+            self._token_cache = []
+            self._emitted = 0
+        else:
+            self._emitted = len(text)
+
+        return self.scanner.feed(new_text)
+
+
+class CancelGeneration:
+    """Stopping criterion flipped from another thread to end a streamed generation."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancelled
@@ -1,5 +1,6 @@
 __all__ = [
     "extract_entities_layer1",
+    "extract_entities_with_context_layer1",
     "postprocess_entities_layer2",
     "enrich_and_extract_batch",
     "NarrativeAnalysisPipeline",
@@ -12,6 +13,10 @@ def __getattr__(name):
         from src.pipeline.layer1_spacy import extract_entities_layer1
 
         return extract_entities_layer1
+    if name == "extract_entities_with_context_layer1":
+        from src.pipeline.layer1_spacy import extract_entities_with_context_layer1
+
+        return extract_entities_with_context_layer1
     if name == "postprocess_entities_layer2":
         from src.pipeline.layer2_postprocess import postprocess_entities_layer2
 
@@ -0,0 +1,412 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.pipeline.graph_stats import entity_stat_key
+from src.pipeline.layer2_postprocess import EntityPostProcessor
+from src.pipeline.layer5_graph import (
+    ENTITY_LABELS,
+    Neo4jGraphSink,
+    _canonical_name,
+    ensure_graph_schema,
+    get_neo4j_driver,
+)
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Relationship kinds Layer 5 manages itself; every other relationship on an
+# entity is a scene-owned story edge.
+_STRUCTURAL_TYPES = ["APPEARS_IN", "SOURCE_OF", "TARGETS"]
+
+
+def plan_entity_merges(entities: List[dict]) -> List[dict]:
+    """
+    Group a project's entity nodes ({"id", "label", "canonical_name", "name"})
+    into merges using Layer 2's rules: names with the same canonical form are
+    one entity, and a name whose tokens are a subset of exactly one longer
+    name's (e.g. "Maloney" and "Mary Maloney") is folded into it. Ambiguous
+    short names are left alone.
+    """
+    processor = EntityPostProcessor()
+    by_label: Dict[str, List[dict]] = defaultdict(list)
+    for entity in entities:
+        by_label[entity["label"]].append(entity)
+
+    plans = []
+    for label, nodes in sorted(by_label.items()):
+        groups: Dict[str, List[dict]] = defaultdict(list)
+        for node in nodes:
+            groups[_canonical_name(node["name"] or node["canonical_name"])].append(node)
+
+        # Longest names first, as in Layer 2, so a chain of ever shorter
+        # names ends up in the longest one.
+        roots: List[str] = []
+        absorbed: Dict[str, List[str]] = defaultdict(list)
+        for canonical in sorted(groups, key=lambda name: (-len(name), name)):
+            targets = [root for root in roots if processor.is_substring_match(canonical, root)]
+            if len(targets) == 1:
+                absorbed[targets[0]].append(canonical)
+            else:
+                roots.append(canonical)
+
+        for root in roots:
+            members = groups[root] + [node for canonical in absorbed[root] for node in groups[canonical]]
+            primary = next(
+                (node for node in members if node["canonical_name"] == root),
+                min(groups[root], key=lambda node: node["id"]),
+            )
+            duplicates = [node for node in members if node is not primary]
+            if duplicates or primary["canonical_name"] != root:
+                plans.append({
+                    "label": label,
+                    "canonical_name": root,
+                    "primary": primary,
+                    "duplicates": duplicates,
+                })
+    return plans
+
+
+def compact_project(
+    project_id: str,
+    min_confidence: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Compact one project's story graph: merge duplicate entities, prune facts
+    and edges below min_confidence or whose scene is gone, and drop entities
+    nothing refers to any more. Every write transaction touches at most
+    batch_size rows, so a large project never holds one long transaction.
+    With dry_run nothing is written and the report says what would change.
+    """
+    min_confidence = settings.GRAPH_COMPACTION_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    batch_size = max(1, batch_size or settings.GRAPH_COMPACTION_BATCH_SIZE)
+    driver = get_neo4j_driver()
+    ensure_graph_schema(driver)
+
+    report = {
+        "project_id": project_id,
+        "dry_run": dry_run,
+        "merges": [],
+        "entities_merged": 0,
+        "entities_rekeyed": 0,
+        "facts_pruned": {},
+        "edges_pruned": {},
+        "entities_pruned": 0,
+    }
+
+    with driver.session() as session:
+        plans = plan_entity_merges(session.execute_read(_read_project_entities, project_id))
+        for plan in plans:
+            if plan["duplicates"]:
+                report["merges"].append({
+                    "into": entity_stat_key(plan["label"], plan["canonical_name"]),
+                    "from": [entity_stat_key(plan["label"], node["canonical_name"]) for node in plan["duplicates"]],
+                })
+            if not dry_run:
+                _merge_entities(session, project_id, plan, batch_size)
+            report["entities_merged"] += len(plan["duplicates"])
+            report["entities_rekeyed"] += int(plan["primary"]["canonical_name"] != plan["canonical_name"])
+
+        params = {"project_id": project_id, "min_confidence": min_confidence}
+        report["facts_pruned"] = {
+            "low_confidence": _prune(session, _LOW_CONFIDENCE_FACTS, params, batch_size, dry_run),
+            "missing_scene": _prune(session, _SCENELESS_FACTS, params, batch_size, dry_run),
+        }
+        report["edges_pruned"] = {"low_confidence": 0, "missing_scene": 0}
+        for label in ENTITY_LABELS:
+            report["edges_pruned"]["low_confidence"] += _prune(
+                session, _LOW_CONFIDENCE_EDGES.format(label=label), params, batch_size, dry_run, delete="DELETE"
+            )
+            report["edges_pruned"]["missing_scene"] += _prune(
+                session, _SCENELESS_EDGES.format(label=label), params, batch_size, dry_run, delete="DELETE"
+            )
+        for label in ENTITY_LABELS:
+            report["entities_pruned"] += _prune(
+                session, _ORPHAN_ENTITIES.format(label=label), params, batch_size, dry_run
+            )
+
+        changed = (
+            report["entities_merged"]
+            or report["entities_rekeyed"]
+            or report["entities_pruned"]
+            or any(report["facts_pruned"].values())
+            or any(report["edges_pruned"].values())
+        )
+        if not dry_run:
+            if changed:
+                # Merges rewrite scene subgraphs across the project, so every
+                # cached scene and project graph is invalidated.
+                _bump_project_versions(session, project_id, batch_size)
+            session.execute_write(_mark_compacted, project_id)
+
+    if changed and not dry_run:
+        Neo4jGraphSink().rebuild_stats(project_id)
+
+    logger.info(
+        f"Compacted project {project_id}{' (dry run)' if dry_run else ''}: "
+        f"merged {report['entities_merged']} entities, rekeyed {report['entities_rekeyed']}, "
+        f"pruned facts {report['facts_pruned']}, edges {report['edges_pruned']}, "
+        f"entities {report['entities_pruned']}"
+    )
+    return report
+
+
+def projects_due_for_compaction() -> List[str]:
+    # Projects whose graph changed since they were last compacted.
+    with get_neo4j_driver().session() as session:
+        return session.execute_read(_read_projects_due)
+
+
+def _read_projects_due(tx) -> List[str]:
+    records = tx.run(
+        """
+        MATCH (p:ProjectGraph)
+        WHERE coalesce(p.compacted_version, -1) < coalesce(p.version, 0)
+        RETURN p.project_id AS project_id
+        ORDER BY project_id
+        """
+    )
+    return [record["project_id"] for record in records]
+
+
+def _read_project_entities(tx, project_id: str) -> List[dict]:
+    # One query per label so each is a (project_id, ...) index seek.
+    entities = []
+    for label in ENTITY_LABELS:
+        records = tx.run(
+            f"""
+            MATCH (e:{label} {{project_id: $project_id}})
+            WHERE coalesce(e.name, e.canonical_name) IS NOT NULL
+            RETURN elementId(e) AS id, e.canonical_name AS canonical_name, e.name AS name
+            """,
+            project_id=project_id,
+        )
+        entities.extend({**dict(record), "label": label} for record in records)
+    return entities
+
+
+def _merge_entities(session, project_id: str, plan: dict, batch_size: int) -> None:
+    # A merge that stops half way leaves both nodes in place with their edges
+    # split between them, which the next run picks up again.
+    primary_id = plan["primary"]["id"]
+    for duplicate in plan["duplicates"]:
+        while True:
+            edges = session.execute_read(_read_story_edges, duplicate["id"], batch_size)
+            if not edges:
+                break
+            session.execute_write(_move_story_edges, primary_id, duplicate["id"], edges)
+
+        for statement in (_MOVE_APPEARANCES, _MOVE_SOURCE_OF, _MOVE_TARGETS):
+            while session.execute_write(
+                _run_count, statement, primary=primary_id, duplicate=duplicate["id"], limit=batch_size
+            ):
+                pass
+        session.execute_write(_run_count, _DELETE_MERGED, duplicate=duplicate["id"])
+
+    if plan["primary"]["canonical_name"] != plan["canonical_name"]:
+        session.execute_write(
+            _run_count,
+            _REKEY_ENTITY.format(label=plan["label"]),
+            primary=primary_id,
+            project_id=project_id,
+            canonical_name=plan["canonical_name"],
+        )
+
+
+def _read_story_edges(tx, node_id: str, limit: int) -> List[dict]:
+    records = tx.run(
+        """
+        MATCH (d) WHERE elementId(d) = $node_id
+        MATCH (d)-[r]-(other)
+        WHERE NOT type(r) IN $structural AND r.scene_id IS NOT NULL
+        RETURN elementId(r) AS id, type(r) AS type, startNode(r) = d AS outgoing,
+               elementId(other) AS other, properties(r) AS properties
+        LIMIT $limit
+        """,
+        node_id=node_id,
+        structural=_STRUCTURAL_TYPES,
+        limit=limit,
+    )
+    return [dict(record) for record in records]
+
+
+def _move_story_edges(tx, primary_id: str, duplicate_id: str, edges: List[dict]) -> None:
+    # Relationship types can't be parameters, so edges are recreated one
+    # (type, direction) group at a time. Edges between the two merged nodes
+    # would become self-loops and are dropped.
+    groups: Dict[tuple, List[dict]] = defaultdict(list)
+    loops = []
+    for edge in edges:
+        if edge["other"] in (primary_id, duplicate_id):
+            loops.append({"id": edge["id"]})
+        else:
+            groups[(edge["type"], edge["outgoing"])].append(edge)
+
+    for (rel_type, outgoing), rows in groups.items():
+        pattern = f"(p)-[r:`{rel_type}` {{scene_id: row.properties.scene_id}}]->(o)" if outgoing else \
+            f"(o)-[r:`{rel_type}` {{scene_id: row.properties.scene_id}}]->(p)"
+        tx.run(
+            f"""
+            MATCH (p) WHERE elementId(p) = $primary
+            UNWIND $rows AS row
+            MATCH (o) WHERE elementId(o) = row.other
+            MATCH ()-[old]->() WHERE elementId(old) = row.id
+            MERGE {pattern}
+            SET r += row.properties
+            DELETE old
+            """,
+            primary=primary_id,
+            rows=rows,
+        )
+    if loops:
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MATCH ()-[old]->() WHERE elementId(old) = row.id
+            DELETE old
+            """,
+            rows=loops,
+        )
+
+
+def _run_count(tx, statement: str, **params) -> int:
+    record = tx.run(statement, **params).single()
+    return record[0] if record else 0
+
+
+_MOVE_APPEARANCES = """
+MATCH (p) WHERE elementId(p) = $primary
+MATCH (d) WHERE elementId(d) = $duplicate
+MATCH (d)-[a:APPEARS_IN]->(s:Scene)
+WITH p, a, s LIMIT $limit
+MERGE (p)-[b:APPEARS_IN]->(s)
+SET b.mentions = coalesce(b.mentions, [])
+    + [m IN coalesce(a.mentions, []) WHERE NOT m IN coalesce(b.mentions, [])]
+DELETE a
+RETURN count(*)
+"""
+
+_MOVE_SOURCE_OF = """
+MATCH (p) WHERE elementId(p) = $primary
+MATCH (d) WHERE elementId(d) = $duplicate
+MATCH (d)-[old:SOURCE_OF]->(f:CaseFact)
+WITH p, old, f LIMIT $limit
+MERGE (p)-[:SOURCE_OF]->(f)
+DELETE old
+RETURN count(*)
+"""
+
+_MOVE_TARGETS = """
+MATCH (p) WHERE elementId(p) = $primary
+MATCH (d) WHERE elementId(d) = $duplicate
+MATCH (f:CaseFact)-[old:TARGETS]->(d)
+WITH p, old, f LIMIT $limit
+MERGE (f)-[:TARGETS]->(p)
+DELETE old
+RETURN count(*)
+"""
+
+_DELETE_MERGED = """
+MATCH (d) WHERE elementId(d) = $duplicate AND NOT (d)--()
+DELETE d
+RETURN count(*)
+"""
+
+# Only once the duplicates holding other keys are gone, and never onto a key
+# another node still owns.
+_REKEY_ENTITY = """
+MATCH (p) WHERE elementId(p) = $primary
+OPTIONAL MATCH (o:{label} {{project_id: $project_id, canonical_name: $canonical_name}})
+WITH p, o
+WHERE o IS NULL
+SET p.canonical_name = $canonical_name
+RETURN count(*)
+"""
+
+# Prune queries bind the nodes or edges to delete as `x`; _prune counts or
+# deletes them.
+_LOW_CONFIDENCE_FACTS = """
+MATCH (x:CaseFact {project_id: $project_id})
+WHERE x.confidence < $min_confidence
+"""
+
+_SCENELESS_FACTS = """
+MATCH (x:CaseFact {project_id: $project_id})
+WHERE NOT (x)-[:APPEARS_IN]->(:Scene)
+"""
+
+_LOW_CONFIDENCE_EDGES = """
+MATCH (:{label} {{project_id: $project_id}})-[x]->()
+WHERE x.scene_id IS NOT NULL AND x.confidence < $min_confidence
+"""
+
+_SCENELESS_EDGES = """
+MATCH (:{label} {{project_id: $project_id}})-[x]->()
+WHERE x.scene_id IS NOT NULL AND NOT EXISTS {{ MATCH (:Scene {{scene_id: x.scene_id}}) }}
+"""
+
+_ORPHAN_ENTITIES = """
+MATCH (x:{label} {{project_id: $project_id}})
+WHERE NOT (x)--()
+"""
+
+
+def _prune(session, match: str, params: dict, batch_size: int, dry_run: bool, delete: str = "DETACH DELETE") -> int:
+    if dry_run:
+        return session.execute_read(_run_count, match + "RETURN count(x)", **params)
+
+    total = 0
+    while True:
+        deleted = session.execute_write(
+            _run_count, match + f"WITH x LIMIT $limit {delete} x RETURN count(*)", limit=batch_size, **params
+        )
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def _bump_project_versions(session, project_id: str, batch_size: int) -> None:
+    scene_ids = session.execute_read(
+        lambda tx: [
+            record["scene_id"]
+            for record in tx.run(
+                "MATCH (s:Scene {project_id: $project_id}) RETURN s.scene_id AS scene_id",
+                project_id=project_id,
+            )
+        ]
+    )
+    for start in range(0, len(scene_ids), batch_size):
+        session.execute_write(
+            _run_count,
+            """
+            UNWIND $scene_ids AS scene_id
+            MATCH (s:Scene {scene_id: scene_id})
+            SET s.graph_version = coalesce(s.graph_version, 0) + 1,
+                s.updated_at    = datetime()
+            RETURN count(*)
+            """,
+            scene_ids=scene_ids[start:start + batch_size],
+        )
+    session.execute_write(
+        _run_count,
+        """
+        MERGE (p:ProjectGraph {project_id: $project_id})
+        SET p.version    = coalesce(p.version, 0) + 1,
+            p.updated_at = datetime()
+        RETURN count(*)
+        """,
+        project_id=project_id,
+    )
+
+
+def _mark_compacted(tx, project_id: str) -> None:
+    tx.run(
+        """
+        MERGE (p:ProjectGraph {project_id: $project_id})
+        SET p.compacted_version = coalesce(p.version, 0),
+            p.compacted_at      = datetime()
+        """,
+        project_id=project_id,
+    )
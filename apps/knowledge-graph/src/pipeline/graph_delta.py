@@ -0,0 +1,78 @@
+from typing import Dict, Hashable, Iterable, List
+
+
+class RowDelta:
+    """Rows to insert, update and delete for one kind of graph element."""
+
+    def __init__(self, inserts: List[dict], updates: List[dict], deletes: List[dict]):
+        self.inserts = inserts
+        self.updates = updates
+        self.deletes = deletes
+
+    @property
+    def upserts(self) -> List[dict]:
+        return self.inserts + self.updates
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.inserts or self.updates or self.deletes)
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "inserted": len(self.inserts),
+            "updated": len(self.updates),
+            "deleted": len(self.deletes),
+        }
+
+
+def diff_rows(
+    current: Dict[Hashable, dict],
+    desired: Dict[Hashable, dict],
+    fields: Iterable[str],
+) -> RowDelta:
+    # Rows are keyed by identity (label + name, fact id, ...); only the listed
+    # property fields decide whether an existing row needs rewriting.
+    fields = tuple(fields)
+    inserts: List[dict] = []
+    updates: List[dict] = []
+
+    for key, row in desired.items():
+        existing = current.get(key)
+        if existing is None:
+            inserts.append(row)
+        elif any(_normalize(existing.get(field)) != _normalize(row.get(field)) for field in fields):
+            updates.append(row)
+
+    deletes = [row for key, row in current.items() if key not in desired]
+    return RowDelta(inserts, updates, deletes)
+
+
+class SceneGraphDelta:
+    """Changes that turn the stored subgraph of a scene into a new analysis result."""
+
+    def __init__(self, scene_changed: bool, entities: RowDelta, relationships: RowDelta, facts: RowDelta):
+        self.scene_changed = scene_changed
+        self.entities = entities
+        self.relationships = relationships
+        self.facts = facts
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.scene_changed and all(
+            delta.is_empty for delta in (self.entities, self.relationships, self.facts)
+        )
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "entities": self.entities.counts(),
+            "relationships": self.relationships.counts(),
+            "facts": self.facts.counts(),
+        }
+
+
+def _normalize(value):
+    # Neo4j hands lists back as lists and drops null properties, so a missing
+    # value and None compare equal; tuples are compared as lists.
+    if isinstance(value, tuple):
+        return list(value)
+    return value
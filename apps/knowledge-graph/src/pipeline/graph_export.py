@@ -0,0 +1,232 @@
+import argparse
+import csv
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from src.models.schemas import Entity, Relationship
+from src.pipeline.graph_stats import EMPTY_SCENE, scene_stat_changes
+from src.pipeline.layer5_graph import _entity_rows, _relationship_and_fact_rows, _to_rel_type
+from src.pipeline.relation_vocabulary import RelationVocabulary
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# neo4j-admin reads arrays split on this character; mentions are the only
+# array property, and "|" does not occur in entity surface forms.
+ARRAY_DELIMITER = "|"
+
+_RELATIONSHIP_PROPERTIES = [
+    ("when", "string"),
+    ("category", "string"),
+    ("evidence", "string"),
+    ("evidence_start", "int"),
+    ("evidence_end", "int"),
+    ("confidence", "float"),
+    ("relation_label", "string"),
+]
+
+# file name -> header. Node IDs live in separate ID spaces per node kind
+# (Scene, Entity, CaseFact, RelationType, GraphStat) so the same string can
+# never collide.
+CSV_HEADERS: Dict[str, List[str]] = {
+    "scenes.csv": [
+        "scene_id:ID(Scene)", "project_id", "user_id", "scene_text", "resolved_text", ":LABEL",
+    ],
+    "entities.csv": [
+        ":ID(Entity)", "project_id", "canonical_name", "name", "type", "role", "description", ":LABEL",
+    ],
+    "case_facts.csv": [
+        "fact_id:ID(CaseFact)", "project_id", "name", "type", "rel_type", "description",
+        *[f"{name}:{kind}" for name, kind in _RELATIONSHIP_PROPERTIES], ":LABEL",
+    ],
+    "relation_types.csv": [":ID(RelationType)", "project_id", "name", "rel_type", ":LABEL"],
+    "graph_stats.csv": [":ID(GraphStat)", "project_id", "kind", "key", "entity", "other", "count:int", ":LABEL"],
+    "entity_appears_in.csv": [":START_ID(Entity)", ":END_ID(Scene)", "mentions:string[]", ":TYPE"],
+    "fact_appears_in.csv": [":START_ID(CaseFact)", ":END_ID(Scene)", ":TYPE"],
+    "relationships.csv": [
+        ":START_ID(Entity)", ":END_ID(Entity)", "scene_id", "description",
+        *[f"{name}:{kind}" for name, kind in _RELATIONSHIP_PROPERTIES], ":TYPE",
+    ],
+    "source_of.csv": [":START_ID(Entity)", ":END_ID(CaseFact)", ":TYPE"],
+    "targets.csv": [":START_ID(CaseFact)", ":END_ID(Entity)", ":TYPE"],
+}
+
+_NODE_FILES = ("scenes.csv", "entities.csv", "case_facts.csv", "relation_types.csv", "graph_stats.csv")
+
+
+def entity_import_id(project_id: str, label: str, canonical_name: str) -> str:
+    # Mirrors the (label, project_id, canonical_name) key Layer 5 MERGEs on,
+    # so a bulk-loaded graph and an incrementally written one agree.
+    return f"{project_id}:{label}:{canonical_name}"
+
+
+class Neo4jCsvExporter:
+    """
+    Offline Layer 5 sink that writes scene graphs as neo4j-admin import CSVs.
+
+    Scenes, facts and edges are streamed to disk as they are added; entity
+    nodes are merged across scenes in memory (last write wins, as with MERGE)
+    and written on close(), along with each project's relationship-type
+    vocabulary and graph stats.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+        for name, header in CSV_HEADERS.items():
+            handle = open(os.path.join(output_dir, name), "w", newline="", encoding="utf-8")
+            self._files[name] = handle
+            self._writers[name] = csv.writer(handle)
+            self._writers[name].writerow(header)
+        self._entities: Dict[str, dict] = {}
+        self._vocabularies: Dict[str, RelationVocabulary] = {}
+        self._stats: Dict[str, Counter] = {}
+        self._scene_ids = set()
+        self.scenes_exported = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_scene(
+        self,
+        scene_id: str,
+        project_id: str,
+        user_id: str,
+        scene_text: str,
+        entities: List[Entity],
+        relationships: List[Relationship],
+        resolved_text: Optional[str] = None,
+    ) -> None:
+        # Same arguments as save_graph_layer5, so graph-write messages can be
+        # replayed into either sink.
+        if scene_id in self._scene_ids:
+            raise ValueError(f"Scene {scene_id} was already exported")
+        self._scene_ids.add(scene_id)
+
+        write = self._writers
+        resolved_text = resolved_text if resolved_text is not None else scene_text
+        write["scenes.csv"].writerow([scene_id, project_id, user_id, scene_text, resolved_text, "Scene"])
+
+        entity_rows = _entity_rows(entities)
+        for row in entity_rows.values():
+            entity_id = entity_import_id(project_id, row["label"], row["canonical_name"])
+            self._entities[entity_id] = {**row, "project_id": project_id}
+            write["entity_appears_in.csv"].writerow([
+                entity_id, scene_id, ARRAY_DELIMITER.join(row["mentions"]), "APPEARS_IN",
+            ])
+
+        vocabulary = self._vocabularies.setdefault(project_id, RelationVocabulary(project_id))
+        rel_rows, fact_rows = _relationship_and_fact_rows(relationships, entities, scene_id, project_id, vocabulary)
+        for row in rel_rows.values():
+            write["relationships.csv"].writerow([
+                entity_import_id(project_id, row["source_label"], row["source_key"]),
+                entity_import_id(project_id, row["target_label"], row["target_key"]),
+                scene_id,
+                row["evidence"],
+                *[row[name] for name, _ in _RELATIONSHIP_PROPERTIES],
+                row["rel_type"],
+            ])
+
+        for row in fact_rows.values():
+            source_id = entity_import_id(project_id, row["source_label"], row["source_key"])
+            target_id = entity_import_id(project_id, row["target_label"], row["target_key"])
+            write["case_facts.csv"].writerow([
+                row["fact_id"], project_id, row["name"], "case_fact", row["rel_type"], row["evidence"],
+                *[row[name] for name, _ in _RELATIONSHIP_PROPERTIES],
+                "CaseFact",
+            ])
+            write["fact_appears_in.csv"].writerow([row["fact_id"], scene_id, "APPEARS_IN"])
+            write["source_of.csv"].writerow([source_id, row["fact_id"], "SOURCE_OF"])
+            write["targets.csv"].writerow([row["fact_id"], target_id, "TARGETS"])
+
+        stats = self._stats.setdefault(project_id, Counter())
+        for row in scene_stat_changes(EMPTY_SCENE, (entity_rows, rel_rows, fact_rows)):
+            stats[(row["kind"], row["key"], row["entity"], row["other"])] += row["change"]
+
+        self.scenes_exported += 1
+
+    def close(self) -> None:
+        if not self._files:
+            return
+
+        for entity_id, row in self._entities.items():
+            self._writers["entities.csv"].writerow([
+                entity_id, row["project_id"], row["canonical_name"], row["name"],
+                row["type"], row["role"], row["description"], row["label"],
+            ])
+        for project_id, vocabulary in self._vocabularies.items():
+            for name in vocabulary.names:
+                self._writers["relation_types.csv"].writerow([
+                    f"{project_id}:{name}", project_id, name, _to_rel_type(name), "RelationType",
+                ])
+        for project_id, stats in self._stats.items():
+            for (kind, key, entity, other), count in stats.items():
+                self._writers["graph_stats.csv"].writerow([
+                    f"{project_id}:{kind}:{key}", project_id, kind, key, entity, other, count, "GraphStat",
+                ])
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+        logger.info(
+            f"Exported {self.scenes_exported} scenes and {len(self._entities)} entities to {self.output_dir}"
+        )
+
+    def import_command(self, database: str = "neo4j") -> str:
+        nodes = " ".join(f"--nodes={os.path.join(self.output_dir, name)}" for name in _NODE_FILES)
+        relationships = " ".join(
+            f"--relationships={os.path.join(self.output_dir, name)}"
+            for name in CSV_HEADERS
+            if name not in _NODE_FILES
+        )
+        return (
+            f"neo4j-admin database import full {database} {nodes} {relationships} "
+            f'--array-delimiter="{ARRAY_DELIMITER}" --multiline-fields=true'
+        )
+
+
+def export_graph_writes_csv(messages: Iterable[dict], output_dir: str) -> Neo4jCsvExporter:
+    # messages are graph-write queue payloads (graph_writer.build_graph_write);
+    # a later message for a scene replaces an earlier one.
+    latest: Dict[str, dict] = {}
+    for message in messages:
+        latest[message["scene_id"]] = message
+
+    with Neo4jCsvExporter(output_dir) as exporter:
+        for message in latest.values():
+            exporter.add_scene(
+                scene_id=message["scene_id"],
+                project_id=message.get("project_id") or "",
+                user_id=message.get("user_id", ""),
+                scene_text=message["scene_text"],
+                entities=[Entity(**entity) for entity in message.get("entities", [])],
+                relationships=[Relationship(**rel) for rel in message.get("relationships", [])],
+                resolved_text=message.get("resolved_text"),
+            )
+    return exporter
+
+
+def _read_jsonl(paths: Iterable[str]):
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export graph-write messages as neo4j-admin import CSVs.")
+    parser.add_argument("output_dir")
+    parser.add_argument("inputs", nargs="+", help="JSONL files of graph-write messages")
+    parser.add_argument("--database", default="neo4j")
+    args = parser.parse_args()
+
+    exporter = export_graph_writes_csv(_read_jsonl(args.inputs), args.output_dir)
+    print(exporter.import_command(args.database))
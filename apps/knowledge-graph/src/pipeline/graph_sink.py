@@ -0,0 +1,62 @@
+from typing import Dict, List, Optional
+
+from src.models.schemas import Entity, Relationship
+
+
+class GraphSink:
+    """
+    Interface shared by the Layer 5 storage backends.
+
+    A sink stores the scene / entity / CaseFact model keyed the same way as
+    the Neo4j graph: entities by (project_id, label, canonical name), facts by
+    fact_id, relationship edges by scene. save_scene replaces what the scene
+    previously stored and returns the per-kind change counts.
+
+    Reads return {"nodes": [...], "edges": [...]} with nodes as
+    {"id", "label", "name", "role"} and edges as
+    {"source", "target", "type", "label", "scene_id", "description", "confidence"},
+    where ids are "Label:canonical_name" entity keys, type is the project's
+    canonical relationship type and label the relation label as extracted.
+
+    project_stats returns the largest counters of one graph_stats kind as
+    {"key", "entity", "other", "count"}, optionally for a single entity key;
+    save_scene keeps them current and rebuild_stats recounts a project.
+    """
+
+    name = "base"
+
+    def ensure_schema(self) -> int:
+        return 0
+
+    def save_scene(
+        self,
+        scene_id: str,
+        project_id: str,
+        user_id: str,
+        scene_text: str,
+        entities: List[Entity],
+        relationships: List[Relationship],
+        resolved_text: Optional[str] = None,
+    ) -> dict:
+        raise NotImplementedError
+
+    def save_scenes(self, writes: List[dict]) -> Dict[str, dict]:
+        # Each write holds save_scene's keyword arguments.
+        return {write["scene_id"]: self.save_scene(**write) for write in writes}
+
+    def scene_graph(self, scene_id: str) -> dict:
+        raise NotImplementedError
+
+    def neighbourhood(self, project_id: str, name: str, depth: int = 1) -> dict:
+        raise NotImplementedError
+
+    def project_stats(
+        self, project_id: str, kind: str, entity: Optional[str] = None, limit: int = 25
+    ) -> List[dict]:
+        raise NotImplementedError
+
+    def rebuild_stats(self, project_id: str) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
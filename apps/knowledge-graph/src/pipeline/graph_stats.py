@@ -0,0 +1,76 @@
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Per-project aggregates kept up to date by Layer 5 as scene deltas are
+# written, so dashboards read counters instead of aggregating the graph.
+ENTITY_SCENES = "entity_scenes"    # scenes an entity appears in
+ENTITY_DEGREE = "entity_degree"    # story edges touching an entity
+CO_APPEARANCE = "co_appearance"    # scenes two entities share (one row per pair, sorted)
+RELATION_FACTS = "relation_facts"  # CaseFacts per canonical relationship type
+STAT_KINDS = (ENTITY_SCENES, ENTITY_DEGREE, CO_APPEARANCE, RELATION_FACTS)
+
+# (entities, relationships, facts) rows of one scene, as Layer 5 reads and
+# diffs them.
+SceneRows = Tuple[Dict[tuple, dict], Dict[tuple, dict], Dict[str, dict]]
+EMPTY_SCENE: SceneRows = ({}, {}, {})
+
+_StatKey = Tuple[str, str, Optional[str], Optional[str]]
+
+
+def entity_stat_key(label: str, canonical_name: str) -> str:
+    # Same "Label:canonical_name" key the query engine gives graph nodes.
+    return f"{label}:{canonical_name}"
+
+
+def _scene_stats(rows: SceneRows) -> Counter:
+    entities, relationships, facts = rows
+    stats: Counter = Counter()
+
+    keys = sorted({entity_stat_key(row["label"], row["canonical_name"]) for row in entities.values()})
+    for key in keys:
+        stats[(ENTITY_SCENES, key, key, None)] += 1
+    # Each unordered pair is stored once with entity < other; readers match
+    # a given entity on either side.
+    for entity, other in combinations(keys, 2):
+        stats[(CO_APPEARANCE, f"{entity}|{other}", entity, other)] += 1
+
+    for row in relationships.values():
+        for label, canonical_name in (
+            (row["source_label"], row["source_key"]),
+            (row["target_label"], row["target_key"]),
+        ):
+            key = entity_stat_key(label, canonical_name)
+            stats[(ENTITY_DEGREE, key, key, None)] += 1
+
+    for row in facts.values():
+        # Facts written before relationship types were canonicalised have none.
+        if row.get("rel_type"):
+            stats[(RELATION_FACTS, row["rel_type"], None, None)] += 1
+    return stats
+
+
+def _stat_rows(changes: Dict[_StatKey, int]) -> List[dict]:
+    return [
+        {"kind": kind, "key": key, "entity": entity, "other": other, "change": change}
+        for (kind, key, entity, other), change in sorted(changes.items(), key=lambda item: item[0][:2])
+        if change
+    ]
+
+
+def scene_stat_changes(before: SceneRows, after: SceneRows) -> List[dict]:
+    """Counter changes that turn a scene's contribution from `before` into `after`."""
+    before_stats = _scene_stats(before)
+    after_stats = _scene_stats(after)
+    return _stat_rows({
+        key: after_stats[key] - before_stats[key]
+        for key in set(before_stats) | set(after_stats)
+    })
+
+
+def project_stat_rows(scenes: Iterable[SceneRows]) -> List[dict]:
+    # Full recount from every scene of a project, for backfills and repairs.
+    totals: Counter = Counter()
+    for rows in scenes:
+        totals.update(_scene_stats(rows))
+    return _stat_rows(totals)
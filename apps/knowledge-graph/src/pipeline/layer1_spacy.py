@@ -1,7 +1,9 @@
 import spacy
 from typing import List, Tuple
 from collections import defaultdict
-from src.models.schemas import Entity, RawEntity
+from spacy.tokens import Doc
+from src.models.schemas import Entity, RawEntity, SceneContext
+from src.pipeline.scene_context import build_scene_context
 from src.config import settings
 from src.utils.logger import setup_logger
 
@@ -186,6 +188,10 @@ class SpacyEntityExtractor:
             logger.info("spaCy model downloaded and loaded successfully.")
 
     def resolve_and_extract(self, text: str) -> Tuple[List[RawEntity], str]:
+        raw_entities, resolved_text, _ = self.resolve_extract_and_parse(text)
+        return raw_entities, resolved_text
+
+    def resolve_extract_and_parse(self, text: str) -> Tuple[List[RawEntity], str, Doc]:
 
         doc = self.nlp(text)
         coref_available = "coreferee" in self.nlp.pipe_names
@@ -238,7 +244,7 @@ class SpacyEntityExtractor:
                     logger.debug(f"  Added item reference: '{item.text}'")
 
         logger.debug(f"Extracted {len(raw_entities)} raw entities from text.")
-        return raw_entities, resolved_text
+        return raw_entities, resolved_text, doc
 
     def convert_to_entities(self, raw_entities: List[RawEntity]) -> List[Entity]:
         entity_groups = defaultdict(list)
@@ -261,14 +267,14 @@ class SpacyEntityExtractor:
         return entities
 
 
-def extract_entities_layer1(scene_text: str, nlp=None) -> Tuple[List[Entity], str]:
+def extract_entities_with_context_layer1(scene_text: str, nlp=None) -> Tuple[List[Entity], SceneContext]:
     logger.info("=" * 60)
     logger.info("LAYER 1: spaCy Entity Extraction")
     logger.info("=" * 60)
 
     extractor = SpacyEntityExtractor(nlp=nlp)
 
-    raw_entities, resolved_text = extractor.resolve_and_extract(scene_text)
+    raw_entities, resolved_text, doc = extractor.resolve_extract_and_parse(scene_text)
     logger.info(f"Found {len(raw_entities)} raw entities")
 
     entities = extractor.convert_to_entities(raw_entities)
@@ -277,6 +283,14 @@ def extract_entities_layer1(scene_text: str, nlp=None) -> Tuple[List[Entity], st
     for entity in entities:
         logger.debug(f"  - {entity.name} ({entity.type})")
 
-    logger.info(f"Layer 1 complete: {len(entities)} entities extracted")
+    # doc is the parse of resolved_text, so its sentence offsets line up with
+    # the text Layers 3 and 5 work on.
+    scene_context = build_scene_context(doc)
+    logger.info(f"Layer 1 complete: {len(entities)} entities extracted, {len(scene_context.sentences)} sentences")
 
-    return entities, resolved_text
\ No newline at end of file
+    return entities, scene_context
+
+
+def extract_entities_layer1(scene_text: str, nlp=None) -> Tuple[List[Entity], str]:
+    entities, scene_context = extract_entities_with_context_layer1(scene_text, nlp=nlp)
+    return entities, scene_context.text
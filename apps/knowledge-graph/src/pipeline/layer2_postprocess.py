@@ -6,7 +6,7 @@ from src.utils.logger import setup_logger
 
 # Honorific titles to strip before name comparison
 _TITLE_RE = re.compile(
-    r'\b(mr|mrs|ms|miss|dr|prof|sir|lord|lady|det|sgt|cpl|insp)\.?\s*',
+    r'\b(mr|mrs|ms|miss|dr|prof|sir|lord|lady|det|sgt|cpl|insp)\b\.?\s*',
     re.IGNORECASE,
 )
 # Any remaining punctuation after title stripping
@@ -14,6 +14,13 @@ _PUNCT_RE = re.compile(r"[^\w\s]")
 
 logger = setup_logger(__name__)
 
+
+def canonical_entity_name(name: str) -> str:
+    """Lowercase, strip honorific titles and punctuation, collapse whitespace."""
+    name = _TITLE_RE.sub('', name)
+    name = _PUNCT_RE.sub('', name)
+    return ' '.join(name.lower().split())
+
 # Single-word strings that spaCy commonly mislabels as ORG in fiction:
 # greetings, interjections, genericised brand names, etc.
 FICTION_FALSE_ORG_WORDS = {
@@ -51,10 +58,7 @@ class EntityPostProcessor:
         }
 
     def normalize_name(self, name: str) -> str:
-        """Lowercase, strip honorific titles and punctuation, collapse whitespace."""
-        name = _TITLE_RE.sub('', name)
-        name = _PUNCT_RE.sub('', name)
-        return ' '.join(name.lower().split())
+        return canonical_entity_name(name)
 
     def is_substring_match(self, short_name: str, long_name: str) -> bool:
         short_tokens = set(self.normalize_name(short_name).split())
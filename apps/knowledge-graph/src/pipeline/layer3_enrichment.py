@@ -1,21 +1,71 @@
 import json
 import re
-from collections import Counter
+from bisect import bisect_right
+from collections import Counter, defaultdict, deque
 from difflib import SequenceMatcher
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
-from src.models.schemas import Entity, Relationship
+from src.config import settings
+from src.models.schemas import Entity, Relationship, SceneContext, SceneSentence
+from src.pipeline.scene_context import normalize_text, split_scene_context
+from src.pipeline.streaming_parser import JsonArrayItemStream
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+_SHINGLE_SIZE = 3
+_FUZZY_MATCH_THRESHOLD = 0.78
+_SHORT_EVIDENCE_CHARS = 16
 
-def _format_entity_list(entities: List[Entity]) -> str:
-    return "\n".join(f"- {e.name} (type: {e.type})" for e in entities)
+# Static part of the Layer 3 prompt. It comes before the scene so the LLM
+# loader can prefill it once per container and reuse its KV cache per job.
+NARRATIVE_FACT_INSTRUCTIONS = """Extract a compact knowledge graph from the scene given at the end of this message.
+
+Use only the exact candidate entities listed after the scene. Do not invent entities, objects, or places that are missing from the candidate list.
+Extract relationships that are stated or strongly implied by the scene.
+Prefer story-relevant facts: actions with consequences, discoveries, suspicions, deception, possession, evidence, locations, emotional/social ties, motives, conflicts, and important state changes.
+Skip mundane movement, posture, looking, ordinary speech, and background atmosphere unless it changes what the reader knows about the plot or a character.
+
+For relation labels, write a short natural verb phrase such as "killed", "lied_to", "found", "hid_from", "was_married_to", "owned", or "was_seen_at".
+Do not force labels into a predefined ontology. Use the wording that best fits the scene.
+
+For evidence, copy the shortest exact sentence or clause from the scene that supports the relationship.
+
+Respond with ONLY valid JSON. No markdown, no explanation.
+
+{
+  "entities": [
+    {
+      "name": "<exact candidate entity name>",
+      "description": "<one short scene-grounded description, or null>"
+    }
+  ],
+  "relationships": [
+    {
+      "source": "<exact candidate entity name>",
+      "target": "<exact candidate entity name>",
+      "relation_type": "<short natural relation label>",
+      "when": "<explicit time phrase, or null>",
+      "evidence": "<exact supporting sentence or clause copied from the scene>",
+      "confidence": 0.85
+    }
+  ]
+}
+
+Rules:
+- Every relationship must connect two different candidate entities.
+- The source and target must be copied exactly from the candidate entity list.
+- Every relationship must include exact evidence copied from the scene.
+- Use confidence between 0.5 and 1.0 for relationships you include.
+- Return every clearly supported story-relevant relationship, but avoid duplicates and weak guesses.
+- If no useful relationships are supported, return an empty relationships array.
+- Prefer precision over volume.
 
+"""
 
-def _normalize_text(value: str) -> str:
-    return re.sub(r"\s+", " ", value.lower()).strip()
+
+def _format_entity_list(entities: List[Entity]) -> str:
+    return "\n".join(f"- {e.name} (type: {e.type})" for e in entities)
 
 
 def _normalize_relation(value: str) -> str:
@@ -24,70 +74,231 @@ def _normalize_relation(value: str) -> str:
     return "_".join(value.replace("-", " ").split())
 
 
-def _split_sentences(scene_text: str) -> List[str]:
-    sentences = re.split(r"(?<=[.!?])\s+", scene_text.strip())
-    return [sentence.strip() for sentence in sentences if sentence.strip()]
+class _SubstringAutomaton:
+    """Aho-Corasick automaton reporting which patterns occur inside a text."""
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+
+        for pattern_index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._outputs[state].append(pattern_index)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def search(self, text: str) -> set:
+        found: set = set()
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            found.update(self._outputs[state])
+        return found
+
+
+class EntityNameIndex:
+    """
+    Normalized name/mention index over a scene's candidate entities.
+
+    Resolution order matches the old per-call scan: an exact normalized name
+    wins, otherwise the first entity whose name contains or is contained in the
+    query, or that has the query as an exact mention.
+    """
+
+    def __init__(self, entities: List[Entity]):
+        self.entities = entities
+        self._exact = {
+            normalize_text(entity.name): entity.name
+            for entity in entities
+            if entity.name.strip()
+        }
+
+        names: List[str] = []
+        self._name_owners: List[int] = []
+        self._mentions: Dict[str, int] = {}
+        for index, entity in enumerate(entities):
+            entity_name = normalize_text(entity.name)
+            if not entity_name:
+                continue
+            names.append(entity_name)
+            self._name_owners.append(index)
+            for mention in entity.mentions:
+                self._mentions.setdefault(normalize_text(mention), index)
+
+        # Names joined with a separator that never survives normalization, so a
+        # single str.find pass locates every name containing the query.
+        self._joined_names = "\x00".join(names)
+        self._name_offsets: List[int] = []
+        offset = 0
+        for entity_name in names:
+            self._name_offsets.append(offset)
+            offset += len(entity_name) + 1
+
+        self._automaton = _SubstringAutomaton(names)
+        self._cache: Dict[str, Optional[str]] = {}
+
+    def match(self, name: str) -> Optional[str]:
+        normalized = normalize_text(name)
+        if not normalized:
+            return None
 
+        if normalized in self._exact:
+            return self._exact[normalized]
 
-def _match_name(name: str, entities: List[Entity]) -> Optional[str]:
-    normalized = _normalize_text(name)
-    if not normalized:
-        return None
+        if normalized not in self._cache:
+            self._cache[normalized] = self._match_fallback(normalized)
+        return self._cache[normalized]
 
-    exact = {
-        _normalize_text(entity.name): entity.name
-        for entity in entities
-        if entity.name.strip()
-    }
-    if normalized in exact:
-        return exact[normalized]
+    def _match_fallback(self, normalized: str) -> Optional[str]:
+        candidates = {self._name_owners[i] for i in self._automaton.search(normalized)}
 
-    for entity in entities:
-        entity_name = _normalize_text(entity.name)
-        if not entity_name:
-            continue
-        if normalized in entity_name or entity_name in normalized:
-            return entity.name
+        position = self._joined_names.find(normalized)
+        while position != -1:
+            name_index = bisect_right(self._name_offsets, position) - 1
+            candidates.add(self._name_owners[name_index])
+            position = self._joined_names.find(normalized, position + 1)
 
-        for mention in entity.mentions:
-            mention_name = _normalize_text(mention)
-            if normalized == mention_name:
-                return entity.name
+        mention_owner = self._mentions.get(normalized)
+        if mention_owner is not None:
+            candidates.add(mention_owner)
 
-    return None
+        if not candidates:
+            return None
+        return self.entities[min(candidates)].name
+
+
+def _shingles(text: str) -> set:
+    if len(text) < _SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i : i + _SHINGLE_SIZE] for i in range(len(text) - _SHINGLE_SIZE + 1)}
+
+
+class EvidenceIndex:
+    """
+    Per-scene lookup of LLM evidence against the scene sentences.
+
+    Sentences are normalized once and indexed by character shingles, so each
+    lookup only verifies the sentences that share shingles with the evidence
+    instead of running SequenceMatcher against every sentence. Matching rules are
+    unchanged: the first sentence that equals, contains or is contained in the
+    evidence wins, otherwise the best fuzzy match at or above the threshold.
+    """
+
+    def __init__(self, sentences: List[SceneSentence]):
+        self.sentences = sentences
+        self._normalized = [sentence.normalized for sentence in sentences]
+        self._shingle_counts: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        # Sentences shorter than a shingle can't be found through the postings.
+        self._short_sentences: List[int] = []
+        self._cache: Dict[str, Optional[SceneSentence]] = {}
+
+        for index, normalized in enumerate(self._normalized):
+            shingles = _shingles(normalized)
+            self._shingle_counts.append(len(shingles))
+            if len(normalized) < _SHINGLE_SIZE:
+                self._short_sentences.append(index)
+            for shingle in shingles:
+                self._postings[shingle].append(index)
+
+    def lookup(self, evidence: str) -> Optional[SceneSentence]:
+        normalized_evidence = normalize_text(evidence)
+        if not normalized_evidence:
+            return None
 
+        if normalized_evidence not in self._cache:
+            self._cache[normalized_evidence] = self._lookup(normalized_evidence, evidence)
+        return self._cache[normalized_evidence]
 
-def _evidence_in_scene(evidence: str, sentences: List[str]) -> Optional[str]:
-    normalized_evidence = _normalize_text(evidence)
-    if not normalized_evidence:
-        return None
+    def _lookup(self, normalized_evidence: str, evidence: str) -> Optional[SceneSentence]:
+        evidence_shingles = _shingles(normalized_evidence)
+        overlap: Counter[int] = Counter()
+        for shingle in evidence_shingles:
+            for index in self._postings.get(shingle, ()):
+                overlap[index] += 1
 
-    best_sentence = None
-    best_score = 0.0
-    for sentence in sentences:
-        normalized_sentence = _normalize_text(sentence)
-        if normalized_evidence == normalized_sentence:
-            return sentence
-        if normalized_evidence in normalized_sentence:
-            return sentence
-        if normalized_sentence in normalized_evidence:
-            return sentence
-
-        score = SequenceMatcher(None, normalized_evidence, normalized_sentence).ratio()
-        if score > best_score:
-            best_score = score
-            best_sentence = sentence
-
-    if best_sentence and best_score >= 0.78:
-        logger.info(
-            "NARRATIVE_FACT_EVIDENCE_FUZZY_MATCH score=%.2f evidence=%s matched=%s",
-            best_score,
-            _shorten(evidence, 160),
-            _shorten(best_sentence, 160),
+        if len(normalized_evidence) < _SHINGLE_SIZE:
+            containment_candidates = set(range(len(self._normalized)))
+        else:
+            containment_candidates = {
+                index
+                for index, shared in overlap.items()
+                if shared == len(evidence_shingles) or shared == self._shingle_counts[index]
+            }
+            containment_candidates.update(self._short_sentences)
+
+        for index in sorted(containment_candidates):
+            normalized_sentence = self._normalized[index]
+            if normalized_evidence in normalized_sentence or normalized_sentence in normalized_evidence:
+                return self.sentences[index]
+
+        best_index = None
+        best_score = 0.0
+        # Every sentence sharing a shingle is scored. Ranking by overlap relative
+        # to both shingle counts (not the raw count, which favours long
+        # sentences) finds the best match early, so the length and quick-ratio
+        # bounds below skip most of the rest.
+        evidence_shingle_count = len(evidence_shingles)
+        fuzzy_candidates = sorted(
+            overlap,
+            key=lambda index: (
+                -overlap[index] / (evidence_shingle_count + self._shingle_counts[index]),
+                index,
+            ),
         )
-        return best_sentence
+        if len(normalized_evidence) < _SHORT_EVIDENCE_CHARS:
+            # Very short strings can be close matches without sharing a shingle.
+            fuzzy_candidates = range(len(self._normalized))
+
+        for index in fuzzy_candidates:
+            normalized_sentence = self._normalized[index]
+            total_length = len(normalized_evidence) + len(normalized_sentence)
+            length_bound = 2.0 * min(len(normalized_evidence), len(normalized_sentence)) / total_length
+            floor = max(_FUZZY_MATCH_THRESHOLD, best_score)
+            if length_bound < floor:
+                continue
+
+            matcher = SequenceMatcher(None, normalized_evidence, normalized_sentence)
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                continue
 
-    return None
+            score = matcher.ratio()
+            if score > best_score or (score == best_score and best_index is not None and index < best_index):
+                best_score = score
+                best_index = index
+
+        if best_index is not None and best_score >= _FUZZY_MATCH_THRESHOLD:
+            best_sentence = self.sentences[best_index]
+            logger.info(
+                "NARRATIVE_FACT_EVIDENCE_FUZZY_MATCH score=%.2f evidence=%s matched=%s",
+                best_score,
+                _shorten(evidence, 160),
+                _shorten(best_sentence.text, 160),
+            )
+            return best_sentence
+
+        return None
 
 
 def _clamp_confidence(value: object) -> float:
@@ -106,31 +317,28 @@ def _shorten(value: object, limit: int = 180) -> str:
     return text[: limit - 3] + "..."
 
 
-def _deduplicate_relationships(rels: List[Relationship]) -> List[Relationship]:
-    seen: set = set()
-    result = []
-    duplicates = 0
-    for rel in rels:
-        key = (
-            rel.source.lower(),
-            rel.target.lower(),
-            rel.relation_type.lower(),
-            (rel.evidence or "").lower(),
-        )
-        if key in seen:
-            duplicates += 1
-            continue
-        seen.add(key)
-        result.append(rel)
-    if duplicates:
-        logger.info("NARRATIVE_FACT_DEDUP removed_duplicates=%s", duplicates)
-    return result
+def _relationship_key(rel: Relationship) -> tuple:
+    # Facts are deduplicated as they are accepted, so repeats never reach
+    # on_fact or count towards LAYER3_MAX_ACCEPTED_FACTS.
+    return (
+        rel.source.lower(),
+        rel.target.lower(),
+        rel.relation_type.lower(),
+        (rel.evidence or "").lower(),
+    )
 
 
 class NarrativeFactValidator:
-    def __init__(self, entities: List[Entity], scene_text: str):
+    def __init__(
+        self,
+        entities: List[Entity],
+        scene_text: str,
+        scene_context: Optional[SceneContext] = None,
+    ):
         self.entities = entities
-        self.sentences = _split_sentences(scene_text)
+        self.name_index = EntityNameIndex(entities)
+        self.scene_context = scene_context or split_scene_context(scene_text)
+        self.evidence_index = EvidenceIndex(self.scene_context.sentences)
         self.rejection_counts: Counter[str] = Counter()
         self.rejection_examples: Dict[str, str] = {}
 
@@ -145,8 +353,8 @@ class NarrativeFactValidator:
         )
 
     def validate(self, item: dict) -> Optional[Relationship]:
-        source = _match_name(str(item.get("source", "")), self.entities)
-        target = _match_name(str(item.get("target", "")), self.entities)
+        source = self.name_index.match(str(item.get("source", "")))
+        target = self.name_index.match(str(item.get("target", "")))
         if not source or not target or source == target:
             self._reject(
                 "unresolved_endpoints",
@@ -170,8 +378,8 @@ class NarrativeFactValidator:
             self._reject("relation_too_long", item, f"relation={relation_type}")
             return None
 
-        evidence = _evidence_in_scene(str(item.get("evidence", "")), self.sentences)
-        if not evidence:
+        evidence = self.evidence_index.lookup(str(item.get("evidence", "")))
+        if evidence is None:
             self._reject(
                 "missing_exact_evidence",
                 item,
@@ -196,7 +404,9 @@ class NarrativeFactValidator:
             relation_type=relation_type,
             when=when,
             category=None,
-            evidence=evidence,
+            evidence=evidence.text,
+            evidence_start=evidence.start,
+            evidence_end=evidence.end,
             confidence=confidence,
         )
 
@@ -221,12 +431,15 @@ class BatchLLMProcessor:
         self,
         entities: List[Entity],
         scene_text: str,
+        scene_context: Optional[SceneContext] = None,
+        on_fact: Optional[Callable[[Relationship], None]] = None,
     ) -> Tuple[List[Entity], List[Relationship]]:
+        scene_context = scene_context or split_scene_context(scene_text)
         entity_list_str = _format_entity_list(entities)
         logger.info(
             "NARRATIVE_FACT_INPUT scene_chars=%s sentences=%s candidate_entities=%s",
             len(scene_text),
-            len(_split_sentences(scene_text)),
+            len(scene_context.sentences),
             len(entities),
         )
         logger.info(
@@ -247,65 +460,114 @@ class BatchLLMProcessor:
 
 Candidate entities:
 {entity_list_str}
+"""
 
-Extract a compact knowledge graph from the scene.
-
-Use only the exact candidate entities above. Do not invent entities, objects, or places that are missing from the candidate list.
-Extract relationships that are stated or strongly implied by the scene.
-Prefer story-relevant facts: actions with consequences, discoveries, suspicions, deception, possession, evidence, locations, emotional/social ties, motives, conflicts, and important state changes.
-Skip mundane movement, posture, looking, ordinary speech, and background atmosphere unless it changes what the reader knows about the plot or a character.
-
-For relation labels, write a short natural verb phrase such as "killed", "lied_to", "found", "hid_from", "was_married_to", "owned", or "was_seen_at".
-Do not force labels into a predefined ontology. Use the wording that best fits the scene.
-
-For evidence, copy the shortest exact sentence or clause from the scene that supports the relationship.
+        logger.info("Batch LLM narrative-fact call: %s entities", len(entities))
+        if settings.LAYER3_STREAMING:
+            return self._process_stream(prompt, entities, scene_text, scene_context, on_fact)
 
-Respond with ONLY valid JSON. No markdown, no explanation.
+        response = self.llm_loader.generate(
+            prompt,
+            max_tokens=1200,
+            prefix=NARRATIVE_FACT_INSTRUCTIONS,
+        )
+        logger.info(
+            "NARRATIVE_FACT_LLM_RAW_RESPONSE chars=%s preview=%s",
+            len(response),
+            _shorten(response, 900),
+        )
 
-{{
-  "entities": [
-    {{
-      "name": "<exact candidate entity name>",
-      "description": "<one short scene-grounded description, or null>"
-    }}
-  ],
-  "relationships": [
-    {{
-      "source": "<exact candidate entity name>",
-      "target": "<exact candidate entity name>",
-      "relation_type": "<short natural relation label>",
-      "when": "<explicit time phrase, or null>",
-      "evidence": "<exact supporting sentence or clause copied from the scene>",
-      "confidence": 0.85
-    }}
-  ]
-}}
+        return self._parse(response, entities, scene_text, scene_context, on_fact)
 
-Rules:
-- Every relationship must connect two different candidate entities.
-- The source and target must be copied exactly from the candidate entity list.
-- Every relationship must include exact evidence copied from the scene.
-- Use confidence between 0.5 and 1.0 for relationships you include.
-- Return every clearly supported story-relevant relationship, but avoid duplicates and weak guesses.
-- If no useful relationships are supported, return an empty relationships array.
-- Prefer precision over volume.
-"""
-
-        logger.info("Batch LLM narrative-fact call: %s entities", len(entities))
-        response = self.llm_loader.generate(prompt, max_tokens=1200)
+    def _process_stream(
+        self,
+        prompt: str,
+        original_entities: List[Entity],
+        scene_text: str,
+        scene_context: SceneContext,
+        on_fact: Optional[Callable[[Relationship], None]] = None,
+    ) -> Tuple[List[Entity], List[Relationship]]:
+        # Entities and relationships are handled as soon as each JSON object
+        # closes, and generation is cut off once the configured limits are hit.
+        parser = JsonArrayItemStream(("entities", "relationships"))
+        validator = NarrativeFactValidator(original_entities, scene_text, scene_context)
+        entity_map = {entity.name: entity for entity in original_entities}
+        relationships: List[Relationship] = []
+        seen_facts: set = set()
+        duplicates = 0
+        proposed = 0
+        consecutive_rejections = 0
+        cutoff = None
+
+        stream = self.llm_loader.generate_stream(
+            prompt,
+            max_tokens=1200,
+            prefix=NARRATIVE_FACT_INSTRUCTIONS,
+        )
+        try:
+            for text in stream:
+                for key, item in parser.feed(text):
+                    if key == "entities":
+                        self._apply_entity(item, validator, entity_map)
+                        continue
+
+                    proposed += 1
+                    relationship = self._validate_relationship(item, validator)
+                    if relationship and _relationship_key(relationship) in seen_facts:
+                        # A repeat adds nothing, so it counts as a rejection.
+                        duplicates += 1
+                        relationship = None
+                    if relationship:
+                        seen_facts.add(_relationship_key(relationship))
+                        relationships.append(relationship)
+                        consecutive_rejections = 0
+                        if on_fact is not None:
+                            on_fact(relationship)
+                    else:
+                        consecutive_rejections += 1
+
+                    if settings.LAYER3_MAX_ACCEPTED_FACTS and len(relationships) >= settings.LAYER3_MAX_ACCEPTED_FACTS:
+                        cutoff = "max_accepted_facts"
+                    elif (
+                        settings.LAYER3_MAX_CONSECUTIVE_REJECTIONS
+                        and consecutive_rejections >= settings.LAYER3_MAX_CONSECUTIVE_REJECTIONS
+                    ):
+                        cutoff = "max_consecutive_rejections"
+                    if cutoff:
+                        break
+
+                if cutoff or parser.complete:
+                    break
+        finally:
+            stream.close()
+
+        response = parser.text
         logger.info(
             "NARRATIVE_FACT_LLM_RAW_RESPONSE chars=%s preview=%s",
             len(response),
             _shorten(response, 900),
         )
+        if cutoff:
+            logger.info(
+                "NARRATIVE_FACT_STREAM_CUTOFF reason=%s accepted=%s proposed=%s",
+                cutoff,
+                len(relationships),
+                proposed,
+            )
 
-        return self._parse(response, entities, scene_text)
+        if not parser.started:
+            # Nothing object-shaped was streamed; let the batch parser report it.
+            return self._parse(response, original_entities, scene_text, scene_context, on_fact)
+
+        return self._finish(validator, entity_map, relationships, duplicates)
 
     def _parse(
         self,
         response: str,
         original_entities: List[Entity],
         scene_text: str,
+        scene_context: Optional[SceneContext] = None,
+        on_fact: Optional[Callable[[Relationship], None]] = None,
     ) -> Tuple[List[Entity], List[Relationship]]:
         response = re.sub(r"```json\s*", "", response)
         response = re.sub(r"```\s*", "", response)
@@ -321,6 +583,7 @@ Rules:
             logger.warning("Batch JSON parse error (%s); entities unenriched, no relationships", exc)
             return original_entities, []
 
+        validator = NarrativeFactValidator(original_entities, scene_text, scene_context)
         entity_map = {entity.name: entity for entity in original_entities}
         raw_entities = data.get("entities", [])
         raw_relationships = data.get("relationships", [])
@@ -331,52 +594,88 @@ Rules:
         )
 
         for item in raw_entities if isinstance(raw_entities, list) else []:
-            if not isinstance(item, dict):
-                logger.info("NARRATIVE_FACT_ENTITY_REJECT reason=invalid_shape raw=%s", _shorten(item))
-                continue
+            self._apply_entity(item, validator, entity_map)
+
+        relationships: List[Relationship] = []
+        seen_facts: set = set()
+        duplicates = 0
 
-            canonical = _match_name(str(item.get("name", "")), original_entities)
-            if not canonical:
-                logger.info(
-                    "NARRATIVE_FACT_ENTITY_REJECT reason=unmatched_name name=%s raw=%s",
-                    item.get("name"),
-                    _shorten(item),
-                )
+        for item in raw_relationships if isinstance(raw_relationships, list) else []:
+            relationship = self._validate_relationship(item, validator)
+            if not relationship:
+                continue
+            key = _relationship_key(relationship)
+            if key in seen_facts:
+                duplicates += 1
                 continue
+            seen_facts.add(key)
+            relationships.append(relationship)
+            if on_fact is not None:
+                on_fact(relationship)
 
-            description = item.get("description")
-            if description is not None:
-                description = str(description).strip() or None
-            entity_map[canonical].description = description
-            entity_map[canonical].role = None
+        return self._finish(validator, entity_map, relationships, duplicates)
+
+    def _apply_entity(
+        self,
+        item: object,
+        validator: NarrativeFactValidator,
+        entity_map: Dict[str, Entity],
+    ) -> None:
+        if not isinstance(item, dict):
+            logger.info("NARRATIVE_FACT_ENTITY_REJECT reason=invalid_shape raw=%s", _shorten(item))
+            return
+
+        canonical = validator.name_index.match(str(item.get("name", "")))
+        if not canonical:
             logger.info(
-                "NARRATIVE_FACT_ENTITY_ACCEPT name=%s description=%s",
-                canonical,
-                _shorten(description, 140),
+                "NARRATIVE_FACT_ENTITY_REJECT reason=unmatched_name name=%s raw=%s",
+                item.get("name"),
+                _shorten(item),
             )
+            return
 
-        validator = NarrativeFactValidator(original_entities, scene_text)
-        relationships: List[Relationship] = []
+        description = item.get("description")
+        if description is not None:
+            description = str(description).strip() or None
+        entity_map[canonical].description = description
+        entity_map[canonical].role = None
+        logger.info(
+            "NARRATIVE_FACT_ENTITY_ACCEPT name=%s description=%s",
+            canonical,
+            _shorten(description, 140),
+        )
 
-        for item in raw_relationships if isinstance(raw_relationships, list) else []:
-            if not isinstance(item, dict):
-                logger.info("NARRATIVE_FACT_REJECT reason=invalid_shape raw=%s", _shorten(item))
-                continue
+    def _validate_relationship(
+        self,
+        item: object,
+        validator: NarrativeFactValidator,
+    ) -> Optional[Relationship]:
+        if not isinstance(item, dict):
+            logger.info("NARRATIVE_FACT_REJECT reason=invalid_shape raw=%s", _shorten(item))
+            return None
+
+        relationship = validator.validate(item)
+        if relationship:
+            logger.info(
+                "NARRATIVE_FACT_ACCEPT source=%s relation=%s target=%s category=%s confidence=%.2f evidence=%s",
+                relationship.source,
+                relationship.relation_type,
+                relationship.target,
+                relationship.category,
+                relationship.confidence or 0,
+                _shorten(relationship.evidence, 220),
+            )
+        return relationship
 
-            relationship = validator.validate(item)
-            if relationship:
-                relationships.append(relationship)
-                logger.info(
-                    "NARRATIVE_FACT_ACCEPT source=%s relation=%s target=%s category=%s confidence=%.2f evidence=%s",
-                    relationship.source,
-                    relationship.relation_type,
-                    relationship.target,
-                    relationship.category,
-                    relationship.confidence or 0,
-                    _shorten(relationship.evidence, 220),
-                )
-
-        relationships = _deduplicate_relationships(relationships)
+    def _finish(
+        self,
+        validator: NarrativeFactValidator,
+        entity_map: Dict[str, Entity],
+        relationships: List[Relationship],
+        duplicates: int = 0,
+    ) -> Tuple[List[Entity], List[Relationship]]:
+        if duplicates:
+            logger.info("NARRATIVE_FACT_DEDUP removed_duplicates=%s", duplicates)
         validator.log_summary(len(relationships))
         enriched = list(entity_map.values())
         logger.info(
@@ -390,13 +689,15 @@ Rules:
 def enrich_and_extract_batch(
     entities: List[Entity],
     scene_text: str,
+    scene_context: Optional[SceneContext] = None,
+    on_fact: Optional[Callable[[Relationship], None]] = None,
 ) -> Tuple[List[Entity], List[Relationship]]:
     logger.info("=" * 60)
     logger.info("LAYER 3+4: Narrative Fact Enrichment + Grounded Relationship Extraction")
     logger.info("=" * 60)
 
     processor = BatchLLMProcessor()
-    enriched_entities, relationships = processor.process_batch(entities, scene_text)
+    enriched_entities, relationships = processor.process_batch(entities, scene_text, scene_context, on_fact)
 
     logger.info(
         "Layer 3+4 complete: %s entities, %s relationships",
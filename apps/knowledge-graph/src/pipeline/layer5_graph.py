@@ -1,9 +1,16 @@
 import re
-from typing import List
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 from src.config import settings
 from src.models.schemas import Entity, Relationship
+from src.pipeline.graph_delta import SceneGraphDelta, diff_rows
+from src.pipeline.graph_sink import GraphSink
+from src.pipeline.graph_stats import EMPTY_SCENE, entity_stat_key, project_stat_rows, scene_stat_changes
+from src.pipeline.layer2_postprocess import canonical_entity_name
+from src.pipeline.relation_vocabulary import RelationVocabulary
 from src.utils.logger import setup_logger
-from neo4j import GraphDatabase
 
 
 logger = setup_logger(__name__)
@@ -18,16 +25,156 @@ TYPE_LABEL_MAP = {
     "PRODUCT": "Evidence",
 }
 DEFAULT_LABEL = "Entity"
+ENTITY_LABELS = sorted(set(TYPE_LABEL_MAP.values()) | {DEFAULT_LABEL})
 
+# Versioned story-graph schema. Each version lists idempotent statements; a
+# database is brought up to SCHEMA_VERSION by applying every newer version in
+# order and recording the result on a (:GraphSchema) node.
+SCHEMA_COMPONENT = "story_graph"
+SCHEMA_MIGRATIONS: Dict[int, List[str]] = {
+    1: [
+        "CREATE CONSTRAINT scene_id_unique IF NOT EXISTS "
+        "FOR (s:Scene) REQUIRE s.scene_id IS UNIQUE",
+        "CREATE CONSTRAINT case_fact_id_unique IF NOT EXISTS "
+        "FOR (f:CaseFact) REQUIRE f.fact_id IS UNIQUE",
+    ],
+    # Entities are partitioned by project: the same canonical name in two
+    # projects is two nodes, so no name is shared across tenants. The global
+    # per-label name constraints early v1 databases got are dropped; they are
+    # no longer part of v1 so a bulk-imported, already partitioned graph can
+    # be migrated from scratch.
+    2: [
+        *[
+            f"DROP CONSTRAINT {label.lower()}_name_unique IF EXISTS"
+            for label in ENTITY_LABELS
+        ],
+        *[
+            f"CREATE CONSTRAINT {label.lower()}_project_key_unique IF NOT EXISTS "
+            f"FOR (n:{label}) REQUIRE (n.project_id, n.canonical_name) IS UNIQUE"
+            for label in ENTITY_LABELS
+        ],
+        *[
+            f"CREATE INDEX {label.lower()}_project_name IF NOT EXISTS "
+            f"FOR (n:{label}) ON (n.project_id, n.name)"
+            for label in ENTITY_LABELS
+        ],
+        "CREATE INDEX scene_project IF NOT EXISTS FOR (s:Scene) ON (s.project_id)",
+        "CREATE INDEX case_fact_project_name IF NOT EXISTS FOR (f:CaseFact) ON (f.project_id, f.name)",
+    ],
+    # Per-project change counter read by graph caches (Scene.graph_version is
+    # the per-scene one).
+    3: [
+        "CREATE CONSTRAINT project_graph_id_unique IF NOT EXISTS "
+        "FOR (p:ProjectGraph) REQUIRE p.project_id IS UNIQUE",
+    ],
+    # Bounded per-project relationship vocabulary; edges keep the label the
+    # LLM produced in relation_label.
+    4: [
+        "CREATE CONSTRAINT relation_type_project_name_unique IF NOT EXISTS "
+        "FOR (t:RelationType) REQUIRE (t.project_id, t.name) IS UNIQUE",
+    ],
+    # Per-project aggregates (see graph_stats), updated with each scene delta.
+    5: [
+        "CREATE CONSTRAINT graph_stat_key_unique IF NOT EXISTS "
+        "FOR (g:GraphStat) REQUIRE (g.project_id, g.kind, g.key) IS UNIQUE",
+        "CREATE INDEX graph_stat_entity IF NOT EXISTS FOR (g:GraphStat) ON (g.project_id, g.kind, g.entity)",
+    ],
+    # co_appearance pairs are stored once (entity < other) instead of in both
+    # directions; drop the mirrored half v5 wrote.
+    6: [
+        "CREATE INDEX graph_stat_other IF NOT EXISTS FOR (g:GraphStat) ON (g.project_id, g.kind, g.other)",
+        "MATCH (g:GraphStat {kind: 'co_appearance'}) WHERE g.entity > g.other "
+        "CALL { WITH g DETACH DELETE g } IN TRANSACTIONS OF 1000 ROWS",
+    ],
+}
+SCHEMA_VERSION = max(SCHEMA_MIGRATIONS)
 
-def _get_neo4j_driver():
-    if not settings.NEO4J_URI or not settings.NEO4J_USERNAME or not settings.NEO4J_PASSWORD:
-        raise ValueError("Missing Neo4j config. Set NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD.")
 
-    return GraphDatabase.driver(
-        settings.NEO4J_URI,
-        auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
-    )
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_neo4j_driver():
+    # One pooled driver per process: connection setup, TLS and routing table
+    # fetches are paid once per container instead of once per job.
+    global _driver
+
+    if _driver is not None:
+        return _driver
+
+    with _driver_lock:
+        if _driver is None:
+            if not settings.NEO4J_URI or not settings.NEO4J_USERNAME or not settings.NEO4J_PASSWORD:
+                raise ValueError("Missing Neo4j config. Set NEO4J_URI, NEO4J_USER, and NEO4J_PASSWORD.")
+
+            from neo4j import GraphDatabase
+
+            _driver = GraphDatabase.driver(
+                settings.NEO4J_URI,
+                auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
+                max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+                max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME_SECONDS,
+                connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT_SECONDS,
+                liveness_check_timeout=settings.NEO4J_LIVENESS_CHECK_SECONDS,
+            )
+            logger.info(f"Created Neo4j driver (pool size {settings.NEO4J_MAX_POOL_SIZE})")
+
+    return _driver
+
+
+def close_neo4j_driver() -> None:
+    global _driver
+
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+            logger.info("Closed Neo4j driver")
+
+
+_schema_ready = False
+
+
+def ensure_graph_schema(driver=None) -> int:
+    # Runs once per process; safe to call before every write.
+    global _schema_ready
+
+    if _schema_ready:
+        return SCHEMA_VERSION
+
+    driver = driver or get_neo4j_driver()
+    with _driver_lock:
+        if _schema_ready:
+            return SCHEMA_VERSION
+
+        with driver.session() as session:
+            record = session.run(
+                "MATCH (v:GraphSchema {component: $component}) RETURN v.version AS version",
+                component=SCHEMA_COMPONENT,
+            ).single()
+            current = record["version"] if record and record["version"] is not None else 0
+
+            for version in sorted(SCHEMA_MIGRATIONS):
+                if version <= current:
+                    continue
+                logger.info(f"Applying story graph schema v{version}")
+                # Schema commands can't share a transaction with data writes,
+                # so each runs as its own auto-commit query.
+                for statement in SCHEMA_MIGRATIONS[version]:
+                    session.run(statement).consume()
+                session.run(
+                    """
+                    MERGE (v:GraphSchema {component: $component})
+                    SET v.version = $version, v.applied_at = datetime()
+                    """,
+                    component=SCHEMA_COMPONENT,
+                    version=version,
+                ).consume()
+                current = version
+
+        _schema_ready = True
+        logger.info(f"Story graph schema at v{current}")
+        return current
 
 
 def _get_node_label(entity_type: str) -> str:
@@ -35,203 +182,889 @@ def _get_node_label(entity_type: str) -> str:
 
 
 def _to_rel_type(relation_type: str) -> str:
-    
-    cleaned = re.sub(r"[^a-zA-Z0-9\s]", "", relation_type)
+    # Underscores and hyphens separate words, so "lied_to" becomes LIED_TO.
+    cleaned = re.sub(r"[^a-zA-Z0-9\s]", "", re.sub(r"[_-]", " ", relation_type))
     return "_".join(cleaned.upper().split())
 
 
+_ENTITY_FIELDS = ("type", "role", "description", "mentions")
+_RELATIONSHIP_FIELDS = (
+    "when", "category", "evidence", "evidence_start", "evidence_end", "confidence", "relation_label",
+)
+_FACT_FIELDS = ("project_id", "name", "rel_type") + _RELATIONSHIP_FIELDS
+
+
+def _entity_key(row: dict) -> tuple:
+    return (row["label"], row["canonical_name"])
+
+
+def _relationship_key(row: dict) -> tuple:
+    return (row["rel_type"], row["source_label"], row["source_key"], row["target_label"], row["target_key"])
+
+
+def _canonical_name(name: str) -> str:
+    return canonical_entity_name(name) or name.lower()
+
+
+def _entity_rows(entities: List[Entity]) -> Dict[tuple, dict]:
+    rows: Dict[tuple, dict] = {}
+    for entity in entities:
+        row = {
+            "label": _get_node_label(entity.type),
+            "canonical_name": _canonical_name(entity.name),
+            "name": entity.name,
+            "type": entity.type,
+            "role": entity.role,
+            "description": entity.description,
+            "mentions": entity.mentions,
+        }
+        rows[_entity_key(row)] = row
+    return rows
+
+
+def _relationship_row(rel: Relationship, scene_id: str, project_id: str = "") -> dict:
+    return {
+        "fact_id": f"{scene_id}:{rel.source}:{rel.relation_type}:{rel.target}",
+        "project_id": project_id,
+        "name": rel.relation_type.replace("_", " "),
+        "source": rel.source,
+        "target": rel.target,
+        "when": rel.when,
+        "category": rel.category,
+        "evidence": rel.evidence,
+        "evidence_start": rel.evidence_start,
+        "evidence_end": rel.evidence_end,
+        "confidence": rel.confidence,
+        "relation_label": rel.relation_type,
+    }
+
+
+def _entity_keys_by_name(entities: List[Entity]) -> Dict[str, Tuple[str, str]]:
+    keys: Dict[str, Tuple[str, str]] = {}
+    for entity in entities:
+        keys.setdefault(entity.name, (_get_node_label(entity.type), _canonical_name(entity.name)))
+    return keys
+
+
+def _relationship_and_fact_rows(
+    relationships: List[Relationship],
+    entities: List[Entity],
+    scene_id: str,
+    project_id: str = "",
+    vocabulary: Optional[RelationVocabulary] = None,
+) -> Tuple[Dict[tuple, dict], Dict[str, dict]]:
+    # Endpoint labels and keys come from the scene's entities so every
+    # statement can resolve its endpoints through the label's
+    # (project_id, canonical_name) constraint instead of scanning every node.
+    # With a vocabulary, the edge type is the project's canonical type for the
+    # label rather than the label itself.
+    keys = _entity_keys_by_name(entities)
+    rel_rows: Dict[tuple, dict] = {}
+    fact_rows: Dict[str, dict] = {}
+    skipped = 0
+    for rel in relationships:
+        if rel.source not in keys or rel.target not in keys:
+            skipped += 1
+            continue
+        source_label, source_key = keys[rel.source]
+        target_label, target_key = keys[rel.target]
+        row = _relationship_row(rel, scene_id, project_id)
+        relation_type = vocabulary.canonicalize(rel.relation_type) if vocabulary is not None else rel.relation_type
+        row.update({
+            "rel_type": _to_rel_type(relation_type),
+            "source_label": source_label,
+            "source_key": source_key,
+            "target_label": target_label,
+            "target_key": target_key,
+        })
+        rel_rows[_relationship_key(row)] = row
+        fact_rows[row["fact_id"]] = row
+
+    if skipped:
+        logger.warning(f"Skipped {skipped} relationships whose endpoints are not scene entities")
+    return rel_rows, fact_rows
+
+
+def _group_rows(rows: List[dict], *fields: str) -> Dict[tuple, List[dict]]:
+    groups: Dict[tuple, List[dict]] = defaultdict(list)
+    for row in rows:
+        groups[tuple(row[field] for field in fields)].append(row)
+    return groups
+
+
+_graph_sink: Optional[GraphSink] = None
+
+
+def get_graph_sink() -> GraphSink:
+    # One sink per process, selected by GRAPH_SINK.
+    global _graph_sink
+
+    if _graph_sink is not None:
+        return _graph_sink
+
+    sink = settings.GRAPH_SINK.lower()
+    if sink == "neo4j":
+        _graph_sink = Neo4jGraphSink()
+    elif sink == "sqlite":
+        from src.pipeline.sqlite_graph_sink import SqliteGraphSink
+
+        _graph_sink = SqliteGraphSink(settings.GRAPH_SQLITE_PATH)
+    else:
+        raise ValueError(f"Unknown GRAPH_SINK '{settings.GRAPH_SINK}'. Use neo4j or sqlite.")
+    return _graph_sink
+
+
+def close_graph_sink() -> None:
+    global _graph_sink
+
+    if _graph_sink is not None:
+        _graph_sink.close()
+        _graph_sink = None
+
+
 def save_graph_layer5(
     scene_id: str,
+    project_id: str,
     user_id: str,
     scene_text: str,
     entities: List[Entity],
     relationships: List[Relationship],
+    resolved_text: Optional[str] = None,
 ) -> dict:
+    sink = get_graph_sink()
     logger.info("=" * 60)
-    logger.info("LAYER 5: Saving Knowledge Graph to Neo4j")
+    logger.info(f"LAYER 5: Saving Knowledge Graph ({sink.name})")
     logger.info("=" * 60)
 
-    driver = _get_neo4j_driver()
+    return sink.save_scene(
+        scene_id=scene_id,
+        project_id=project_id,
+        user_id=user_id,
+        scene_text=scene_text,
+        entities=entities,
+        relationships=relationships,
+        resolved_text=resolved_text,
+    )
 
-    try:
-        with driver.session() as session:
-            session.execute_write(_create_scene, scene_id, user_id, scene_text)
-            logger.info(f"Created Scene node: {scene_id}")
-
-            for entity in entities:
-                session.execute_write(_create_entity, entity, scene_id)
-            logger.info(f"Created {len(entities)} entity nodes")
-
-            created = 0
-            for rel in relationships:
-                session.execute_write(_create_relationship, rel, scene_id)
-                session.execute_write(_create_case_fact, rel, scene_id)
-                created += 1
-            logger.info(f"Created {created} relationship edges")
-
-    except Exception as e:
-        logger.error(f"Neo4j write failed: {e}")
-        raise
-    finally:
-        driver.close()
-
-    logger.info("Layer 5 complete")
+
+def save_graph_batch_layer5(writes: List[dict]) -> Dict[str, dict]:
+    # Each write holds save_graph_layer5's keyword arguments; at most one per scene.
+    return get_graph_sink().save_scenes(writes)
+
+
+def _save_result(delta: SceneGraphDelta, entities: List[Entity], relationships: List[Relationship]) -> dict:
     return {
         "entities_saved": len(entities),
         "relationships_saved": len(relationships),
+        "changes": delta.counts(),
+    }
+
+
+_STATS_REBUILD_BATCH = 1000
+
+
+class Neo4jGraphSink(GraphSink):
+    name = "neo4j"
+
+    def ensure_schema(self) -> int:
+        return ensure_graph_schema()
+
+    def save_scene(
+        self,
+        scene_id: str,
+        project_id: str,
+        user_id: str,
+        scene_text: str,
+        entities: List[Entity],
+        relationships: List[Relationship],
+        resolved_text: Optional[str] = None,
+    ) -> dict:
+        driver = get_neo4j_driver()
+        ensure_graph_schema(driver)
+        start_time = time.time()
+
+        try:
+            with driver.session() as session:
+                delta = session.execute_write(
+                    _sync_scene_graph,
+                    scene_id,
+                    project_id,
+                    user_id,
+                    scene_text,
+                    resolved_text,
+                    entities,
+                    relationships,
+                )
+
+        except Exception as e:
+            logger.error(f"Neo4j write failed: {e}")
+            raise
+
+        if delta.is_empty:
+            logger.info(f"Layer 5 complete: scene {scene_id} unchanged ({time.time() - start_time:.2f}s)")
+        else:
+            logger.info(f"Layer 5 complete: applied {delta.counts()} ({time.time() - start_time:.2f}s)")
+        return _save_result(delta, entities, relationships)
+
+    def save_scenes(self, writes: List[dict]) -> Dict[str, dict]:
+        # All scenes are synced in one transaction, so a failure rolls the
+        # whole batch back and the caller can retry scenes one at a time.
+        driver = get_neo4j_driver()
+        ensure_graph_schema(driver)
+        start_time = time.time()
+
+        with driver.session() as session:
+            deltas = session.execute_write(_sync_scene_graphs, writes)
+
+        logger.info(f"Layer 5 batch complete: {len(writes)} scenes ({time.time() - start_time:.2f}s)")
+        return {
+            write["scene_id"]: _save_result(deltas[write["scene_id"]], write["entities"], write["relationships"])
+            for write in writes
+        }
+
+    def scene_graph(self, scene_id: str) -> dict:
+        with get_neo4j_driver().session() as session:
+            return session.execute_read(_fetch_scene_graph, scene_id)
+
+    def neighbourhood(self, project_id: str, name: str, depth: int = 1) -> dict:
+        with get_neo4j_driver().session() as session:
+            return session.execute_read(
+                _fetch_neighbourhood, project_id, _canonical_name(name), max(1, int(depth))
+            )
+
+    def project_stats(
+        self, project_id: str, kind: str, entity: Optional[str] = None, limit: int = 25
+    ) -> List[dict]:
+        with get_neo4j_driver().session() as session:
+            return session.execute_read(_fetch_project_stats, project_id, kind, entity, max(1, int(limit)))
+
+    def rebuild_stats(self, project_id: str) -> int:
+        # Recounts from the stored scenes, for backfilling projects written
+        # before the counters existed. Runs as one transaction holding the
+        # project lock, so scene writes wait instead of interleaving with it.
+        driver = get_neo4j_driver()
+        ensure_graph_schema(driver)
+        with driver.session() as session:
+            rows, scene_count = session.execute_write(_rebuild_project_stats, project_id)
+
+        logger.info(f"Rebuilt {len(rows)} graph stats for project {project_id} from {scene_count} scenes")
+        return len(rows)
+
+    def close(self) -> None:
+        close_neo4j_driver()
+
+
+def _sync_scene_graphs(tx, writes: List[dict]) -> Dict[str, SceneGraphDelta]:
+    # Lock every project up front, in order, so two batches sharing projects
+    # cannot deadlock on each other.
+    _lock_project_graphs(tx, [write["project_id"] for write in writes])
+    return {
+        write["scene_id"]: _sync_scene_graph(
+            tx,
+            write["scene_id"],
+            write["project_id"],
+            write["user_id"],
+            write["scene_text"],
+            write.get("resolved_text"),
+            write["entities"],
+            write["relationships"],
+        )
+        for write in writes
+    }
+
+
+def _sync_scene_graph(tx, scene_id, project_id, user_id, scene_text, resolved_text, entities, relationships) -> SceneGraphDelta:
+    # Read the scene's stored subgraph and apply only the difference to the new
+    # analysis, so re-analysing a scene drops stale facts and an unchanged
+    # scene costs a read. Reading inside the write transaction keeps the diff
+    # consistent with what gets written.
+    resolved_text = resolved_text if resolved_text is not None else scene_text
+    _lock_project_graphs(tx, [project_id])
+    desired_scene = {
+        "project_id": project_id,
+        "user_id": user_id,
+        "scene_text": scene_text,
+        "resolved_text": resolved_text,
     }
+    vocabulary = _read_relation_vocabulary(tx, project_id)
+    desired_rels, desired_facts = _relationship_and_fact_rows(
+        relationships, entities, scene_id, project_id, vocabulary
+    )
+    if vocabulary.added:
+        _create_relation_types(tx, project_id, vocabulary.added)
+
+    stored_scene = _read_scene(tx, scene_id)
+    if stored_scene is not None and stored_scene["project_id"] != project_id:
+        # Written before project partitioning (or moved between projects):
+        # drop what the scene owned so it is rebuilt inside its partition.
+        previous_project = stored_scene["project_id"]
+        _lock_project_graphs(tx, [previous_project])
+        _apply_graph_stats(
+            tx,
+            previous_project,
+            scene_stat_changes(_read_scene_rows(tx, scene_id, previous_project), EMPTY_SCENE),
+        )
+        _detach_scene_subgraph(tx, scene_id)
+
+    current = _read_scene_rows(tx, scene_id, project_id)
+    desired = (_entity_rows(entities), desired_rels, desired_facts)
+    delta = SceneGraphDelta(
+        scene_changed=stored_scene != desired_scene,
+        entities=diff_rows(current[0], desired[0], _ENTITY_FIELDS),
+        relationships=diff_rows(current[1], desired[1], _RELATIONSHIP_FIELDS),
+        facts=diff_rows(current[2], desired[2], _FACT_FIELDS),
+    )
+    if delta.is_empty:
+        return delta
+
+    # Deletes first, so entities only referenced by removed facts can be
+    # dropped once their last edge is gone.
+    if delta.facts.deletes:
+        _delete_case_facts(tx, delta.facts.deletes)
+    for (rel_type, source_label, target_label), rows in _group_rows(
+        delta.relationships.deletes, "rel_type", "source_label", "target_label"
+    ).items():
+        _delete_relationships(tx, rel_type, source_label, target_label, rows, scene_id, project_id)
+    for (label,), rows in _group_rows(delta.entities.deletes, "label").items():
+        _delete_entity_appearances(tx, label, rows, scene_id, project_id)
+
+    if delta.scene_changed:
+        _create_scene(tx, scene_id, project_id, user_id, scene_text, resolved_text)
+    for (label,), rows in _group_rows(delta.entities.upserts, "label").items():
+        _create_entities(tx, label, rows, scene_id, project_id)
+    for (rel_type, source_label, target_label), rows in _group_rows(
+        delta.relationships.upserts, "rel_type", "source_label", "target_label"
+    ).items():
+        _create_relationships(tx, rel_type, source_label, target_label, rows, scene_id, project_id)
+    for (source_label, target_label), rows in _group_rows(
+        delta.facts.upserts, "source_label", "target_label"
+    ).items():
+        _create_case_facts(tx, source_label, target_label, rows, scene_id, project_id)
+
+    _apply_graph_stats(tx, project_id, scene_stat_changes(current, desired))
+
+    changed_projects = {project_id}
+    if stored_scene is not None and stored_scene["project_id"]:
+        changed_projects.add(stored_scene["project_id"])
+    _bump_graph_versions(tx, scene_id, sorted(changed_projects))
+
+    return delta
+
+
+def _entity_label(labels: List[str]) -> Optional[str]:
+    return next((label for label in labels if label in ENTITY_LABELS), None)
+
+
+def _read_relation_vocabulary(tx, project_id: str) -> RelationVocabulary:
+    # Read inside the write transaction so scenes of one project written
+    # concurrently (or in one batch) extend the same vocabulary.
+    records = tx.run(
+        """
+        MATCH (t:RelationType {project_id: $project_id})
+        RETURN t.name AS name
+        ORDER BY t.created_at, t.name
+        """,
+        project_id=project_id,
+    )
+    return RelationVocabulary(project_id, [record["name"] for record in records])
+
+
+def _create_relation_types(tx, project_id: str, names: List[str]):
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MERGE (t:RelationType {project_id: $project_id, name: row.name})
+        ON CREATE SET t.rel_type = row.rel_type, t.created_at = datetime()
+        """,
+        rows=[{"name": name, "rel_type": _to_rel_type(name)} for name in names],
+        project_id=project_id,
+    )
+
+
+def _read_scene(tx, scene_id: str) -> Optional[dict]:
+    record = tx.run(
+        """
+        MATCH (s:Scene {scene_id: $scene_id})
+        RETURN s.project_id AS project_id, s.user_id AS user_id,
+               s.scene_text AS scene_text, s.resolved_text AS resolved_text
+        """,
+        scene_id=scene_id,
+    ).single()
+    return dict(record) if record else None
+
+
+def _read_scene_entities(tx, scene_id: str, project_id: str) -> Dict[tuple, dict]:
+    records = tx.run(
+        """
+        MATCH (e)-[r:APPEARS_IN]->(:Scene {scene_id: $scene_id})
+        WHERE e.project_id = $project_id
+          AND any(label IN labels(e) WHERE label IN $labels)
+        RETURN labels(e) AS labels, e.canonical_name AS canonical_name, e.name AS name,
+               e.type AS type, e.role AS role, e.description AS description,
+               r.mentions AS mentions
+        """,
+        scene_id=scene_id,
+        project_id=project_id,
+        labels=ENTITY_LABELS,
+    )
+    rows: Dict[tuple, dict] = {}
+    for record in records:
+        row = dict(record)
+        row["label"] = _entity_label(row.pop("labels"))
+        rows[_entity_key(row)] = row
+    return rows
+
+
+def _read_scene_relationships(tx, scene_id: str, project_id: str) -> Dict[tuple, dict]:
+    records = tx.run(
+        """
+        MATCH (a)-[:APPEARS_IN]->(:Scene {scene_id: $scene_id})
+        WHERE a.project_id = $project_id
+        MATCH (a)-[r]->(b)
+        WHERE r.scene_id = $scene_id
+        RETURN type(r) AS rel_type, labels(a) AS source_labels, a.canonical_name AS source_key,
+               a.name AS source, labels(b) AS target_labels, b.canonical_name AS target_key,
+               b.name AS target,
+               r.when AS when, r.category AS category, r.evidence AS evidence,
+               r.evidence_start AS evidence_start, r.evidence_end AS evidence_end,
+               r.confidence AS confidence, r.relation_label AS relation_label
+        """,
+        scene_id=scene_id,
+        project_id=project_id,
+    )
+    rows: Dict[tuple, dict] = {}
+    for record in records:
+        row = dict(record)
+        row["source_label"] = _entity_label(row.pop("source_labels"))
+        row["target_label"] = _entity_label(row.pop("target_labels"))
+        if row["source_label"] and row["target_label"]:
+            rows[_relationship_key(row)] = row
+    return rows
+
+
+def _read_scene_rows(tx, scene_id: str, project_id: str):
+    return (
+        _read_scene_entities(tx, scene_id, project_id),
+        _read_scene_relationships(tx, scene_id, project_id),
+        _read_scene_facts(tx, scene_id),
+    )
 
 
-def _create_scene(tx, scene_id, user_id, scene_text):
+def _read_scene_facts(tx, scene_id: str) -> Dict[str, dict]:
+    records = tx.run(
+        """
+        MATCH (f:CaseFact)-[:APPEARS_IN]->(:Scene {scene_id: $scene_id})
+        RETURN f.fact_id AS fact_id, f.project_id AS project_id, f.name AS name, f.rel_type AS rel_type,
+               f.when AS when, f.category AS category,
+               f.evidence AS evidence, f.evidence_start AS evidence_start,
+               f.evidence_end AS evidence_end, f.confidence AS confidence,
+               f.relation_label AS relation_label
+        """,
+        scene_id=scene_id,
+    )
+    return {record["fact_id"]: dict(record) for record in records}
+
+
+def _create_scene(tx, scene_id, project_id, user_id, scene_text, resolved_text=None):
+    # Evidence offsets on facts point into resolved_text.
     tx.run(
         """
         MERGE (s:Scene {scene_id: $scene_id})
-        SET s.user_id       = $user_id,
-            s.scene_text    = $scene_text
+        SET s.project_id    = $project_id,
+            s.user_id       = $user_id,
+            s.scene_text    = $scene_text,
+            s.resolved_text = $resolved_text
         """,
         scene_id=scene_id,
+        project_id=project_id,
         user_id=user_id,
         scene_text=scene_text,
+        resolved_text=resolved_text if resolved_text is not None else scene_text,
     )
 
 
-def _create_entity(tx, entity: Entity, scene_id: str):
-    label = _get_node_label(entity.type)
+def _create_entities(tx, label: str, rows: List[dict], scene_id: str, project_id: str):
     tx.run(
         f"""
-        MERGE (e:{label} {{name: $name}})
-        SET e.type        = $type,
-            e.role        = $role,
-            e.description = $description
-        WITH e
         MATCH (s:Scene {{scene_id: $scene_id}})
+        UNWIND $rows AS row
+        MERGE (e:{label} {{project_id: $project_id, canonical_name: row.canonical_name}})
+        SET e.name        = row.name,
+            e.type        = row.type,
+            e.role        = row.role,
+            e.description = row.description
         MERGE (e)-[r:APPEARS_IN]->(s)
-        SET r.mentions = $mentions
+        SET r.mentions = row.mentions
         """,
-        name=entity.name,
-        type=entity.type,
-        role=entity.role,
-        description=entity.description,
-        mentions=entity.mentions,
+        rows=rows,
         scene_id=scene_id,
+        project_id=project_id,
     )
 
 
-def _create_relationship(tx, rel: Relationship, scene_id: str):
-    rel_type = _to_rel_type(rel.relation_type)
+def _create_relationships(
+    tx, rel_type: str, source_label: str, target_label: str, rows: List[dict], scene_id: str, project_id: str
+):
+    # Keyed by scene so each scene owns its own edge and can replace it
+    # without touching what other scenes said about the same pair.
     tx.run(
         f"""
-        MATCH (a {{name: $source}})
-        MATCH (b {{name: $target}})
-        MERGE (a)-[r:{rel_type}]->(b)
-        SET r.scene_id    = $scene_id,
-            r.when        = $when,
-            r.category    = $category,
-            r.evidence    = $evidence,
-            r.confidence  = $confidence,
-            r.description = $evidence
-        """,
-        source=rel.source,
-        target=rel.target,
+        UNWIND $rows AS row
+        MATCH (a:{source_label} {{project_id: $project_id, canonical_name: row.source_key}})
+        MATCH (b:{target_label} {{project_id: $project_id, canonical_name: row.target_key}})
+        MERGE (a)-[r:{rel_type} {{scene_id: $scene_id}}]->(b)
+        SET r.when        = row.when,
+            r.category    = row.category,
+            r.evidence    = row.evidence,
+            r.evidence_start = row.evidence_start,
+            r.evidence_end   = row.evidence_end,
+            r.confidence  = row.confidence,
+            r.description = row.evidence,
+            r.relation_label = row.relation_label
+        """,
+        rows=rows,
         scene_id=scene_id,
-        when=rel.when,
-        category=rel.category,
-        evidence=rel.evidence,
-        confidence=rel.confidence,
+        project_id=project_id,
     )
 
 
-def _create_case_fact(tx, rel: Relationship, scene_id: str):
-    fact_id = f"{scene_id}:{rel.source}:{rel.relation_type}:{rel.target}"
+def _create_case_facts(
+    tx, source_label: str, target_label: str, rows: List[dict], scene_id: str, project_id: str
+):
     tx.run(
-        """
-        MATCH (s:Scene {scene_id: $scene_id})
-        MATCH (a {name: $source})
-        MATCH (b {name: $target})
-        MERGE (f:CaseFact {fact_id: $fact_id})
-        SET f.name        = $name,
+        f"""
+        MATCH (s:Scene {{scene_id: $scene_id}})
+        UNWIND $rows AS row
+        MATCH (a:{source_label} {{project_id: $project_id, canonical_name: row.source_key}})
+        MATCH (b:{target_label} {{project_id: $project_id, canonical_name: row.target_key}})
+        MERGE (f:CaseFact {{fact_id: row.fact_id}})
+        SET f.project_id  = $project_id,
+            f.name        = row.name,
             f.type        = "case_fact",
-            f.category    = $category,
-            f.evidence    = $evidence,
-            f.description = $evidence,
-            f.confidence  = $confidence,
-            f.when        = $when
+            f.category    = row.category,
+            f.evidence    = row.evidence,
+            f.evidence_start = row.evidence_start,
+            f.evidence_end   = row.evidence_end,
+            f.description = row.evidence,
+            f.confidence  = row.confidence,
+            f.when        = row.when,
+            f.rel_type    = row.rel_type,
+            f.relation_label = row.relation_label
         MERGE (f)-[:APPEARS_IN]->(s)
         MERGE (a)-[:SOURCE_OF]->(f)
         MERGE (f)-[:TARGETS]->(b)
         """,
-        fact_id=fact_id,
-        name=rel.relation_type.replace("_", " "),
+        rows=rows,
         scene_id=scene_id,
-        source=rel.source,
-        target=rel.target,
-        category=rel.category,
-        evidence=rel.evidence,
-        confidence=rel.confidence,
-        when=rel.when,
-    )
-
-
-# def get_scene_graph(scene_id: str) -> dict:
-#     driver = _get_neo4j_driver()
-
-#     try:
-#         with driver.session() as session:
-#             result = session.execute_read(_fetch_scene_graph, scene_id)
-#         return result
-#     finally:
-#         driver.close()
-
-
-# def _fetch_scene_graph(tx, scene_id: str) -> dict:
-#     records = tx.run(
-#         """
-#         MATCH (e)-[r:APPEARS_IN]->(s:Scene {scene_id: $scene_id})
-#         OPTIONAL MATCH (e)-[rel]->(e2)
-#         WHERE NOT type(rel) = 'APPEARS_IN'
-#           AND (e2)-[:APPEARS_IN]->(s)
-#         RETURN 
-#             e.name        AS source_name,
-#             labels(e)[0]  AS source_label,
-#             e.role        AS source_role,
-#             e2.name       AS target_name,
-#             labels(e2)[0] AS target_label,
-#             type(rel)     AS rel_type,
-#             rel.description AS rel_description,
-#             rel.confidence  AS rel_confidence
-#         """,
-#         scene_id=scene_id,
-#     )
-
-#     nodes = {}
-#     edges = []
-
-#     for record in records:
-#         src = record["source_name"]
-#         if src and src not in nodes:
-#             nodes[src] = {
-#                 "id":    src,
-#                 "label": record["source_label"],
-#                 "role":  record["source_role"],
-#             }
-
-#         tgt = record["target_name"]
-#         if tgt:
-#             if tgt not in nodes:
-#                 nodes[tgt] = {
-#                     "id":    tgt,
-#                     "label": record["target_label"],
-#                     "role":  None,
-#                 }
-#             edges.append({
-#                 "source":      src,
-#                 "target":      tgt,
-#                 "type":        record["rel_type"],
-#                 "description": record["rel_description"],
-#                 "confidence":  record["rel_confidence"],
-#             })
-
-#     return {
-#         "nodes": list(nodes.values()),
-#         "edges": edges,
-#     }
+        project_id=project_id,
+    )
+
+
+def _delete_case_facts(tx, rows: List[dict]):
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (f:CaseFact {fact_id: row.fact_id})
+        DETACH DELETE f
+        """,
+        rows=[{"fact_id": row["fact_id"]} for row in rows],
+    )
+
+
+def _delete_relationships(
+    tx, rel_type: str, source_label: str, target_label: str, rows: List[dict], scene_id: str, project_id: str
+):
+    tx.run(
+        f"""
+        UNWIND $rows AS row
+        MATCH (a:{source_label} {{project_id: $project_id, canonical_name: row.source_key}})
+              -[r:{rel_type}]->(b:{target_label} {{project_id: $project_id, canonical_name: row.target_key}})
+        WHERE r.scene_id = $scene_id
+        DELETE r
+        """,
+        rows=[{"source_key": row["source_key"], "target_key": row["target_key"]} for row in rows],
+        scene_id=scene_id,
+        project_id=project_id,
+    )
+
+
+def _delete_entity_appearances(tx, label: str, rows: List[dict], scene_id: str, project_id: str):
+    # The entity itself is only removed once no other scene or fact uses it.
+    tx.run(
+        f"""
+        UNWIND $rows AS row
+        MATCH (e:{label} {{project_id: $project_id, canonical_name: row.canonical_name}})
+              -[r:APPEARS_IN]->(:Scene {{scene_id: $scene_id}})
+        DELETE r
+        WITH DISTINCT e
+        WHERE NOT (e)--()
+        DELETE e
+        """,
+        rows=[{"canonical_name": row["canonical_name"]} for row in rows],
+        scene_id=scene_id,
+        project_id=project_id,
+    )
+
+
+def _bump_graph_versions(tx, scene_id: str, project_ids: List[str]):
+    # Readers cache subgraphs by these versions, so they only move when the
+    # scene's graph actually changed.
+    tx.run(
+        """
+        MATCH (s:Scene {scene_id: $scene_id})
+        SET s.graph_version = coalesce(s.graph_version, 0) + 1,
+            s.updated_at    = datetime()
+        WITH s
+        UNWIND $project_ids AS project_id
+        MERGE (p:ProjectGraph {project_id: project_id})
+        SET p.version    = coalesce(p.version, 0) + 1,
+            p.updated_at = datetime()
+        """,
+        scene_id=scene_id,
+        project_ids=project_ids,
+    )
+
+
+def _lock_project_graphs(tx, project_ids: List[str]):
+    # Writing the ProjectGraph node takes its write lock until commit. Scene
+    # syncs and stats rebuilds both take it before reading any counts, so a
+    # rebuild never interleaves with a scene's counter updates.
+    tx.run(
+        """
+        UNWIND $project_ids AS project_id
+        MERGE (p:ProjectGraph {project_id: project_id})
+        SET p.locked_at = datetime()
+        """,
+        project_ids=sorted(set(project_ids)),
+    )
+
+
+def _apply_graph_stats(tx, project_id: str, rows: List[dict]):
+    # Counters that drop to zero are removed, so a stat exists only while
+    # something in the graph backs it.
+    if not rows:
+        return
+    tx.run(
+        """
+        UNWIND $rows AS row
+        MERGE (g:GraphStat {project_id: $project_id, kind: row.kind, key: row.key})
+        ON CREATE SET g.entity = row.entity, g.other = row.other
+        SET g.count = coalesce(g.count, 0) + row.change
+        WITH g
+        WHERE g.count <= 0
+        DELETE g
+        """,
+        rows=rows,
+        project_id=project_id,
+    )
+
+
+def _detach_scene_subgraph(tx, scene_id: str):
+    tx.run(
+        """
+        MATCH (f:CaseFact)-[:APPEARS_IN]->(:Scene {scene_id: $scene_id})
+        DETACH DELETE f
+        """,
+        scene_id=scene_id,
+    )
+    tx.run(
+        """
+        MATCH (e)-[a:APPEARS_IN]->(:Scene {scene_id: $scene_id})
+        OPTIONAL MATCH (e)-[r]->()
+        WHERE r.scene_id = $scene_id
+        DELETE a, r
+        WITH DISTINCT e
+        WHERE NOT (e)--()
+        DELETE e
+        """,
+        scene_id=scene_id,
+    )
+
+
+def _read_project_scene_ids(tx, project_id: str) -> List[str]:
+    records = tx.run(
+        "MATCH (s:Scene {project_id: $project_id}) RETURN s.scene_id AS scene_id ORDER BY scene_id",
+        project_id=project_id,
+    )
+    return [record["scene_id"] for record in records]
+
+
+def _read_scenes_rows(tx, scene_ids: List[str], project_id: str) -> list:
+    return [_read_scene_rows(tx, scene_id, project_id) for scene_id in scene_ids]
+
+
+def _rebuild_project_stats(tx, project_id: str) -> Tuple[List[dict], int]:
+    _lock_project_graphs(tx, [project_id])
+    scene_ids = _read_project_scene_ids(tx, project_id)
+    rows = project_stat_rows(_read_scenes_rows(tx, scene_ids, project_id))
+    while _delete_project_stats(tx, project_id, _STATS_REBUILD_BATCH):
+        pass
+    for start in range(0, len(rows), _STATS_REBUILD_BATCH):
+        _apply_graph_stats(tx, project_id, rows[start:start + _STATS_REBUILD_BATCH])
+    return rows, len(scene_ids)
+
+
+def _delete_project_stats(tx, project_id: str, limit: int) -> int:
+    record = tx.run(
+        """
+        MATCH (g:GraphStat {project_id: $project_id})
+        WITH g LIMIT $limit
+        DETACH DELETE g
+        RETURN count(*) AS deleted
+        """,
+        project_id=project_id,
+        limit=limit,
+    ).single()
+    return record["deleted"]
+
+
+def _fetch_project_stats(tx, project_id: str, kind: str, entity: Optional[str], limit: int) -> List[dict]:
+    # A co_appearance pair can hold the requested entity on either side; it
+    # is returned with that entity first.
+    entity_filter = "AND (g.entity = $entity OR g.other = $entity)" if entity else ""
+    records = tx.run(
+        f"""
+        MATCH (g:GraphStat {{project_id: $project_id, kind: $kind}})
+        WHERE g.count > 0 {entity_filter}
+        RETURN
+            g.key AS key,
+            CASE WHEN g.other = $entity THEN g.other ELSE g.entity END AS entity,
+            CASE WHEN g.other = $entity THEN g.entity ELSE g.other END AS other,
+            g.count AS count
+        ORDER BY g.count DESC, g.key
+        LIMIT $limit
+        """,
+        project_id=project_id,
+        kind=kind,
+        entity=entity,
+        limit=limit,
+    )
+    return [dict(record) for record in records]
+
+
+def _graph_node_id(labels: List[str], canonical_name: str) -> str:
+    # "Label:canonical_name", as the query engine keys graph nodes, so a
+    # PERSON and a LOCATION sharing a canonical name stay separate nodes.
+    return entity_stat_key(_entity_label(labels), canonical_name)
+
+
+def _graph_node(labels: List[str], canonical_name: str, name: str, role: Optional[str]) -> dict:
+    return {"id": _graph_node_id(labels, canonical_name), "label": _entity_label(labels), "name": name, "role": role}
+
+
+def _fetch_scene_graph(tx, scene_id: str) -> dict:
+    records = tx.run(
+        """
+        MATCH (s:Scene {scene_id: $scene_id})
+        MATCH (e)-[:APPEARS_IN]->(s)
+        WHERE e.project_id = s.project_id
+          AND any(label IN labels(e) WHERE label IN $labels)
+        OPTIONAL MATCH (e)-[rel]->(e2)
+        WHERE rel.scene_id = $scene_id
+        RETURN
+            e.canonical_name  AS source_id,
+            labels(e)         AS source_labels,
+            e.name            AS source_name,
+            e.role            AS source_role,
+            e2.canonical_name AS target_id,
+            labels(e2)        AS target_labels,
+            e2.name           AS target_name,
+            e2.role           AS target_role,
+            type(rel)         AS rel_type,
+            rel.description   AS rel_description,
+            rel.confidence    AS rel_confidence,
+            rel.relation_label AS rel_label
+        """,
+        scene_id=scene_id,
+        labels=ENTITY_LABELS,
+    )
+
+    nodes = {}
+    edges = []
+
+    for record in records:
+        src = _graph_node_id(record["source_labels"], record["source_id"])
+        if src not in nodes:
+            nodes[src] = _graph_node(
+                record["source_labels"], record["source_id"], record["source_name"], record["source_role"]
+            )
+
+        if record["target_id"]:
+            tgt = _graph_node_id(record["target_labels"], record["target_id"])
+            if tgt not in nodes:
+                nodes[tgt] = _graph_node(
+                    record["target_labels"], record["target_id"], record["target_name"], record["target_role"]
+                )
+            edges.append({
+                "source":      src,
+                "target":      tgt,
+                "type":        record["rel_type"],
+                "label":       record["rel_label"],
+                "scene_id":    scene_id,
+                "description": record["rel_description"],
+                "confidence":  record["rel_confidence"],
+            })
+
+    return {
+        "nodes": list(nodes.values()),
+        "edges": edges,
+    }
+
+
+def _fetch_neighbourhood(tx, project_id: str, canonical_name: str, depth: int) -> dict:
+    # Only scene-owned story edges are followed, never APPEARS_IN or the
+    # CaseFact links, so the walk stays inside the project's entities.
+    records = tx.run(
+        f"""
+        MATCH (e {{project_id: $project_id, canonical_name: $canonical_name}})
+        WHERE any(label IN labels(e) WHERE label IN $labels)
+        OPTIONAL MATCH (e)-[rels*1..{depth}]-(n)
+        WHERE all(r IN rels WHERE r.scene_id IS NOT NULL)
+        UNWIND CASE WHEN rels IS NULL THEN [null] ELSE rels END AS rel
+        RETURN
+            e.canonical_name AS root_id, labels(e) AS root_labels, e.name AS root_name, e.role AS root_role,
+            startNode(rel) AS source, endNode(rel) AS target,
+            type(rel) AS rel_type, rel.scene_id AS scene_id,
+            rel.description AS rel_description, rel.confidence AS rel_confidence,
+            rel.relation_label AS rel_label
+        """,
+        project_id=project_id,
+        canonical_name=canonical_name,
+        labels=ENTITY_LABELS,
+    )
+
+    nodes = {}
+    edges = {}
+
+    for record in records:
+        root = _graph_node_id(record["root_labels"], record["root_id"])
+        if root not in nodes:
+            nodes[root] = _graph_node(
+                record["root_labels"], record["root_id"], record["root_name"], record["root_role"]
+            )
+        if record["rel_type"] is None:
+            continue
+
+        endpoint_ids = []
+        for node in (record["source"], record["target"]):
+            node_id = _graph_node_id(list(node.labels), node.get("canonical_name"))
+            if node_id not in nodes:
+                nodes[node_id] = _graph_node(
+                    list(node.labels), node.get("canonical_name"), node.get("name"), node.get("role")
+                )
+            endpoint_ids.append(node_id)
+        key = (endpoint_ids[0], record["rel_type"], endpoint_ids[1], record["scene_id"])
+        edges[key] = {
+            "source":      key[0],
+            "target":      key[2],
+            "type":        record["rel_type"],
+            "label":       record["rel_label"],
+            "scene_id":    record["scene_id"],
+            "description": record["rel_description"],
+            "confidence":  record["rel_confidence"],
+        }
+
+    return {
+        "nodes": list(nodes.values()),
+        "edges": list(edges.values()),
+    }
@@ -1,6 +1,8 @@
+from typing import Callable, Optional
+
 from src.config import settings
-from src.models.schemas import PipelineResult, PipelineMetadata
-from src.pipeline.layer1_spacy import extract_entities_layer1
+from src.models.schemas import PipelineResult, PipelineMetadata, Relationship
+from src.pipeline.layer1_spacy import extract_entities_with_context_layer1
 from src.pipeline.layer2_postprocess import postprocess_entities_layer2
 from src.pipeline.layer3_enrichment import enrich_and_extract_batch
 from src.utils.logger import setup_logger
@@ -18,7 +20,12 @@ class NarrativeAnalysisPipeline:
 
             self.nlp = spacy.load(settings.SPACY_MODEL)
 
-    def process_scene(self, scene_text: str, verbose: bool = True) -> PipelineResult:
+    def process_scene(
+        self,
+        scene_text: str,
+        verbose: bool = True,
+        on_fact: Optional[Callable[[Relationship], None]] = None,
+    ) -> PipelineResult:
 
         if verbose:
             logger.info("=" * 60)
@@ -28,7 +35,8 @@ class NarrativeAnalysisPipeline:
         if verbose:
             logger.info("\n[1/3] Extracting entities with spaCy...")
 
-        raw_entities, resolved_text = extract_entities_layer1(scene_text, nlp=self.nlp)
+        raw_entities, scene_context = extract_entities_with_context_layer1(scene_text, nlp=self.nlp)
+        resolved_text = scene_context.text
         num_raw_entities = len(raw_entities)
 
         if resolved_text != scene_text and verbose:
@@ -52,7 +60,12 @@ class NarrativeAnalysisPipeline:
         if verbose:
             logger.info("\n[3/3] Batch LLM: enriching entities + extracting relationships...")
 
-        enriched_entities, relationships = enrich_and_extract_batch(clean_entities, resolved_text)
+        enriched_entities, relationships = enrich_and_extract_batch(
+            clean_entities,
+            resolved_text,
+            scene_context=scene_context,
+            on_fact=on_fact,
+        )
 
         if verbose:
             logger.info(f"Enriched {len(enriched_entities)} entities, found {len(relationships)} relationships")
@@ -106,6 +119,10 @@ class NarrativeAnalysisPipeline:
         return result
 
 
-def process_scene(scene_text: str, verbose: bool = True) -> PipelineResult:
+def process_scene(
+    scene_text: str,
+    verbose: bool = True,
+    on_fact: Optional[Callable[[Relationship], None]] = None,
+) -> PipelineResult:
     pipeline = NarrativeAnalysisPipeline()
-    return pipeline.process_scene(scene_text, verbose=verbose)
+    return pipeline.process_scene(scene_text, verbose=verbose, on_fact=on_fact)
@@ -0,0 +1,178 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from src.config import settings
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Dropped before clustering so "had killed" and "killed" share a key.
+_AUXILIARY_POS = {"AUX", "DET", "PART"}
+# Kept (as "not") even though they are tagged PART, so "did_not_kill" never
+# shares a key with "killed". Labels arrive without apostrophes ("didnt").
+_NEGATIONS = {"not", "n't", "nt", "never", "no", "nor", "neither", "cannot"}
+
+# Where labels go once a project's vocabulary is full and nothing is close
+# enough: a vague edge is better than one that says something else.
+GENERIC_RELATION_LABEL = "related_to"
+
+_nlp = None
+_nlp_unavailable = False
+_nlp_lock = threading.Lock()
+_embedding_cache: "OrderedDict[str, LabelForm]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class LabelForm(NamedTuple):
+    key: str                 # lemma key; labels with equal keys are one type
+    head: str                # lemma of the main verb (or first content word)
+    negated: bool
+    vector: Optional[object]  # unit vector, or None without spaCy vectors
+
+
+def normalize_relation_label(label: str) -> str:
+    # Same shape Layer 3 emits: lowercase words joined by underscores.
+    cleaned = re.sub(r"[^a-zA-Z0-9\s_-]", "", label or "")
+    return "_".join(cleaned.replace("-", " ").replace("_", " ").lower().split())
+
+
+def _get_nlp():
+    # Only the tagger, lemmatizer and static vectors are needed, so the graph
+    # writer can load the model without the parser or NER.
+    global _nlp, _nlp_unavailable
+
+    if _nlp is not None or _nlp_unavailable:
+        return _nlp
+
+    with _nlp_lock:
+        if _nlp is None and not _nlp_unavailable:
+            try:
+                import spacy
+
+                _nlp = spacy.load(settings.SPACY_MODEL, exclude=["parser", "ner"])
+            except (ImportError, OSError) as e:
+                _nlp_unavailable = True
+                logger.warning(f"Relation labels will not be clustered, spaCy model unavailable: {e}")
+    return _nlp
+
+
+def _is_negation(token) -> bool:
+    return token.lower_ in _NEGATIONS or token.lemma_.lower() in _NEGATIONS or token.norm_ in _NEGATIONS
+
+
+def _embed(label: str) -> LabelForm:
+    # Cached per process, since the same few hundred labels recur across
+    # every scene of every project.
+    with _cache_lock:
+        if label in _embedding_cache:
+            _embedding_cache.move_to_end(label)
+            return _embedding_cache[label]
+
+    nlp = _get_nlp()
+    if nlp is None:
+        # Without spaCy there are no vectors, so labels only ever match exactly.
+        words = label.split("_")
+        result = LabelForm(label, words[0], any(word in _NEGATIONS for word in words), None)
+    else:
+        doc = nlp(label.replace("_", " "))
+        negated = any(_is_negation(token) for token in doc)
+        content = [token for token in doc if token.pos_ not in _AUXILIARY_POS and not _is_negation(token)] or list(doc)
+        head = next((token for token in content if token.pos_ == "VERB"), content[0])
+        key = "_".join(["not"] * negated + [token.lemma_.lower() for token in content])
+        vectors = [token.vector for token in content if token.has_vector]
+        vector = None
+        if vectors:
+            vector = sum(vectors) / len(vectors)
+            norm = float((vector ** 2).sum()) ** 0.5
+            vector = vector / norm if norm else None
+        result = LabelForm(key, head.lemma_.lower(), negated, vector)
+
+    with _cache_lock:
+        _embedding_cache[label] = result
+        while len(_embedding_cache) > settings.RELATION_EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return result
+
+
+class RelationVocabulary:
+    """
+    Bounded set of canonical relationship labels for one project.
+
+    canonicalize() maps a free-text label onto an existing type when its
+    lemmas match, or when it has the same head verb and negation as the type
+    and its vector is close enough ("lied_to" / "lied_about", never "loved" /
+    "hated" or "killed" / "did_not_kill"), and otherwise adds it as a new
+    type until max_types is reached; after that unmatched labels map to
+    GENERIC_RELATION_LABEL, which is added on first use and does not count
+    towards the bound. Types added since construction are listed in `added`.
+    """
+
+    def __init__(
+        self,
+        project_id: str,
+        names: Iterable[str] = (),
+        similarity: Optional[float] = None,
+        max_types: Optional[int] = None,
+    ):
+        self.project_id = project_id
+        self.similarity = settings.RELATION_VOCAB_SIMILARITY if similarity is None else similarity
+        self.max_types = settings.RELATION_VOCAB_MAX_TYPES if max_types is None else max_types
+        self.names: List[str] = []
+        self.added: List[str] = []
+        self._by_key: Dict[str, str] = {}
+        self._forms: Dict[str, LabelForm] = {}
+        self._resolved: Dict[str, str] = {}
+        for name in names:
+            self._add(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _type_count(self) -> int:
+        return len(self.names) - (GENERIC_RELATION_LABEL in self.names)
+
+    def _add(self, name: str) -> None:
+        form = _embed(name)
+        self.names.append(name)
+        self._by_key.setdefault(form.key, name)
+        self._forms[name] = form
+
+    def _nearest(self, form: LabelForm) -> Tuple[Optional[str], float]:
+        # Word vectors put antonyms close together, so only labels that share
+        # the head verb and negation are compared at all.
+        best, best_score = None, -1.0
+        for name, other in self._forms.items():
+            if other.vector is None or other.head != form.head or other.negated != form.negated:
+                continue
+            score = float((form.vector * other.vector).sum())
+            if score > best_score:
+                best, best_score = name, score
+        return best, best_score
+
+    def canonicalize(self, label: str) -> str:
+        label = normalize_relation_label(label)
+        if not label:
+            return label
+        if label in self._resolved:
+            return self._resolved[label]
+
+        form = _embed(label)
+        canonical = self._by_key.get(form.key)
+        if canonical is None and form.vector is not None:
+            nearest, score = self._nearest(form)
+            if nearest is not None and score >= self.similarity:
+                canonical = nearest
+        if canonical is None and self._type_count() >= self.max_types:
+            canonical = GENERIC_RELATION_LABEL
+            if canonical not in self.names:
+                self._add(canonical)
+                self.added.append(canonical)
+        if canonical is None:
+            self._add(label)
+            self.added.append(label)
+            canonical = label
+
+        self._resolved[label] = canonical
+        return canonical
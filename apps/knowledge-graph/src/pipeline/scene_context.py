@@ -0,0 +1,45 @@
+import re
+from typing import Iterable, Tuple
+
+from src.models.schemas import SceneContext, SceneSentence
+
+_SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize_text(value: str) -> str:
+    return re.sub(r"\s+", " ", value.lower()).strip()
+
+
+def _build_context(text: str, spans: Iterable[Tuple[int, int]]) -> SceneContext:
+    sentences = []
+    for start, end in spans:
+        raw = text[start:end]
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        start += len(raw) - len(raw.lstrip())
+        end = start + len(stripped)
+        sentences.append(SceneSentence(
+            start=start,
+            end=end,
+            text=stripped,
+            normalized=normalize_text(stripped),
+        ))
+    return SceneContext(text=text, sentences=sentences)
+
+
+def split_scene_context(text: str) -> SceneContext:
+    """Regex sentence split, used when no parsed spaCy Doc is available."""
+    spans = []
+    start = 0
+    for match in _SENTENCE_BREAK_RE.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return _build_context(text, spans)
+
+
+def build_scene_context(doc) -> SceneContext:
+    if not doc.has_annotation("SENT_START"):
+        return split_scene_context(doc.text)
+    return _build_context(doc.text, ((sent.start_char, sent.end_char) for sent in doc.sents))
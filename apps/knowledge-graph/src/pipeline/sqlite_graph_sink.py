@@ -0,0 +1,553 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.models.schemas import Entity, Relationship
+from src.pipeline.graph_delta import SceneGraphDelta, diff_rows
+from src.pipeline.graph_sink import GraphSink
+from src.pipeline.graph_stats import EMPTY_SCENE, entity_stat_key, project_stat_rows, scene_stat_changes
+from src.pipeline.relation_vocabulary import RelationVocabulary
+from src.pipeline.layer5_graph import (
+    _ENTITY_FIELDS,
+    _FACT_FIELDS,
+    _RELATIONSHIP_FIELDS,
+    _canonical_name,
+    _entity_key,
+    _entity_rows,
+    _relationship_and_fact_rows,
+    _relationship_key,
+    _save_result,
+    _to_rel_type,
+)
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    scene_id      TEXT PRIMARY KEY,
+    project_id    TEXT NOT NULL,
+    user_id       TEXT,
+    scene_text    TEXT,
+    resolved_text TEXT
+);
+CREATE INDEX IF NOT EXISTS scenes_project ON scenes (project_id);
+
+CREATE TABLE IF NOT EXISTS entities (
+    id             INTEGER PRIMARY KEY,
+    project_id     TEXT NOT NULL,
+    label          TEXT NOT NULL,
+    canonical_name TEXT NOT NULL,
+    name           TEXT,
+    type           TEXT,
+    role           TEXT,
+    description    TEXT,
+    UNIQUE (project_id, label, canonical_name)
+);
+CREATE INDEX IF NOT EXISTS entities_project_canonical ON entities (project_id, canonical_name);
+
+CREATE TABLE IF NOT EXISTS appearances (
+    entity_id INTEGER NOT NULL REFERENCES entities (id),
+    scene_id  TEXT NOT NULL REFERENCES scenes (scene_id),
+    mentions  TEXT,
+    PRIMARY KEY (scene_id, entity_id)
+);
+CREATE INDEX IF NOT EXISTS appearances_entity ON appearances (entity_id);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    source_id      INTEGER NOT NULL REFERENCES entities (id),
+    target_id      INTEGER NOT NULL REFERENCES entities (id),
+    rel_type       TEXT NOT NULL,
+    scene_id       TEXT NOT NULL REFERENCES scenes (scene_id),
+    "when"         TEXT,
+    category       TEXT,
+    evidence       TEXT,
+    evidence_start INTEGER,
+    evidence_end   INTEGER,
+    confidence     REAL,
+    relation_label TEXT,
+    PRIMARY KEY (scene_id, rel_type, source_id, target_id)
+);
+CREATE INDEX IF NOT EXISTS relationships_source ON relationships (source_id);
+CREATE INDEX IF NOT EXISTS relationships_target ON relationships (target_id);
+
+CREATE TABLE IF NOT EXISTS case_facts (
+    fact_id        TEXT PRIMARY KEY,
+    project_id     TEXT NOT NULL,
+    scene_id       TEXT NOT NULL REFERENCES scenes (scene_id),
+    source_id      INTEGER NOT NULL REFERENCES entities (id),
+    target_id      INTEGER NOT NULL REFERENCES entities (id),
+    name           TEXT,
+    rel_type       TEXT,
+    "when"         TEXT,
+    category       TEXT,
+    evidence       TEXT,
+    evidence_start INTEGER,
+    evidence_end   INTEGER,
+    confidence     REAL,
+    relation_label TEXT
+);
+CREATE INDEX IF NOT EXISTS case_facts_scene ON case_facts (scene_id);
+CREATE INDEX IF NOT EXISTS case_facts_project_name ON case_facts (project_id, name);
+
+CREATE TABLE IF NOT EXISTS relation_types (
+    id         INTEGER PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    rel_type   TEXT NOT NULL,
+    UNIQUE (project_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS graph_stats (
+    project_id TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    entity     TEXT,
+    other      TEXT,
+    count      INTEGER NOT NULL,
+    PRIMARY KEY (project_id, kind, key)
+);
+CREATE INDEX IF NOT EXISTS graph_stats_entity ON graph_stats (project_id, kind, entity);
+CREATE INDEX IF NOT EXISTS graph_stats_other ON graph_stats (project_id, kind, other);
+
+-- co_appearance pairs are stored once (entity < other); files written
+-- before that also hold the mirrored rows.
+DELETE FROM graph_stats WHERE kind = 'co_appearance' AND entity > other;
+"""
+
+# Columns added after the first release, as (table, column, type); older
+# database files get them on open.
+_ADDED_COLUMNS = [
+    ("relationships", "relation_label", "TEXT"),
+    ("case_facts", "rel_type", "TEXT"),
+    ("case_facts", "relation_label", "TEXT"),
+]
+
+_ENTITY_ID = "(SELECT id FROM entities WHERE project_id = ? AND label = ? AND canonical_name = ?)"
+
+_RELATIONSHIP_COLUMNS = '"when", category, evidence, evidence_start, evidence_end, confidence, relation_label'
+
+
+class SqliteGraphSink(GraphSink):
+    """
+    Embedded Layer 5 backend on SQLite with the same scene / entity / CaseFact
+    model and diff-based scene updates as the Neo4j sink. Use ":memory:" for a
+    throwaway graph in tests and benchmarks.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._add_missing_columns()
+        logger.info(f"Opened SQLite graph at {path}")
+
+    def save_scene(
+        self,
+        scene_id: str,
+        project_id: str,
+        user_id: str,
+        scene_text: str,
+        entities: List[Entity],
+        relationships: List[Relationship],
+        resolved_text: Optional[str] = None,
+    ) -> dict:
+        start_time = time.time()
+        with self._lock, self._conn:
+            delta = self._sync_scene(
+                scene_id, project_id, user_id, scene_text, resolved_text, entities, relationships
+            )
+        logger.info(f"Layer 5 complete: applied {delta.counts()} ({time.time() - start_time:.2f}s)")
+        return _save_result(delta, entities, relationships)
+
+    def save_scenes(self, writes: List[dict]) -> Dict[str, dict]:
+        # One transaction for the batch, as with Neo4j.
+        with self._lock, self._conn:
+            deltas = {
+                write["scene_id"]: self._sync_scene(
+                    write["scene_id"],
+                    write["project_id"],
+                    write["user_id"],
+                    write["scene_text"],
+                    write.get("resolved_text"),
+                    write["entities"],
+                    write["relationships"],
+                )
+                for write in writes
+            }
+        return {
+            write["scene_id"]: _save_result(deltas[write["scene_id"]], write["entities"], write["relationships"])
+            for write in writes
+        }
+
+    def scene_graph(self, scene_id: str) -> dict:
+        with self._lock:
+            nodes = self._conn.execute(
+                """
+                SELECT e.label || ':' || e.canonical_name AS id, e.label, e.name, e.role
+                FROM appearances a JOIN entities e ON e.id = a.entity_id
+                WHERE a.scene_id = ?
+                """,
+                (scene_id,),
+            ).fetchall()
+            edges = self._conn.execute(
+                """
+                SELECT s.label || ':' || s.canonical_name AS source, t.label || ':' || t.canonical_name AS target,
+                       r.rel_type AS type,
+                       r.relation_label AS label, r.scene_id, r.evidence AS description, r.confidence
+                FROM relationships r
+                JOIN entities s ON s.id = r.source_id
+                JOIN entities t ON t.id = r.target_id
+                WHERE r.scene_id = ?
+                """,
+                (scene_id,),
+            ).fetchall()
+        return {"nodes": [dict(row) for row in nodes], "edges": [dict(row) for row in edges]}
+
+    def neighbourhood(self, project_id: str, name: str, depth: int = 1) -> dict:
+        canonical_name = _canonical_name(name)
+        with self._lock:
+            roots = self._conn.execute(
+                "SELECT id, canonical_name, label, name, role FROM entities "
+                "WHERE project_id = ? AND canonical_name = ?",
+                (project_id, canonical_name),
+            ).fetchall()
+            nodes = {row["id"]: row for row in roots}
+            edges = {}
+            frontier = set(nodes)
+
+            for _ in range(max(1, int(depth))):
+                if not frontier:
+                    break
+                placeholders = ",".join("?" * len(frontier))
+                rows = self._conn.execute(
+                    f"""
+                    SELECT r.source_id, r.target_id, r.rel_type, r.relation_label, r.scene_id, r.evidence, r.confidence
+                    FROM relationships r
+                    WHERE r.source_id IN ({placeholders}) OR r.target_id IN ({placeholders})
+                    """,
+                    (*frontier, *frontier),
+                ).fetchall()
+
+                reached = set()
+                for row in rows:
+                    edges[(row["source_id"], row["rel_type"], row["target_id"], row["scene_id"])] = row
+                    reached.update((row["source_id"], row["target_id"]))
+                frontier = reached - set(nodes)
+
+                if frontier:
+                    placeholders = ",".join("?" * len(frontier))
+                    for row in self._conn.execute(
+                        f"SELECT id, canonical_name, label, name, role FROM entities WHERE id IN ({placeholders})",
+                        tuple(frontier),
+                    ):
+                        nodes[row["id"]] = row
+
+        node_ids = {entity_id: entity_stat_key(row["label"], row["canonical_name"]) for entity_id, row in nodes.items()}
+        return {
+            "nodes": [
+                {"id": node_ids[entity_id], "label": row["label"], "name": row["name"], "role": row["role"]}
+                for entity_id, row in nodes.items()
+            ],
+            "edges": [
+                {
+                    "source": node_ids[row["source_id"]],
+                    "target": node_ids[row["target_id"]],
+                    "type": row["rel_type"],
+                    "label": row["relation_label"],
+                    "scene_id": row["scene_id"],
+                    "description": row["evidence"],
+                    "confidence": row["confidence"],
+                }
+                for row in edges.values()
+            ],
+        }
+
+    def project_stats(
+        self, project_id: str, kind: str, entity: Optional[str] = None, limit: int = 25
+    ) -> List[dict]:
+        # A co_appearance pair can hold the entity on either side; it is
+        # returned with that entity first.
+        entity_filter = "AND (entity = ? OR other = ?)" if entity else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT key,
+                       CASE WHEN other = ? THEN other ELSE entity END AS entity,
+                       CASE WHEN other = ? THEN entity ELSE other END AS other,
+                       count
+                FROM graph_stats
+                WHERE project_id = ? AND kind = ? AND count > 0 {entity_filter}
+                ORDER BY count DESC, key
+                LIMIT ?
+                """,
+                (entity, entity, project_id, kind, *([entity, entity] if entity else []), max(1, int(limit))),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def rebuild_stats(self, project_id: str) -> int:
+        with self._lock, self._conn:
+            scene_ids = [
+                row[0]
+                for row in self._conn.execute("SELECT scene_id FROM scenes WHERE project_id = ?", (project_id,))
+            ]
+            rows = project_stat_rows(self._read_scene_rows(scene_id) for scene_id in scene_ids)
+            self._conn.execute("DELETE FROM graph_stats WHERE project_id = ?", (project_id,))
+            self._apply_graph_stats(project_id, rows)
+        logger.info(f"Rebuilt {len(rows)} graph stats for project {project_id} from {len(scene_ids)} scenes")
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _add_missing_columns(self) -> None:
+        for table, column, kind in _ADDED_COLUMNS:
+            columns = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+
+    def _sync_scene(self, scene_id, project_id, user_id, scene_text, resolved_text, entities, relationships):
+        conn = self._conn
+        resolved_text = resolved_text if resolved_text is not None else scene_text
+        desired_scene = {
+            "project_id": project_id,
+            "user_id": user_id,
+            "scene_text": scene_text,
+            "resolved_text": resolved_text,
+        }
+        vocabulary = self._read_relation_vocabulary(project_id)
+        desired_rels, desired_facts = _relationship_and_fact_rows(
+            relationships, entities, scene_id, project_id, vocabulary
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO relation_types (project_id, name, rel_type) VALUES (?, ?, ?)",
+            [(project_id, name, _to_rel_type(name)) for name in vocabulary.added],
+        )
+
+        row = conn.execute(
+            "SELECT project_id, user_id, scene_text, resolved_text FROM scenes WHERE scene_id = ?",
+            (scene_id,),
+        ).fetchone()
+        stored_scene = dict(row) if row else None
+        if stored_scene is not None and stored_scene["project_id"] != project_id:
+            self._apply_graph_stats(
+                stored_scene["project_id"], scene_stat_changes(self._read_scene_rows(scene_id), EMPTY_SCENE)
+            )
+            self._detach_scene(scene_id)
+
+        current = self._read_scene_rows(scene_id)
+        desired = (_entity_rows(entities), desired_rels, desired_facts)
+        delta = SceneGraphDelta(
+            scene_changed=stored_scene != desired_scene,
+            entities=diff_rows(current[0], desired[0], _ENTITY_FIELDS),
+            relationships=diff_rows(current[1], desired[1], _RELATIONSHIP_FIELDS),
+            facts=diff_rows(current[2], desired[2], _FACT_FIELDS),
+        )
+        if delta.is_empty:
+            return delta
+
+        self._apply_graph_stats(project_id, scene_stat_changes(current, desired))
+
+        conn.executemany("DELETE FROM case_facts WHERE fact_id = ?", [(r["fact_id"],) for r in delta.facts.deletes])
+        conn.executemany(
+            f"""
+            DELETE FROM relationships
+            WHERE scene_id = ? AND rel_type = ? AND source_id = {_ENTITY_ID} AND target_id = {_ENTITY_ID}
+            """,
+            [
+                (scene_id, r["rel_type"], project_id, r["source_label"], r["source_key"],
+                 project_id, r["target_label"], r["target_key"])
+                for r in delta.relationships.deletes
+            ],
+        )
+        removed_ids = [
+            row[0]
+            for r in delta.entities.deletes
+            for row in conn.execute(
+                "SELECT id FROM entities WHERE project_id = ? AND label = ? AND canonical_name = ?",
+                (project_id, r["label"], r["canonical_name"]),
+            )
+        ]
+        conn.executemany(
+            "DELETE FROM appearances WHERE scene_id = ? AND entity_id = ?",
+            [(scene_id, entity_id) for entity_id in removed_ids],
+        )
+        self._delete_orphan_entities(removed_ids)
+
+        conn.execute(
+            """
+            INSERT INTO scenes (scene_id, project_id, user_id, scene_text, resolved_text)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (scene_id) DO UPDATE SET
+                project_id = excluded.project_id,
+                user_id = excluded.user_id,
+                scene_text = excluded.scene_text,
+                resolved_text = excluded.resolved_text
+            """,
+            (scene_id, project_id, user_id, scene_text, resolved_text),
+        )
+        conn.executemany(
+            """
+            INSERT INTO entities (project_id, label, canonical_name, name, type, role, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (project_id, label, canonical_name) DO UPDATE SET
+                name = excluded.name,
+                type = excluded.type,
+                role = excluded.role,
+                description = excluded.description
+            """,
+            [
+                (project_id, r["label"], r["canonical_name"], r["name"], r["type"], r["role"], r["description"])
+                for r in delta.entities.upserts
+            ],
+        )
+        conn.executemany(
+            f"""
+            INSERT INTO appearances (scene_id, entity_id, mentions)
+            VALUES (?, {_ENTITY_ID}, ?)
+            ON CONFLICT (scene_id, entity_id) DO UPDATE SET mentions = excluded.mentions
+            """,
+            [
+                (scene_id, project_id, r["label"], r["canonical_name"], json.dumps(r["mentions"]))
+                for r in delta.entities.upserts
+            ],
+        )
+        conn.executemany(
+            f"""
+            INSERT INTO relationships (source_id, target_id, rel_type, scene_id, {_RELATIONSHIP_COLUMNS})
+            VALUES ({_ENTITY_ID}, {_ENTITY_ID}, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (scene_id, rel_type, source_id, target_id) DO UPDATE SET
+                "when" = excluded."when",
+                category = excluded.category,
+                evidence = excluded.evidence,
+                evidence_start = excluded.evidence_start,
+                evidence_end = excluded.evidence_end,
+                confidence = excluded.confidence,
+                relation_label = excluded.relation_label
+            """,
+            [
+                (project_id, r["source_label"], r["source_key"], project_id, r["target_label"], r["target_key"],
+                 r["rel_type"], scene_id, *[r[field] for field in _RELATIONSHIP_FIELDS])
+                for r in delta.relationships.upserts
+            ],
+        )
+        conn.executemany(
+            f"""
+            INSERT INTO case_facts (
+                fact_id, project_id, scene_id, source_id, target_id, name, rel_type, {_RELATIONSHIP_COLUMNS}
+            )
+            VALUES (?, ?, ?, {_ENTITY_ID}, {_ENTITY_ID}, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (fact_id) DO UPDATE SET
+                project_id = excluded.project_id,
+                name = excluded.name,
+                rel_type = excluded.rel_type,
+                "when" = excluded."when",
+                category = excluded.category,
+                evidence = excluded.evidence,
+                evidence_start = excluded.evidence_start,
+                evidence_end = excluded.evidence_end,
+                confidence = excluded.confidence,
+                relation_label = excluded.relation_label
+            """,
+            [
+                (r["fact_id"], project_id, scene_id,
+                 project_id, r["source_label"], r["source_key"], project_id, r["target_label"], r["target_key"],
+                 r["name"], r["rel_type"], *[r[field] for field in _RELATIONSHIP_FIELDS])
+                for r in delta.facts.upserts
+            ],
+        )
+        return delta
+
+    def _read_relation_vocabulary(self, project_id: str) -> RelationVocabulary:
+        names = [
+            row["name"]
+            for row in self._conn.execute(
+                "SELECT name FROM relation_types WHERE project_id = ? ORDER BY id", (project_id,)
+            )
+        ]
+        return RelationVocabulary(project_id, names)
+
+    def _read_scene_rows(self, scene_id: str):
+        return self._read_entities(scene_id), self._read_relationships(scene_id), self._read_facts(scene_id)
+
+    def _apply_graph_stats(self, project_id: str, rows: List[dict]) -> None:
+        self._conn.executemany(
+            """
+            INSERT INTO graph_stats (project_id, kind, key, entity, other, count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (project_id, kind, key) DO UPDATE SET count = count + excluded.count
+            """,
+            [(project_id, r["kind"], r["key"], r["entity"], r["other"], r["change"]) for r in rows],
+        )
+        self._conn.executemany(
+            "DELETE FROM graph_stats WHERE project_id = ? AND kind = ? AND key = ? AND count <= 0",
+            [(project_id, r["kind"], r["key"]) for r in rows if r["change"] < 0],
+        )
+
+    def _read_entities(self, scene_id: str) -> Dict[tuple, dict]:
+        rows = {}
+        for record in self._conn.execute(
+            """
+            SELECT e.label, e.canonical_name, e.name, e.type, e.role, e.description, a.mentions
+            FROM appearances a JOIN entities e ON e.id = a.entity_id
+            WHERE a.scene_id = ?
+            """,
+            (scene_id,),
+        ):
+            row = dict(record)
+            row["mentions"] = json.loads(row["mentions"]) if row["mentions"] else []
+            rows[_entity_key(row)] = row
+        return rows
+
+    def _read_relationships(self, scene_id: str) -> Dict[tuple, dict]:
+        records = self._conn.execute(
+            f"""
+            SELECT r.rel_type, s.label AS source_label, s.canonical_name AS source_key, s.name AS source,
+                   t.label AS target_label, t.canonical_name AS target_key, t.name AS target,
+                   {", ".join("r." + column.strip() for column in _RELATIONSHIP_COLUMNS.split(","))}
+            FROM relationships r
+            JOIN entities s ON s.id = r.source_id
+            JOIN entities t ON t.id = r.target_id
+            WHERE r.scene_id = ?
+            """,
+            (scene_id,),
+        )
+        return {_relationship_key(row): row for row in map(dict, records)}
+
+    def _read_facts(self, scene_id: str) -> Dict[str, dict]:
+        records = self._conn.execute(
+            f"SELECT fact_id, project_id, name, rel_type, {_RELATIONSHIP_COLUMNS} FROM case_facts WHERE scene_id = ?",
+            (scene_id,),
+        )
+        return {row["fact_id"]: row for row in map(dict, records)}
+
+    def _detach_scene(self, scene_id: str) -> None:
+        entity_ids = [
+            row[0] for row in self._conn.execute("SELECT entity_id FROM appearances WHERE scene_id = ?", (scene_id,))
+        ]
+        for table in ("case_facts", "relationships", "appearances"):
+            self._conn.execute(f"DELETE FROM {table} WHERE scene_id = ?", (scene_id,))
+        self._delete_orphan_entities(entity_ids)
+
+    def _delete_orphan_entities(self, entity_ids: List[int]) -> None:
+        # An entity goes once no scene, edge or fact refers to it any more.
+        self._conn.executemany(
+            """
+            DELETE FROM entities
+            WHERE id = ?
+              AND NOT EXISTS (SELECT 1 FROM appearances a WHERE a.entity_id = entities.id)
+              AND NOT EXISTS (SELECT 1 FROM relationships r WHERE r.source_id = entities.id OR r.target_id = entities.id)
+              AND NOT EXISTS (SELECT 1 FROM case_facts f WHERE f.source_id = entities.id OR f.target_id = entities.id)
+            """,
+            [(entity_id,) for entity_id in entity_ids],
+        )
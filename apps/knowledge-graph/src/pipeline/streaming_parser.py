@@ -0,0 +1,112 @@
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class JsonArrayItemStream:
+    """
+    Incremental parser for streamed LLM output shaped like
+    {"entities": [{...}, ...], "relationships": [{...}, ...]}.
+
+    Text is fed as it is generated; every object inside one of the watched
+    top-level arrays is returned as soon as its closing brace arrives, so it can
+    be validated before the rest of the response exists. Anything before the
+    first "{" (prose, code fences) is ignored.
+    """
+
+    def __init__(self, array_keys: Iterable[str]):
+        self.array_keys = set(array_keys)
+        self.started = False
+        self.complete = False
+        self._buffer: List[str] = []
+        self._position = 0
+        # Each entry is (bracket, key) where key is the top-level key the
+        # container is the value of, if any.
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._buffer)
+
+    def feed(self, text: str) -> List[Tuple[str, object]]:
+        items: List[Tuple[str, object]] = []
+        if self.complete or not text:
+            return items
+
+        self._buffer.append(text)
+        buffered = ""
+
+        for char in text:
+            index = self._position
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._expect_key and len(self._stack) == 1:
+                        buffered = buffered or self.text
+                        self._last_key = self._decode(buffered[self._string_start:index + 1])
+                continue
+
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._stack.append(("{", None))
+                    self._expect_key = True
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char == ":":
+                self._expect_key = False
+            elif char == ",":
+                self._expect_key = self._stack[-1][0] == "{"
+            elif char in "{[":
+                key = self._last_key if len(self._stack) == 1 else None
+                if char == "{" and self._is_watched_array():
+                    self._item_start = index
+                self._stack.append((char, key))
+                self._expect_key = char == "{"
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if not self._stack:
+                    self.complete = True
+                    return items
+                if char == "}" and self._item_start is not None and self._is_watched_array():
+                    buffered = buffered or self.text
+                    raw = buffered[self._item_start:index + 1]
+                    self._item_start = None
+                    items.append((self._stack[-1][1], self._decode(raw)))
+
+        return items
+
+    def _is_watched_array(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[-1][0] == "["
+            and self._stack[-1][1] in self.array_keys
+        )
+
+    @staticmethod
+    def _decode(raw: str) -> object:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as exc:
+            logger.info("STREAMING_JSON_ITEM_PARSE_ERROR error=%s raw=%s", exc, raw[:200])
+            return raw
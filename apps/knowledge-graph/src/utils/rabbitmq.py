@@ -0,0 +1,51 @@
+import json
+import time
+
+import pika
+
+from src.config import settings
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def build_rabbitmq_params():
+    params = pika.URLParameters(settings.CLOUDAMQP_URL)
+    # Keep heartbeat high enough for cloud/network jitter.
+    params.heartbeat = max(settings.RABBITMQ_HEARTBEAT, 800)
+    params.blocked_connection_timeout = settings.RABBITMQ_BLOCKED_CONNECTION_TIMEOUT
+    return params
+
+
+def publish_json(queue: str, payload: dict, max_attempts: int = 3) -> None:
+    last_error = None
+
+    for attempt in range(1, max_attempts + 1):
+        connection = None
+        try:
+            connection = pika.BlockingConnection(build_rabbitmq_params())
+            channel = connection.channel()
+            channel.queue_declare(queue=queue, durable=True)
+
+            channel.basic_publish(
+                exchange="",
+                routing_key=queue,
+                body=json.dumps(payload),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type="application/json"
+                )
+            )
+            return
+        except Exception as e:
+            last_error = e
+            logger.error(
+                f"Publish to {queue} attempt {attempt}/{max_attempts} failed: {e}",
+                exc_info=True,
+            )
+            time.sleep(min(2 * attempt, 5))
+        finally:
+            if connection and connection.is_open:
+                connection.close()
+
+    raise RuntimeError(f"Failed to publish to {queue} after {max_attempts} attempts: {last_error}")
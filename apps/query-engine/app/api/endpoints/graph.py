@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+
+from app.core.logging import get_logger
+from app.schemas.graph import GraphResponse, GraphStatKind, GraphStatsResponse
+from app.services.graph_service import GraphNotFoundError, graph_service
+
+router = APIRouter(prefix="/graph", tags=["graph"])
+logger = get_logger(__name__)
+
+
+async def _graph_response(
+    scope: str,
+    graph_id: str,
+    response: Response,
+    if_none_match: str | None,
+) -> GraphResponse | Response:
+    try:
+        version = await graph_service.get_version(scope, graph_id)
+        etag = graph_service.etag(scope, graph_id, version)
+        # Clients revalidate every render; an unchanged graph costs one
+        # indexed version lookup and an empty 304.
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+
+        graph = await graph_service.get_graph(scope, graph_id, version)
+    except GraphNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except Exception as exc:
+        logger.exception("Graph read failed for %s %s", scope, graph_id)
+        raise HTTPException(status_code=500, detail="Graph read failed") from exc
+
+    response.headers.update(headers)
+    return graph
+
+
+@router.get("/scenes/{scene_id}", response_model=GraphResponse)
+async def get_scene_graph(
+    scene_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+):
+    return await _graph_response("scene", scene_id, response, if_none_match)
+
+
+@router.get("/projects/{project_id}", response_model=GraphResponse)
+async def get_project_graph(
+    project_id: str,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+):
+    return await _graph_response("project", project_id, response, if_none_match)
+
+
+@router.get("/projects/{project_id}/stats/{kind}", response_model=GraphStatsResponse)
+async def get_project_stats(
+    project_id: str,
+    kind: GraphStatKind,
+    response: Response,
+    entity: str | None = Query(default=None, description='Entity key ("Label:canonical_name")'),
+    limit: int = Query(default=25, ge=1, le=500),
+    if_none_match: str | None = Header(default=None),
+):
+    try:
+        version = await graph_service.get_version("project", project_id)
+        headers = {
+            "ETag": graph_service.etag("stats", f"{project_id}:{kind}", version),
+            "Cache-Control": "private, no-cache",
+        }
+        if if_none_match and headers["ETag"] in {tag.strip() for tag in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+
+        stats = await graph_service.get_project_stats(project_id, kind, version, entity, limit)
+    except Exception as exc:
+        logger.exception("Graph stats read failed for project %s", project_id)
+        raise HTTPException(status_code=500, detail="Graph stats read failed") from exc
+
+    response.headers.update(headers)
+    return stats
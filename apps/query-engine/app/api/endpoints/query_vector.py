@@ -1,18 +1,21 @@
+import json
+from collections.abc import AsyncIterator
+
 from fastapi import APIRouter
 from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
 
 from app.core.logging import get_logger
 from app.schemas.query import QueryRequest, QueryResponse
+from app.services.embedding_cache import embedding_cache
+from app.services.modal_llm import ModalLLMBusyError
 from app.services.vector_rag_service import vector_rag_service
 
 router = APIRouter(tags=["query-vector"])
 logger = get_logger(__name__)
 
 
-@router.post("/query-vector", response_model=QueryResponse)
-async def query_vector(payload: QueryRequest) -> QueryResponse:
-    logger.info("Received vector query request: %s", payload.question)
-
+def _validate_payload(payload: QueryRequest) -> None:
     if payload.fs_node_id is None or payload.fs_node_id.strip() == "":
         raise HTTPException(
             status_code=404,
@@ -25,15 +28,80 @@ async def query_vector(payload: QueryRequest) -> QueryResponse:
             detail="project_id is required and cannot be empty",
         )
 
+
+def _query_http_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, ValueError):
+        logger.warning("Vector query validation blocked: %s", str(exc))
+        return HTTPException(status_code=400, detail=str(exc))
+    if isinstance(exc, ModalLLMBusyError):
+        return HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": "1"},
+        )
+    logger.exception("Vector query processing failed")
+    return HTTPException(status_code=500, detail="Vector query processing failed")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/query-vector", response_model=QueryResponse)
+async def query_vector(payload: QueryRequest) -> QueryResponse:
+    logger.info("Received vector query request: %s", payload.question)
+    _validate_payload(payload)
+
     try:
         return await vector_rag_service.query(
             question=payload.question,
             project_id=payload.project_id,
             fs_node_id=payload.fs_node_id,
         )
-    except ValueError as exc:
-        logger.warning("Vector query validation blocked: %s", str(exc))
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
-        logger.exception("Vector query processing failed")
-        raise HTTPException(status_code=500, detail="Vector query processing failed") from exc
\ No newline at end of file
+        raise _query_http_error(exc) from exc
+
+
+@router.post("/query-vector/stream")
+async def query_vector_stream(payload: QueryRequest) -> StreamingResponse:
+    """
+    Server-sent events: "answer" events with {"delta": text} as the model
+    decodes, then a "done" event with the full QueryResponse. Failures after
+    the stream has started arrive as an "error" event.
+    """
+    logger.info("Received streaming vector query request: %s", payload.question)
+    _validate_payload(payload)
+
+    events = vector_rag_service.query_stream(
+        question=payload.question,
+        project_id=payload.project_id,
+        fs_node_id=payload.fs_node_id,
+    )
+    # Retrieval and the wait for a generation slot happen before the first
+    # event, so their failures still get a proper status code.
+    try:
+        first_event = await anext(events)
+    except Exception as exc:
+        raise _query_http_error(exc) from exc
+
+    async def body() -> AsyncIterator[str]:
+        try:
+            yield _sse_event(*first_event)
+            async for event, data in events:
+                yield _sse_event(event, data)
+        except Exception:
+            logger.exception("Streaming vector query failed")
+            yield _sse_event("error", {"detail": "Vector query processing failed"})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/query-vector/cache-stats")
+async def query_vector_cache_stats() -> dict[str, dict[str, float | int | bool]]:
+    return {"embedding_cache": embedding_cache.stats()}
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
+from app.api.endpoints.graph import router as graph_router
 from app.api.endpoints.query_vector import router as query_vector_router
 
 api_router = APIRouter()
 api_router.include_router(query_vector_router)
+api_router.include_router(graph_router)
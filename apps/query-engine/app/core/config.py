@@ -6,6 +6,8 @@ class Settings(BaseSettings):
     api_v1_prefix: str = "version1"
     log_level: str = "INFO"
     modal_timeout_seconds: int = 100
+    modal_max_concurrency: int = 4
+    modal_queue_timeout_seconds: float = 5.0
     vector_answer_modal_app_name: str = "detective-quill-answer"
     vector_answer_modal_model_class_name: str = "AnswerModel"
     supabase_url: str = ""
@@ -16,7 +18,24 @@ class Settings(BaseSettings):
     embedding_auth_scheme: str = "Bearer"
     embedding_model: str = "BAAI/bge-small-en-v1.5"
     embedding_dimensions: int = 384
+    embedding_timeout_seconds: float = 60.0
+    embedding_max_retries: int = 2
+    embedding_cache_max_entries: int = 2048
+    embedding_cache_ttl_seconds: float = 3600.0
+    embedding_cache_redis_url: str = ""
+    http2_enabled: bool = True
+    http_timeout_seconds: float = 60.0
+    http_connect_timeout_seconds: float = 5.0
+    http_connect_retries: int = 2
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
     vector_match_count: int = 8
+    neo4j_uri: str = ""
+    neo4j_user: str = ""
+    neo4j_password: str = ""
+    neo4j_max_pool_size: int = 10
+    graph_cache_max_entries: int = 256
     cors_allow_origins: list[str] = [
         "http://localhost:3000",
         "http://127.0.0.1:3000",
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _http2_available() -> bool:
+    if not settings.http2_enabled:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # One pooled client per process: outbound calls reuse kept-alive (and,
+    # with HTTP/2, multiplexed) connections instead of paying a TCP and TLS
+    # handshake per request.
+    global _http_client
+
+    if _http_client is None:
+        http2 = _http2_available()
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        )
+        # The pool lives in the transport: httpx ignores the client's own
+        # limits and http2 arguments once a transport is passed.
+        # Transport retries only cover failed connection attempts, which are
+        # safe to repeat for any request.
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            limits=limits,
+            retries=settings.http_connect_retries,
+        )
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.http_timeout_seconds,
+                connect=settings.http_connect_timeout_seconds,
+            ),
+            transport=transport,
+        )
+        logger.info("Created shared HTTP client (http2=%s)", http2)
+
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from neo4j import AsyncDriver, AsyncGraphDatabase
+
+from app.core.config import settings
+
+_neo4j_driver: AsyncDriver | None = None
+
+
+def get_neo4j_driver() -> AsyncDriver:
+    global _neo4j_driver
+
+    if _neo4j_driver is None:
+        if not settings.neo4j_uri or not settings.neo4j_user or not settings.neo4j_password:
+            raise RuntimeError(
+                "NEO4J_URI, NEO4J_USER and NEO4J_PASSWORD must be configured"
+            )
+
+        _neo4j_driver = AsyncGraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=(settings.neo4j_user, settings.neo4j_password),
+            max_connection_pool_size=settings.neo4j_max_pool_size,
+        )
+
+    return _neo4j_driver
+
+
+async def close_neo4j_driver() -> None:
+    global _neo4j_driver
+
+    if _neo4j_driver is not None:
+        await _neo4j_driver.close()
+        _neo4j_driver = None
@@ -1,23 +1,38 @@
 from __future__ import annotations
 
-from supabase import Client, create_client
+import asyncio
+
+from supabase import AsyncClient, acreate_client
 
 from app.core.config import settings
 
-_supabase_client: Client | None = None
+_supabase_client: AsyncClient | None = None
+_supabase_lock = asyncio.Lock()
 
 
-def get_supabase_client() -> Client:
+async def get_supabase_client() -> AsyncClient:
+    # Async client, so PostgREST calls never block the event loop; one per
+    # process, so every request shares its HTTP connection pool.
     global _supabase_client
 
     if _supabase_client is None:
-        if not settings.supabase_url or not settings.supabase_service_role_key:
-            raise RuntimeError(
-                "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be configured"
-            )
+        async with _supabase_lock:
+            if _supabase_client is None:
+                if not settings.supabase_url or not settings.supabase_service_role_key:
+                    raise RuntimeError(
+                        "SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be configured"
+                    )
 
-        _supabase_client = create_client(
-            settings.supabase_url, settings.supabase_service_role_key
-        )
+                _supabase_client = await acreate_client(
+                    settings.supabase_url, settings.supabase_service_role_key
+                )
 
     return _supabase_client
+
+
+async def close_supabase_client() -> None:
+    global _supabase_client
+
+    if _supabase_client is not None:
+        await _supabase_client.postgrest.aclose()
+        _supabase_client = None
@@ -3,7 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.router import api_router
 from app.core.config import settings
+from app.core.http import close_http_client, get_http_client
 from app.core.logging import get_logger, setup_logging
+from app.core.neo4j import close_neo4j_driver
+from app.core.supabase import close_supabase_client
+from app.services.embedding_cache import embedding_cache
 
 setup_logging(settings.log_level)
 logger = get_logger(__name__)
@@ -16,17 +20,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
     logger.info("Starting up Query Engine...")
+    get_http_client()
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     logger.info("Shutting down Query Engine...")
+    await close_neo4j_driver()
+    await close_http_client()
+    await close_supabase_client()
+    await embedding_cache.close()
 
 
 @app.get("/health", tags=["health"])
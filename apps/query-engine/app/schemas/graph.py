@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class GraphNode(BaseModel):
+    id: int
+    key: str
+    label: Optional[str] = None
+    name: Optional[str] = None
+    role: Optional[str] = None
+
+
+class GraphEdge(BaseModel):
+    # source/target are GraphNode ids within the same response; type is the
+    # project's canonical relationship type, label the extracted wording.
+    source: int
+    target: int
+    type: str
+    label: Optional[str] = None
+    scene_id: Optional[str] = None
+    confidence: Optional[float] = None
+
+
+# Aggregates Layer 5 maintains per project (knowledge-graph graph_stats).
+GraphStatKind = Literal["entity_scenes", "entity_degree", "co_appearance", "relation_facts"]
+
+
+class GraphStat(BaseModel):
+    # key is an entity key ("Label:canonical_name"), a sorted "entity|other"
+    # pair for co_appearance, or a relationship type for relation_facts.
+    key: str
+    entity: Optional[str] = None
+    other: Optional[str] = None
+    count: int
+
+
+class GraphStatsResponse(BaseModel):
+    project_id: str
+    kind: GraphStatKind
+    version: int
+    items: List[GraphStat] = Field(default_factory=list)
+
+
+class GraphResponse(BaseModel):
+    scope: Literal["scene", "project"]
+    id: str
+    version: int
+    nodes: List[GraphNode] = Field(default_factory=list)
+    edges: List[GraphEdge] = Field(default_factory=list)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_TRAILING_PUNCTUATION = "?!.,;: \"'"
+
+
+def normalize_question(question: str) -> str:
+    # "Who killed Patrick?" and "who  killed patrick" embed to the same key.
+    return re.sub(r"\s+", " ", question).strip().strip(_TRAILING_PUNCTUATION).lower()
+
+
+class EmbeddingCache:
+    """
+    Query embeddings keyed by (normalized question, model, dimensions).
+
+    The in-process tier is an LRU with a TTL. When EMBEDDING_CACHE_REDIS_URL
+    is set (and the redis package is installed) misses fall through to a
+    shared Redis tier, so replicas reuse each other's embeddings.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, redis_url: str = "") -> None:
+        self._max_entries = max(1, max_entries)
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._redis_url = redis_url
+        self._redis = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(question: str, model: str, dimensions: int) -> str:
+        return f"{model}:{dimensions}:{normalize_question(question)}"
+
+    def _shared_client(self):
+        if self._redis is None and self._redis_url:
+            try:
+                from redis import asyncio as redis_asyncio
+            except ImportError:
+                logger.warning("EMBEDDING_CACHE_REDIS_URL is set but redis is not installed; shared tier disabled")
+                self._redis_url = ""
+                return None
+            self._redis = redis_asyncio.from_url(self._redis_url)
+        return self._redis
+
+    @staticmethod
+    def _shared_key(key: str) -> str:
+        return "query-embedding:" + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> list[float] | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, embedding = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+            del self._entries[key]
+            self.expired += 1
+
+        shared = self._shared_client()
+        if shared is not None:
+            try:
+                raw = await shared.get(self._shared_key(key))
+            except Exception as exc:
+                logger.warning("Shared embedding cache read failed: %s", exc)
+                raw = None
+            if raw:
+                embedding = json.loads(raw)
+                self._put_local(key, embedding)
+                self.shared_hits += 1
+                return embedding
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, embedding: list[float]) -> None:
+        self._put_local(key, embedding)
+
+        shared = self._shared_client()
+        if shared is not None:
+            try:
+                await shared.set(self._shared_key(key), json.dumps(embedding), ex=max(1, int(self._ttl_seconds)))
+            except Exception as exc:
+                logger.warning("Shared embedding cache write failed: %s", exc)
+
+    def _put_local(self, key: str, embedding: list[float]) -> None:
+        self._entries[key] = (time.monotonic() + self._ttl_seconds, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, float | int | bool]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            "shared_tier": bool(self._redis_url),
+        }
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+embedding_cache = EmbeddingCache(
+    settings.embedding_cache_max_entries,
+    settings.embedding_cache_ttl_seconds,
+    settings.embedding_cache_redis_url,
+)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.neo4j import get_neo4j_driver
+from app.schemas.graph import GraphEdge, GraphNode, GraphResponse, GraphStat, GraphStatsResponse
+
+logger = get_logger(__name__)
+
+# Story edges carry the scene that asserted them; APPEARS_IN and the CaseFact
+# links do not, so they never show up as graph edges.
+_SUBGRAPH_QUERY = """
+MATCH (e)-[:APPEARS_IN]->(s)
+WHERE NOT e:CaseFact AND e.project_id = s.project_id
+OPTIONAL MATCH (e)-[r]->(t)
+WHERE r.scene_id = s.scene_id
+RETURN
+    labels(e)[0] + ':' + coalesce(e.canonical_name, toLower(e.name)) AS source_key,
+    labels(e)[0] AS source_label, e.name AS source_name, e.role AS source_role,
+    labels(t)[0] + ':' + coalesce(t.canonical_name, toLower(t.name)) AS target_key,
+    labels(t)[0] AS target_label, t.name AS target_name, t.role AS target_role,
+    type(r) AS rel_type, r.relation_label AS relation_label,
+    r.scene_id AS scene_id, r.confidence AS confidence
+"""
+
+SCENE_GRAPH_QUERY = "MATCH (s:Scene {scene_id: $id})" + _SUBGRAPH_QUERY
+PROJECT_GRAPH_QUERY = "MATCH (s:Scene {project_id: $id})" + _SUBGRAPH_QUERY
+
+SCENE_VERSION_QUERY = """
+MATCH (s:Scene {scene_id: $id})
+RETURN coalesce(s.graph_version, 0) AS version
+"""
+# co_appearance pairs are stored once, sorted, so an entity can be on either
+# side; matching rows are returned with the requested entity first.
+PROJECT_STATS_QUERY = """
+MATCH (g:GraphStat {project_id: $id, kind: $kind})
+WHERE g.count > 0 AND ($entity IS NULL OR g.entity = $entity OR g.other = $entity)
+RETURN
+    g.key AS key,
+    CASE WHEN g.other = $entity THEN g.other ELSE g.entity END AS entity,
+    CASE WHEN g.other = $entity THEN g.entity ELSE g.other END AS other,
+    g.count AS count
+ORDER BY g.count DESC, g.key
+LIMIT $limit
+"""
+
+PROJECT_VERSION_QUERY = """
+OPTIONAL MATCH (p:ProjectGraph {project_id: $id})
+RETURN coalesce(p.version, 0) AS version
+"""
+
+
+class GraphNotFoundError(LookupError):
+    pass
+
+
+class GraphLRUCache:
+    """Subgraphs keyed by (scope, id); an entry is only served for the version it was built from."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max(1, max_entries)
+        self._entries: OrderedDict[tuple[str, str], GraphResponse] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: str, graph_id: str, version: int) -> GraphResponse | None:
+        key = (scope, graph_id)
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, graph: GraphResponse) -> None:
+        key = (graph.scope, graph.id)
+        self._entries[key] = graph
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class GraphService:
+    def __init__(self) -> None:
+        self._cache = GraphLRUCache(settings.graph_cache_max_entries)
+
+    @staticmethod
+    def etag(scope: str, graph_id: str, version: int) -> str:
+        return f'W/"{scope}:{graph_id}:{version}"'
+
+    async def get_version(self, scope: str, graph_id: str) -> int:
+        query = SCENE_VERSION_QUERY if scope == "scene" else PROJECT_VERSION_QUERY
+        records, _, _ = await get_neo4j_driver().execute_query(
+            query, id=graph_id, routing_="r"
+        )
+        if not records:
+            raise GraphNotFoundError(f"No {scope} graph found for {graph_id}")
+        return int(records[0]["version"])
+
+    async def get_graph(self, scope: str, graph_id: str, version: int | None = None) -> GraphResponse:
+        if version is None:
+            version = await self.get_version(scope, graph_id)
+
+        cached = self._cache.get(scope, graph_id, version)
+        if cached is not None:
+            return cached
+
+        query = SCENE_GRAPH_QUERY if scope == "scene" else PROJECT_GRAPH_QUERY
+        records, _, _ = await get_neo4j_driver().execute_query(
+            query, id=graph_id, routing_="r"
+        )
+        graph = self._build_graph(scope, graph_id, version, records)
+        self._cache.put(graph)
+        logger.info(
+            "Loaded %s graph %s v%s: %s nodes, %s edges",
+            scope, graph_id, version, len(graph.nodes), len(graph.edges),
+        )
+        return graph
+
+    async def get_project_stats(
+        self, project_id: str, kind: str, version: int, entity: str | None = None, limit: int = 25
+    ) -> GraphStatsResponse:
+        # Counters are maintained by the graph writer, so this is an indexed
+        # read of at most `limit` nodes rather than an aggregation.
+        records, _, _ = await get_neo4j_driver().execute_query(
+            PROJECT_STATS_QUERY, id=project_id, kind=kind, entity=entity, limit=limit, routing_="r"
+        )
+        return GraphStatsResponse(
+            project_id=project_id,
+            kind=kind,
+            version=version,
+            items=[GraphStat(**dict(record)) for record in records],
+        )
+
+    @staticmethod
+    def _build_graph(scope: str, graph_id: str, version: int, records) -> GraphResponse:
+        node_ids: dict[str, int] = {}
+        nodes: list[GraphNode] = []
+        edges: dict[tuple, GraphEdge] = {}
+
+        def node_id(key: str, label: str | None, name: str | None, role: str | None) -> int:
+            if key not in node_ids:
+                node_ids[key] = len(nodes)
+                nodes.append(GraphNode(id=node_ids[key], key=key, label=label, name=name, role=role))
+            return node_ids[key]
+
+        for record in records:
+            source = node_id(
+                record["source_key"], record["source_label"], record["source_name"], record["source_role"]
+            )
+            if record["rel_type"] is None:
+                continue
+
+            target = node_id(
+                record["target_key"], record["target_label"], record["target_name"], record["target_role"]
+            )
+            edge_key = (source, target, record["rel_type"], record["scene_id"])
+            edges[edge_key] = GraphEdge(
+                source=source,
+                target=target,
+                type=record["rel_type"],
+                label=record["relation_label"],
+                scene_id=record["scene_id"],
+                confidence=record["confidence"],
+            )
+
+        return GraphResponse(
+            scope=scope,
+            id=graph_id,
+            version=version,
+            nodes=nodes,
+            edges=list(edges.values()),
+        )
+
+
+graph_service = GraphService()
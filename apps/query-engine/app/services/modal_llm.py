@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import asyncio
+from collections.abc import AsyncIterator
 
 import modal
 
@@ -12,14 +13,36 @@ from app.core.logging import get_logger
 logger = get_logger(__name__)
 
 
+class ModalLLMBusyError(RuntimeError):
+    """Every generation slot stayed taken for the whole queue timeout."""
+
+
 class ModalQwenLLM:
+    """
+    Async client for the Modal answer model.
+
+    At most `max_concurrency` generations run at once per process. Callers
+    beyond that wait up to `queue_timeout_seconds` for a slot and then get a
+    ModalLLMBusyError, so a burst is shed instead of piling up behind the
+    model. A generation that exceeds `timeout_seconds` is cancelled, which
+    also cancels the remote Modal call.
+    """
+
     def __init__(
         self,
         app_name: str,
         model_class_name: str,
         timeout_seconds: int | None = None,
+        max_concurrency: int | None = None,
+        queue_timeout_seconds: float | None = None,
     ) -> None:
         self._timeout_seconds = timeout_seconds or settings.modal_timeout_seconds
+        self._max_concurrency = max(1, max_concurrency or settings.modal_max_concurrency)
+        self._queue_timeout_seconds = (
+            settings.modal_queue_timeout_seconds
+            if queue_timeout_seconds is None
+            else queue_timeout_seconds
+        )
         self._app_name = app_name
         self._model_class_name = model_class_name
 
@@ -34,14 +57,35 @@ class ModalQwenLLM:
                 f"Failed to resolve Modal model class {self._app_name}/{self._model_class_name}."
             ) from exc
 
-        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+        self._in_flight = 0
 
-    def generate(self, prompt: str) -> str:
-        future = self._executor.submit(self._model_instance.generate.remote, prompt)
+    async def _acquire_slot(self) -> None:
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self._queue_timeout_seconds)
+        except asyncio.TimeoutError as exc:
+            logger.warning(
+                "Modal LLM busy: %s generations in flight, no slot within %s seconds",
+                self._in_flight,
+                self._queue_timeout_seconds,
+            )
+            raise ModalLLMBusyError(
+                f"Modal LLM is at capacity ({self._max_concurrency} concurrent generations)"
+            ) from exc
+        self._in_flight += 1
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._slots.release()
 
+    async def generate(self, prompt: str) -> str:
+        await self._acquire_slot()
         try:
-            output = future.result(timeout=self._timeout_seconds)
-        except FuturesTimeoutError as exc:
+            output = await asyncio.wait_for(
+                self._model_instance.generate.remote.aio(prompt),
+                timeout=self._timeout_seconds,
+            )
+        except asyncio.TimeoutError as exc:
             logger.error("Modal LLM timed out after %s seconds", self._timeout_seconds)
             raise RuntimeError(
                 f"Modal LLM timed out after {self._timeout_seconds} seconds"
@@ -49,8 +93,41 @@ class ModalQwenLLM:
         except Exception as exc:
             logger.exception("Modal LLM generation failed")
             raise RuntimeError("Modal LLM generation failed") from exc
+        finally:
+            self._release_slot()
 
         return str(output).strip()
 
-    def __call__(self, prompt: str) -> str:
-        return self.generate(prompt)
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        # Holds its slot until the stream is exhausted or closed; the timeout
+        # covers the whole stream, not each piece.
+        await self._acquire_slot()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._timeout_seconds
+        stream = self._model_instance.generate_stream.remote_gen.aio(prompt)
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(
+                        anext(stream),
+                        timeout=max(0.0, deadline - loop.time()),
+                    )
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError as exc:
+                    logger.error("Modal LLM stream timed out after %s seconds", self._timeout_seconds)
+                    raise RuntimeError(
+                        f"Modal LLM timed out after {self._timeout_seconds} seconds"
+                    ) from exc
+                except Exception as exc:
+                    logger.exception("Modal LLM streaming generation failed")
+                    raise RuntimeError("Modal LLM generation failed") from exc
+                yield str(text)
+        finally:
+            try:
+                await stream.aclose()
+            finally:
+                self._release_slot()
+
+    async def __call__(self, prompt: str) -> str:
+        return await self.generate(prompt)
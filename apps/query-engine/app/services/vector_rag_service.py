@@ -2,18 +2,89 @@ from __future__ import annotations
 
 import asyncio
 import json
-import urllib.error
-import urllib.request
+import re
+from collections.abc import AsyncIterator
+from contextlib import aclosing
 from dataclasses import dataclass
 
+import httpx
+
 from app.core.config import settings
+from app.core.http import get_http_client
 from app.core.logging import get_logger
 from app.core.supabase import get_supabase_client
 from app.schemas.query import AnswerGenerationResult, QueryResponse, SupportingEvidence
+from app.services.embedding_cache import EmbeddingCache, embedding_cache
 from app.services.modal_llm import ModalQwenLLM
 
 logger = get_logger(__name__)
 
+# Embedding requests are idempotent, so these are retried with backoff.
+_RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+
+def _retry_delay(attempt: int) -> float:
+    return min(0.25 * 2 ** (attempt - 1), 2.0)
+
+
+_ANSWER_VALUE_START_RE = re.compile(r'"answer"\s*:\s*"')
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class _AnswerStream:
+    """
+    Pulls the "answer" string out of the model's JSON output while it is
+    still being generated. feed() returns the newly decoded answer text; an
+    escape split across pieces waits for the next piece. The raw output is
+    kept in `text` for the final parse.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._position: int | None = None
+        self._closed = False
+
+    def feed(self, piece: str) -> str:
+        self.text += piece
+        if self._closed:
+            return ""
+        if self._position is None:
+            match = _ANSWER_VALUE_START_RE.search(self.text)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        text = self.text
+        index = self._position
+        decoded: list[str] = []
+        while index < len(text):
+            char = text[index]
+            if char == '"':
+                self._closed = True
+                index += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                index += 1
+                continue
+            if index + 1 >= len(text):
+                break
+            escape = text[index + 1]
+            if escape == "u":
+                if index + 6 > len(text):
+                    break
+                try:
+                    decoded.append(chr(int(text[index + 2 : index + 6], 16)))
+                except ValueError:
+                    pass
+                index += 6
+                continue
+            decoded.append(_JSON_ESCAPES.get(escape, escape))
+            index += 2
+
+        self._position = index
+        return "".join(decoded)
+
 
 @dataclass
 class VectorChunk:
@@ -38,6 +109,8 @@ class VectorRAGService:
         self._embedding_auth_scheme = settings.embedding_auth_scheme
         self._embedding_model = settings.embedding_model
         self._embedding_dimensions = settings.embedding_dimensions
+        self._embedding_timeout_seconds = settings.embedding_timeout_seconds
+        self._embedding_max_retries = max(0, settings.embedding_max_retries)
         self._match_count = settings.vector_match_count
 
     @staticmethod
@@ -148,10 +221,25 @@ CONTEXT:
 
 JSON RESPONSE:"""
 
+    def _embedding_headers(self) -> dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self._embedding_api_key:
+            headers[self._embedding_auth_header] = (
+                self._embedding_api_key
+                if self._embedding_auth_scheme == ""
+                else f"{self._embedding_auth_scheme} {self._embedding_api_key}"
+            )
+        return headers
+
     async def _generate_embedding(self, question: str) -> list[float]:
         if not self._embedding_api_url:
             raise RuntimeError("EMBEDDING_API_URL is required for vector queries.")
 
+        cache_key = EmbeddingCache.key(question, self._embedding_model, self._embedding_dimensions)
+        cached = await embedding_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         request_body: dict[str, object] = {
             "input": question,
             "input_type": "query",
@@ -159,67 +247,67 @@ JSON RESPONSE:"""
         if self._embedding_model:
             request_body["model"] = self._embedding_model
 
-        payload = json.dumps(request_body).encode("utf-8")
-
-        def _call_embedding_api() -> list[float]:
-            headers = {"Content-Type": "application/json"}
-            if self._embedding_api_key:
-                headers[self._embedding_auth_header] = (
-                    self._embedding_api_key
-                    if self._embedding_auth_scheme == ""
-                    else f"{self._embedding_auth_scheme} {self._embedding_api_key}"
-                )
-
-            request = urllib.request.Request(
-                self._embedding_api_url,
-                data=payload,
-                method="POST",
-                headers=headers,
-            )
-
+        client = get_http_client()
+        attempts = self._embedding_max_retries + 1
+        for attempt in range(1, attempts + 1):
             try:
-                with urllib.request.urlopen(request, timeout=60) as response:
-                    body = response.read().decode("utf-8")
-            except urllib.error.HTTPError as exc:
-                body = exc.read().decode("utf-8", errors="ignore")
-                raise RuntimeError(
-                    f"Embedding API failed with status {exc.code}: {body[:500]}"
-                ) from exc
-            except urllib.error.URLError as exc:
-                raise RuntimeError(f"Embedding API request failed: {exc.reason}") from exc
-
-            data = json.loads(body)
-            embedding = None
-            if isinstance(data.get("data"), list) and data["data"]:
-                embedding = data["data"][0].get("embedding")
-            elif isinstance(data.get("embeddings"), list) and data["embeddings"]:
-                embedding = data["embeddings"][0]
-
-            if not isinstance(embedding, list) or not embedding:
-                raise RuntimeError("Embedding API returned an invalid payload")
-
-            if len(embedding) != self._embedding_dimensions:
+                response = await client.post(
+                    self._embedding_api_url,
+                    json=request_body,
+                    headers=self._embedding_headers(),
+                    timeout=self._embedding_timeout_seconds,
+                )
+            except httpx.HTTPError as exc:
+                if attempt < attempts:
+                    logger.warning("Embedding API request failed (attempt %s/%s): %s", attempt, attempts, exc)
+                    await asyncio.sleep(_retry_delay(attempt))
+                    continue
+                raise RuntimeError(f"Embedding API request failed: {exc}") from exc
+
+            if response.status_code in _RETRYABLE_STATUS_CODES and attempt < attempts:
                 logger.warning(
-                    "Embedding dimension mismatch: expected %s, got %s",
-                    self._embedding_dimensions,
-                    len(embedding),
+                    "Embedding API returned %s (attempt %s/%s)", response.status_code, attempt, attempts
                 )
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if response.is_error:
+                raise RuntimeError(
+                    f"Embedding API failed with status {response.status_code}: {response.text[:500]}"
+                )
+            break
+
+        data = response.json()
+        embedding = None
+        if isinstance(data.get("data"), list) and data["data"]:
+            embedding = data["data"][0].get("embedding")
+        elif isinstance(data.get("embeddings"), list) and data["embeddings"]:
+            embedding = data["embeddings"][0]
+
+        if not isinstance(embedding, list) or not embedding:
+            raise RuntimeError("Embedding API returned an invalid payload")
+
+        if len(embedding) != self._embedding_dimensions:
+            logger.warning(
+                "Embedding dimension mismatch: expected %s, got %s",
+                self._embedding_dimensions,
+                len(embedding),
+            )
 
-            return [float(value) for value in embedding]
-
-        return await asyncio.to_thread(_call_embedding_api)
+        embedding = [float(value) for value in embedding]
+        await embedding_cache.put(cache_key, embedding)
+        return embedding
 
     async def _generate_answer(self, prompt: str) -> str:
-        return self._llm.generate(prompt)
+        return await self._llm.generate(prompt)
 
-    def _fetch_chunks(
+    async def _fetch_chunks(
         self,
         project_id: str,
         fs_node_id: str,
         query_embedding: list[float],
     ) -> list[VectorChunk]:
-        client = get_supabase_client()
-        response = client.rpc(
+        client = await get_supabase_client()
+        response = await client.rpc(
             "match_story_chunks",
             {
                 "query_embedding": query_embedding,
@@ -250,13 +338,7 @@ JSON RESPONSE:"""
 
         return chunks
 
-    def _build_supporting_evidence(
-        self, chunks: list[VectorChunk]
-    ) -> list[SupportingEvidence]:
-        if not chunks:
-            return []
-
-        client = get_supabase_client()
+    async def _fetch_fs_node_names(self, chunks: list[VectorChunk]) -> dict[str, str]:
         fs_node_ids = []
         seen_fs_node_ids: set[str] = set()
         for chunk in chunks:
@@ -265,20 +347,30 @@ JSON RESPONSE:"""
             seen_fs_node_ids.add(chunk.fs_node_id)
             fs_node_ids.append(chunk.fs_node_id)
 
-        fs_node_names_by_id: dict[str, str] = {}
-        if fs_node_ids:
-            fs_nodes_response = (
-                client.table("fs_nodes")
-                .select("id,name")
-                .in_("id", fs_node_ids)
-                .execute()
-            )
-            fs_nodes_rows = fs_nodes_response.data or []
-            fs_node_names_by_id = {
-                str(row.get("id")): str(row.get("name"))
-                for row in fs_nodes_rows
-                if row.get("id") is not None and row.get("name") is not None
-            }
+        if not fs_node_ids:
+            return {}
+
+        client = await get_supabase_client()
+        fs_nodes_response = await (
+            client.table("fs_nodes")
+            .select("id,name")
+            .in_("id", fs_node_ids)
+            .execute()
+        )
+        fs_nodes_rows = fs_nodes_response.data or []
+        return {
+            str(row.get("id")): str(row.get("name"))
+            for row in fs_nodes_rows
+            if row.get("id") is not None and row.get("name") is not None
+        }
+
+    def _build_supporting_evidence(
+        self,
+        chunks: list[VectorChunk],
+        fs_node_names_by_id: dict[str, str],
+    ) -> list[SupportingEvidence]:
+        if not chunks:
+            return []
 
         evidence: list[SupportingEvidence] = []
         seen_source_ids: set[str] = set()
@@ -329,29 +421,24 @@ JSON RESPONSE:"""
             supporting_job_ids=supporting_job_ids,
         )
 
-    async def query(
+    @staticmethod
+    def _context_unavailable_response(question: str) -> QueryResponse:
+        return QueryResponse(
+            status="ok",
+            question=question,
+            answer="This information is not available in the current context.",
+            supporting_ids_and_text=[],
+            entities=[],
+            relationships=[],
+        )
+
+    async def _build_response(
         self,
         question: str,
-        project_id: str,
-        fs_node_id: str,
+        output: str,
+        chunks: list[VectorChunk],
+        fs_node_names_task: asyncio.Task[dict[str, str]],
     ) -> QueryResponse:
-        logger.info("Generating vector answer for question")
-
-        query_embedding = await self._generate_embedding(question)
-        chunks = self._fetch_chunks(project_id, fs_node_id, query_embedding)
-
-        if not chunks:
-            return QueryResponse(
-                status="ok",
-                question=question,
-                answer="This information is not available in the current context.",
-                supporting_ids_and_text=[],
-                entities=[],
-                relationships=[],
-            )
-
-        prompt = self._build_prompt(question, chunks)
-        output = await self._generate_answer(prompt)
         result = self._parse_answer_output(output, chunks)
 
         available_chunks_by_id = {chunk.id: chunk for chunk in chunks}
@@ -360,7 +447,9 @@ JSON RESPONSE:"""
             for chunk_id in result.supporting_job_ids
             if chunk_id in available_chunks_by_id
         ]
-        supporting_evidence = self._build_supporting_evidence(supporting_chunks)
+        supporting_evidence = self._build_supporting_evidence(
+            supporting_chunks, await fs_node_names_task
+        )
 
         return QueryResponse(
             status="ok",
@@ -371,5 +460,68 @@ JSON RESPONSE:"""
             relationships=[],
         )
 
+    async def query(
+        self,
+        question: str,
+        project_id: str,
+        fs_node_id: str,
+    ) -> QueryResponse:
+        logger.info("Generating vector answer for question")
+
+        query_embedding = await self._generate_embedding(question)
+        chunks = await self._fetch_chunks(project_id, fs_node_id, query_embedding)
+
+        if not chunks:
+            return self._context_unavailable_response(question)
+
+        prompt = self._build_prompt(question, chunks)
+        # The supporting chunks are only known once the answer is parsed, so
+        # names are looked up for every retrieved chunk while the model runs.
+        fs_node_names_task = asyncio.create_task(self._fetch_fs_node_names(chunks))
+        try:
+            output = await self._generate_answer(prompt)
+        except BaseException:
+            fs_node_names_task.cancel()
+            raise
+
+        return await self._build_response(question, output, chunks, fs_node_names_task)
+
+    async def query_stream(
+        self,
+        question: str,
+        project_id: str,
+        fs_node_id: str,
+    ) -> AsyncIterator[tuple[str, dict]]:
+        """
+        Same answer as query(), as ("answer", {"delta": ...}) events while the
+        model decodes, then one ("done", QueryResponse) event carrying the
+        final answer and its supporting evidence.
+        """
+        logger.info("Streaming vector answer for question")
+
+        query_embedding = await self._generate_embedding(question)
+        chunks = await self._fetch_chunks(project_id, fs_node_id, query_embedding)
+
+        if not chunks:
+            yield "done", self._context_unavailable_response(question).model_dump()
+            return
+
+        prompt = self._build_prompt(question, chunks)
+        fs_node_names_task = asyncio.create_task(self._fetch_fs_node_names(chunks))
+        answer_stream = _AnswerStream()
+        try:
+            async with aclosing(self._llm.generate_stream(prompt)) as pieces:
+                async for piece in pieces:
+                    delta = answer_stream.feed(piece)
+                    if delta:
+                        yield "answer", {"delta": delta}
+        except BaseException:
+            fs_node_names_task.cancel()
+            raise
+
+        response = await self._build_response(
+            question, answer_stream.text, chunks, fs_node_names_task
+        )
+        yield "done", response.model_dump()
 
 vector_rag_service = VectorRAGService()
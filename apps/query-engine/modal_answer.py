@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import modal
 
 APP_NAME = "detective-quill-answer"
@@ -9,10 +11,19 @@ LEAKAGE_MARKERS = ("\nHuman:", "\nUSER:", "\nUser:", "\nAssistant:", "```json")
 volume = modal.Volume.from_name("qwen-answer-cache", create_if_missing=True)
 answer_cache = modal.Dict.from_name("answer-generation-cache", create_if_missing=True)
 
-image = modal.Image.debian_slim(python_version="3.10").pip_install(
-    "torch==2.4.1",
-    "transformers==4.44.2",
-    "accelerate>=0.33.0",
+# The JSON stopping criteria are shared with the knowledge-graph LLM loader
+# rather than copied; the module only needs the standard library, so it is
+# shipped into this image on its own and imported inside the container.
+STOPPING_MODULE = Path(__file__).resolve().parent.parent / "knowledge-graph" / "src" / "models" / "stopping.py"
+
+image = (
+    modal.Image.debian_slim(python_version="3.10")
+    .pip_install(
+        "torch==2.4.1",
+        "transformers==4.44.2",
+        "accelerate>=0.33.0",
+    )
+    .add_local_file(STOPPING_MODULE, remote_path="/root/json_stopping.py")
 )
 
 app = modal.App(APP_NAME)
@@ -60,6 +71,20 @@ def _clean_answer_output(text: str) -> str:
     return _extract_first_json_object(cleaned)
 
 
+def _cached_answer(prompt: str) -> str | None:
+    try:
+        return answer_cache.get(prompt)
+    except Exception:
+        return None
+
+
+def _store_answer(prompt: str, output: str) -> None:
+    try:
+        answer_cache[prompt] = output
+    except Exception:
+        pass
+
+
 @app.cls(
     image=image,
     gpu="T4",
@@ -85,16 +110,10 @@ class AnswerModel:
         )
         self._model.eval()
 
-    @modal.method()   
-    def generate(self, prompt: str) -> str:
-        import torch
+    def _generation_kwargs(self, prompt: str, *extra_criteria) -> dict:
+        from transformers import StoppingCriteriaList
 
-        try:
-            cached = answer_cache.get(prompt)
-            if cached is not None:
-                return cached
-        except Exception:
-            pass
+        from json_stopping import JsonObjectStoppingCriteria
 
         encoded = self._tokenizer(
             prompt,
@@ -109,29 +128,102 @@ class AnswerModel:
         if attention_mask is not None:
             attention_mask = attention_mask.to(device)
 
+        stopping = JsonObjectStoppingCriteria(self._tokenizer, input_ids.shape[1], LEAKAGE_MARKERS)
+        kwargs = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "max_new_tokens": MAX_NEW_TOKENS,
+            "do_sample": False,
+            "pad_token_id": self._tokenizer.eos_token_id,
+            "eos_token_id": self._tokenizer.eos_token_id,
+            "stopping_criteria": StoppingCriteriaList([stopping, *extra_criteria]),
+        }
+        return kwargs
+
+    @modal.method()
+    def generate(self, prompt: str) -> str:
+        import torch
+
+        cached = _cached_answer(prompt)
+        if cached is not None:
+            return cached
+
+        kwargs = self._generation_kwargs(prompt)
         with torch.inference_mode():
-            output_ids = self._model.generate(
-                input_ids=input_ids,
-                attention_mask=attention_mask,
-                max_new_tokens=MAX_NEW_TOKENS,
-                do_sample=False,
-                pad_token_id=self._tokenizer.eos_token_id,
-                eos_token_id=self._tokenizer.eos_token_id,
-            )
-
-        new_tokens = output_ids[0, input_ids.shape[1] :]
+            output_ids = self._model.generate(**kwargs)
+
+        new_tokens = output_ids[0, kwargs["input_ids"].shape[1] :]
         output = self._tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
         output = _clean_answer_output(output)
+        _store_answer(prompt, output)
+        return output
 
-        try:
-            answer_cache[prompt] = output
-        except Exception:
-            pass
+    @modal.method()
+    def generate_stream(self, prompt: str):
+        """Yields decoded text as it is generated; the pieces join to what generate() decodes."""
+        import threading
 
-        return output
+        import torch
+        from transformers import TextIteratorStreamer
+
+        from json_stopping import CancelGeneration
+
+        cached = _cached_answer(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+        streamer = TextIteratorStreamer(
+            self._tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+        )
+        cancel = CancelGeneration()
+        kwargs = self._generation_kwargs(prompt, cancel)
+        kwargs["streamer"] = streamer
+
+        errors: list[BaseException] = []
+
+        def run() -> None:
+            try:
+                with torch.inference_mode():
+                    self._model.generate(**kwargs)
+            except BaseException as exc:
+                errors.append(exc)
+                streamer.end()
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+
+        pieces: list[str] = []
+        finished = False
+        try:
+            for text in streamer:
+                if text:
+                    pieces.append(text)
+                    yield text
+            finished = True
+        finally:
+            # A caller that stops reading (client disconnect, timeout) also
+            # stops decoding at the next token instead of at MAX_NEW_TOKENS.
+            cancel.cancelled = True
+            worker.join()
+
+        if errors:
+            raise errors[0]
+        if finished:
+            _store_answer(prompt, _clean_answer_output("".join(pieces)))
 
 
 @app.local_entrypoint()
-def main(prompt: str = "Return JSON: {\"answer\":\"hello\",\"supporting_job_ids\":[]}") -> None:
+def main(
+    prompt: str = "Return JSON: {\"answer\":\"hello\",\"supporting_job_ids\":[]}",
+    stream: bool = False,
+) -> None:
     model = AnswerModel()
+    if stream:
+        for text in model.generate_stream.remote_gen(prompt):
+            print(text, end="", flush=True)
+        print()
+        return
     print(model.generate.remote(prompt))